@@ -0,0 +1,56 @@
+/**apps_script_bulk_sessions.gs
+/**
+ * PilatesHQ — Bulk Session Writer
+ * -------------------------------
+ * Handles the `add_sessions_bulk` action posted by Render
+ * (recurring.py) and appends every row with one setValues() call
+ * instead of one add_session request per date.
+ *
+ * doPost (apps_script_reschedule_handler.gs) hands every JSON body with an
+ * `action` to routeSheetsAction(). Actions without a handler answer
+ * { ok: false, error: "unknown action: …" } – the only answer on which
+ * recurring.py falls back to one add_session call per row.
+ *
+ * Rows are mapped onto the Sessions sheet by header name, so the column
+ * order of the sheet does not matter.
+ */
+
+const SHEETS_ACTIONS = {
+  add_sessions_bulk: data => addSessionsBulk(data.sessions),
+};
+
+function routeSheetsAction(data) {
+  const handler = SHEETS_ACTIONS[data.action];
+  if (!handler) return { ok: false, error: `unknown action: ${data.action}` };
+  return handler(data);
+}
+
+function jsonOut(obj) {
+  return ContentService.createTextOutput(JSON.stringify(obj))
+    .setMimeType(ContentService.MimeType.JSON);
+}
+
+function addSessionsBulk(sessions) {
+  if (!sessions || !sessions.length) return { ok: true, written: 0 };
+
+  const sheetId = PropertiesService.getScriptProperties().getProperty("CLIENT_SHEET_ID");
+  const sh = SpreadsheetApp.openById(sheetId).getSheetByName("Sessions");
+  if (!sh) return { ok: false, error: "Sessions sheet not found" };
+
+  const headers = sh.getRange(1, 1, 1, sh.getLastColumn()).getValues()[0]
+    .map(h => (h + "").trim().toLowerCase());
+
+  const rows = sessions.map(s => headers.map(h => (h in s ? s[h] : "")));
+
+  const lock = LockService.getScriptLock();
+  lock.waitLock(20000);
+  try {
+    const start = sh.getLastRow() + 1;
+    sh.getRange(start, 1, rows.length, headers.length).setValues(rows);
+  } finally {
+    lock.releaseLock();
+  }
+
+  Logger.log(`✅ add_sessions_bulk wrote ${rows.length} rows`);
+  return { ok: true, written: rows.length };
+}
@@ -24,6 +24,10 @@ const CONFIG_REPLY = (() => {
 function doPost(e) {
   try {
     const data = JSON.parse(e.postData.contents);
+
+    // Render sheet actions ({ action: ... }) – see apps_script_bulk_sessions.gs
+    if (data.action) return jsonOut(routeSheetsAction(data));
+
     Logger.log(`📩 Incoming WhatsApp message: ${JSON.stringify(data, null, 2)}`);
 
     const messages = data?.entry?.[0]?.changes?.[0]?.value?.messages || [];
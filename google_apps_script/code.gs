@@ -7,16 +7,22 @@
  */
 
 /* ─── Utility functions ─────────────────────────────────────── */
+// Name → phone map, built once per script execution instead of re-reading
+// the Clients sheet for every reminder.
+let _clientPhoneMap = null;
+
 function getClientPhone(name) {
-  const ss = SpreadsheetApp.openById(CONFIG.CLIENT_SHEET_ID);
-  const sh = ss.getSheetByName("PilatesHQ Clients");
-  const data = sh.getDataRange().getValues();
-  for (let i = 1; i < data.length; i++) {
-    if ((data[i][0] + "").trim().toLowerCase() === name.trim().toLowerCase()) {
-      return (data[i][1] + "").trim();
+  if (!_clientPhoneMap) {
+    const ss = SpreadsheetApp.openById(CONFIG.CLIENT_SHEET_ID);
+    const sh = ss.getSheetByName("PilatesHQ Clients");
+    const data = sh.getDataRange().getValues();
+    _clientPhoneMap = {};
+    for (let i = 1; i < data.length; i++) {
+      const key = (data[i][0] + "").trim().toLowerCase();
+      if (key && !(key in _clientPhoneMap)) _clientPhoneMap[key] = (data[i][1] + "").trim();
     }
   }
-  return null;
+  return _clientPhoneMap[(name + "").trim().toLowerCase()] || null;
 }
 
 function sendWhatsAppText(to, body) {
@@ -11,9 +11,17 @@ Includes:
  • client_menu_router   → Client Self-Service Menu
  • tasks_router         → Time-based jobs bridge (GAS → WhatsApp)
  • admin_exports_router → Admin exports (standardised “(x)” markers)
+ • router_diag          → /diag/* runtime diagnostics (DIAG_TOKEN)
+
+get_app() (also `from app import app`) is the one process-wide
+instance: wsgi.py, root main.py and app/main.py all serve it, and
+gunicorn.conf.py preloads it in the master before forking.
 ────────────────────────────────────────────────────────────
 """
 
+from . import startup
+startup.begin()  # before anything heavy is imported (STARTUP_IMPORT_TRACE)
+
 import os
 import logging
 from flask import Flask, jsonify
@@ -21,61 +29,106 @@ from flask import Flask, jsonify
 def create_app():
     app = Flask(__name__)
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    )
+    # Queue-backed JSON logging (LOG_LEVEL / LOG_FORMAT / LOG_SAMPLE_RATE)
+    from .logging_setup import configure as configure_logging
+    configure_logging()
     log = logging.getLogger("pilateshq_init")
     log.info("🚀 Starting PilatesHQ Render Backend")
 
+    # Per-request span tracing (X-Request-ID, [trace] lines), in-process
+    # metrics at /metrics (METRICS_DIR merges gunicorn workers) and
+    # /ready (cached dependency probes, 503 until the app is up)
+    with startup.step("observability"):
+        from .tracing import init_app as init_tracing
+        init_tracing(app)
+        from .metrics import init_app as init_metrics
+        init_metrics(app)
+        from .readiness import init_app as init_readiness
+        init_readiness(app)
+
     # router_webhook
     try:
-        from .router_webhook import router_bp
-        app.register_blueprint(router_bp, url_prefix="/")
+        with startup.step("router_webhook"):
+            from .router_webhook import router_bp
+            app.register_blueprint(router_bp, url_prefix="/")
         log.info("✅ router_webhook registered")
     except Exception as e:
         log.error(f"❌ router_webhook failed to register: {e}")
 
     # invoices_router
     try:
-        from .invoices_router import bp as invoices_bp
-        app.register_blueprint(invoices_bp, url_prefix="/invoices")
+        with startup.step("invoices_router"):
+            from .invoices_router import bp as invoices_bp
+            app.register_blueprint(invoices_bp, url_prefix="/invoices")
         log.info("✅ invoices_router registered")
     except Exception as e:
         log.error(f"❌ invoices_router failed to register: {e}")
 
     # client_behaviour
     try:
-        from .client_behaviour import bp as behaviour_bp
-        app.register_blueprint(behaviour_bp, url_prefix="/behaviour")
+        with startup.step("client_behaviour"):
+            from .client_behaviour import bp as behaviour_bp
+            app.register_blueprint(behaviour_bp, url_prefix="/behaviour")
         log.info("✅ client_behaviour registered")
     except Exception as e:
         log.warning(f"⚠️ client_behaviour not loaded: {e}")
 
     # client_menu_router
     try:
-        from .client_menu_router import bp as client_menu_bp
-        app.register_blueprint(client_menu_bp, url_prefix="/client-menu")
+        with startup.step("client_menu_router"):
+            from .client_menu_router import bp as client_menu_bp
+            app.register_blueprint(client_menu_bp, url_prefix="/client-menu")
         log.info("✅ client_menu_router registered")
     except Exception as e:
         log.error(f"❌ client_menu_router failed to register: {e}")
 
     # tasks_router (GAS → reminders bridge)
     try:
-        from .tasks_router import tasks_bp
-        app.register_blueprint(tasks_bp, url_prefix="/tasks")
+        with startup.step("tasks_router"):
+            from .tasks_router import tasks_bp
+            app.register_blueprint(tasks_bp, url_prefix="/tasks")
         log.info("✅ tasks_router registered")
     except Exception as e:
         log.error(f"❌ tasks_router failed to register: {e}")
 
+    # standing_router (admin book / suspend / resume → GAS)
+    try:
+        with startup.step("standing_router"):
+            from .standing_router import register_standing_routes
+            register_standing_routes(app)
+        log.info("✅ standing_router registered")
+    except Exception as e:
+        log.error(f"❌ standing_router failed to register: {e}")
+
     # admin_exports_router (standardised “(x)”)
     try:
-        from .admin_exports_router import bp as admin_exports_bp
-        app.register_blueprint(admin_exports_bp, url_prefix="/admin")
+        with startup.step("admin_exports_router"):
+            from .admin_exports_router import bp as admin_exports_bp
+            app.register_blueprint(admin_exports_bp, url_prefix="/admin")
         log.info("✅ admin_exports_router registered")
     except Exception as e:
         log.error(f"❌ admin_exports_router failed to register: {e}")
 
+    # router_diag (/diag/* runtime diagnostics)
+    try:
+        with startup.step("router_diag"):
+            from .router_diag import bp as diag_bp
+            app.register_blueprint(diag_bp)
+        log.info("✅ router_diag registered")
+    except Exception as e:
+        log.error(f"❌ router_diag failed to register: {e}")
+
+    # Optional in-process reminder scheduler (INPROCESS_SCHEDULER=1);
+    # a preloading gunicorn master leaves it to each worker (warmup.postfork)
+    try:
+        with startup.step("scheduler"):
+            from .warmup import PRELOADED
+            if not PRELOADED:
+                from .scheduler import start_if_enabled
+                start_if_enabled()
+    except Exception as e:
+        log.error(f"❌ scheduler failed to start: {e}")
+
     @app.route("/health", methods=["GET"])
     def health_root():
         return jsonify({
@@ -87,7 +140,10 @@ def create_app():
                 "/behaviour/*",
                 "/client-menu/*",
                 "/tasks/*",
-                "/admin/*"
+                "/admin/*",
+                "/diag/*",
+                "/metrics",
+                "/ready"
             ]
         }), 200
 
@@ -97,12 +153,28 @@ def create_app():
         "TEMPLATE_LANG": os.getenv("TEMPLATE_LANG"),
         "GAS_WEBHOOK_URL": os.getenv("GAS_WEBHOOK_URL"),
     }
-    log.info(f"🌍 Environment summary: {debug_envs}")
+    log.debug(f"🌍 Environment summary: {debug_envs}")  # numbers / URLs: not for INFO logs
+
+    # Cold-start report at /diag/startup; marks the app ready
+    startup.init_app(app)
     return app
 
-app = create_app()
+_app = None
+
+def get_app():
+    """The process-wide app, built on first call (importing app.* modules no longer builds it)."""
+    global _app
+    if _app is None:
+        _app = create_app()
+    return _app
+
+def __getattr__(name):
+    # `from app import app` / gunicorn "app:app" keep working
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 5000))
     logging.getLogger("pilateshq_init").info(f"🏁 Running Flask app on port {port}")
-    app.run(host="0.0.0.0", port=port, debug=False)
+    get_app().run(host="0.0.0.0", port=port, debug=False)
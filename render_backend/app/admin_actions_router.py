@@ -14,13 +14,14 @@ import os, re, logging, requests
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 from .utils import send_safe_message
+from .config import gas_url
 
 bp = Blueprint("admin_actions_bp", __name__)
 log = logging.getLogger(__name__)
 
 # Environment variables
 NADINE_WA = os.getenv("NADINE_WA", "")
-GAS_INVOICE_URL = os.getenv("GAS_INVOICE_URL", "")  # same as attendance.gs endpoint
+GAS_INVOICE_URL = gas_url("GAS_INVOICE_URL")  # same as attendance.gs endpoint
 SHEET_ID = os.getenv("CLIENT_SHEET_ID", "")
 TZ = "Africa/Johannesburg"
 
@@ -7,16 +7,16 @@ Handles Nadine’s natural-language admin actions for:
 ────────────────────
 """
 
-import os
 import requests
 import logging
 from .admin_nlp import parse_admin_command
 from .settings import ADMIN_NUMBER
 from .utils import send_safe_message
+from .config import gas_url
 
 log = logging.getLogger(__name__)
 
-GAS_INVOICE_URL = os.getenv("GAS_INVOICE_URL", "")
+GAS_INVOICE_URL = gas_url("GAS_INVOICE_URL")
 NADINE_WA = ADMIN_NUMBER
 
 
@@ -3,11 +3,14 @@ admin_bookings.py
 ────────────────────────────────────────────
 Handles booking-related admin commands using Google Sheets integration.
 Now auto-closes any related reschedule once booking succeeds.
+Recurring bookings are planned by recurring.py and written in one
+background bulk call, so Nadine's confirmation is immediate.
+Every booking is checked against the slot index (full / double-booked)
+before anything is sent to Apps Script.
 ────────────────────────────────────────────
 """
 
 import logging
-from datetime import date, timedelta
 from .utils import (
     send_whatsapp_text,
     safe_execute,
@@ -16,7 +19,9 @@ from .utils import (
     post_with_retry,  # ✅ new import for retry-enabled POST
 )
 from .admin_utils import _find_client_matches, _confirm_or_disambiguate
-from .config import WEBHOOK_BASE, NADINE_WA
+from .recurring import plan_weekly, split_conflicts, submit_bulk, weekday_index
+from .slot_index import slots
+from .config import WEBHOOK_BASE, SHEETS_API_URL, NADINE_WA
 
 log = logging.getLogger(__name__)
 
@@ -36,8 +41,8 @@ def normalize_time(t: str) -> str:
     return t
 
 
-def _add_session_to_sheet(client_name, wa_number, session_date, start_time, slot_type, status="confirmed", notes=""):
-    """Append a booking row to the Google Sheet via Apps Script endpoint."""
+def _add_session_to_sheet(client_name, wa_number, session_date, start_time, slot_type, status="confirmed", notes="") -> bool:
+    """Append a booking row to the Google Sheet via Apps Script endpoint; True if GAS accepted it."""
     payload = {
         "action": "add_session",
         "client_name": client_name,
@@ -49,7 +54,11 @@ def _add_session_to_sheet(client_name, wa_number, session_date, start_time, slot
         "notes": notes,
     }
     log.info(f"[Sheets] Adding session for {client_name} on {session_date} {start_time} ({slot_type})")
-    post_to_webhook(f"{WEBHOOK_BASE}/sheets", payload)
+    res = post_to_webhook(SHEETS_API_URL, payload)
+    if isinstance(res, dict) and res.get("ok") is not False:
+        return True
+    log.warning(f"[Sheets] add_session failed for {client_name} on {session_date} {start_time}: {res}")
+    return False
 
 
 def _notify_booking(client_name, wa_number, session_date, session_time, slot_type):
@@ -83,6 +92,47 @@ def _auto_close_reschedule(client_name: str):
         log.warning(f"[AUTO CLOSE] Unexpected error closing reschedule for {client_name}: {e}")
 
 
+_CONFLICT_LABELS = {"double_booked": "already booked", "full": "slot full"}
+
+
+def _slot_problem(res: dict) -> str:
+    """Human text for a failed slot check."""
+    if res.get("reason") == "double_booked":
+        return "is already booked in that slot"
+    return f"cannot be added – slot is full ({res.get('booked')}/{res.get('capacity')})"
+
+
+def _conflict_note(conflicts: list) -> str:
+    if not conflicts:
+        return ""
+    dates = ", ".join(
+        f"{c['session_date']} {c['start_time']} ({_CONFLICT_LABELS.get(c.get('conflict'), 'conflict')})"
+        for c in conflicts[:5]
+    )
+    more = f" (+{len(conflicts) - 5} more)" if len(conflicts) > 5 else ""
+    return f"\n⚠ Skipped {len(conflicts)}: {dates}{more}"
+
+
+def _submit_recurring(client_name: str, rows: list, conflicts: list, admin_wa: str, label: str):
+    """Queue a single bulk sheet write; report failures and close reschedules when done."""
+    def _done(result: dict):
+        if not result.get("ok"):
+            safe_execute(
+                send_whatsapp_text,
+                admin_wa,
+                f"⚠ Saving recurring bookings for {client_name} failed: "
+                f"{result.get('error') or str(result.get('failed', '?')) + ' rows not written'}",
+                label=f"{label}_write_failed",
+            )
+            return
+        # 🔄 Auto-close any existing reschedule for this client
+        _auto_close_reschedule(client_name)
+
+    if rows:
+        submit_bulk(rows, on_done=_done)
+    log.info(f"[ADMIN BOOKING] {label}: queued={len(rows)} conflicts={len(conflicts)}")
+
+
 # ── Main Dispatcher ─────────────────────────────────────
 def handle_booking_command(parsed: dict, wa: str):
     """
@@ -104,7 +154,27 @@ def handle_booking_command(parsed: dict, wa: str):
         _, cname, wnum, _ = choice
 
         time_str = normalize_time(parsed["time"])
-        _add_session_to_sheet(cname, wnum, parsed["date"], time_str, parsed["slot_type"])
+        check = slots.check(parsed["date"], time_str, parsed["slot_type"], cname, wnum)
+        if not check["ok"]:
+            safe_execute(
+                send_whatsapp_text,
+                wa,
+                f"⚠ {cname} {_slot_problem(check)} on {parsed['date']} at {time_str}. Nothing was booked.",
+                label="book_single_rejected",
+            )
+            return
+        if not _add_session_to_sheet(cname, wnum, parsed["date"], time_str, parsed["slot_type"]):
+            safe_execute(
+                send_whatsapp_text,
+                wa,
+                f"⚠ Saving the session for {cname} on {parsed['date']} at {time_str} failed. Nothing was booked.",
+                label="book_single_write_failed",
+            )
+            return
+        slots.book([{
+            "client_name": cname, "wa_number": wnum or "", "session_date": str(parsed["date"]),
+            "start_time": time_str, "session_type": parsed["slot_type"], "status": "confirmed",
+        }])
 
         safe_execute(
             send_whatsapp_text,
@@ -126,28 +196,28 @@ def handle_booking_command(parsed: dict, wa: str):
             return
         _, cname, wnum, _ = choice
 
-        weekday = parsed["weekday"].lower()
+        weekday = weekday_index(parsed["weekday"])
+        if weekday is None:
+            safe_execute(
+                send_whatsapp_text,
+                wa,
+                f"⚠ Unknown weekday '{parsed['weekday']}'. Use e.g. Tuesday.",
+                label="book_recurring_bad_day",
+            )
+            return
         slot_time = normalize_time(parsed["time"])
         slot_type = parsed["slot_type"]
 
-        created = 0
-        today = date.today()
-        for offset in range(0, 8 * 7):  # next 8 weeks
-            d = today + timedelta(days=offset)
-            if d.strftime("%A").lower() != weekday:
-                continue
-            _add_session_to_sheet(cname, wnum, d, slot_time, slot_type)
-            created += 1
+        rows, conflicts = plan_weekly(cname, wnum, weekday, slot_time, slot_type)
+        _submit_recurring(cname, rows, conflicts, wa, label="book_recurring")
 
         safe_execute(
             send_whatsapp_text,
             wa,
-            f"📅 Created {created} weekly bookings for {cname} ({slot_type}).",
+            f"📅 Creating {len(rows)} weekly bookings for {cname} ({slot_type})."
+            + _conflict_note(conflicts),
             label="book_recurring",
         )
-
-        # 🔄 Auto-close any existing reschedule for this client
-        _auto_close_reschedule(cname)
         return
 
     # ── Multi-day Recurring ──────────────────────────
@@ -158,23 +228,29 @@ def handle_booking_command(parsed: dict, wa: str):
             return
         _, cname, wnum, _ = choice
 
-        created = 0
+        candidates = []
         for slot in parsed["slots"]:
             if "slot_type" not in slot and "type" in slot:
                 slot["slot_type"] = slot["type"]
-            d, t, ty = slot["date"], normalize_time(slot["time"]), slot["slot_type"]
-            _add_session_to_sheet(cname, wnum, d, t, ty)
-            created += 1
+            candidates.append({
+                "client_name": cname,
+                "wa_number": wnum or "",
+                "session_date": str(slot["date"]),
+                "start_time": normalize_time(slot["time"]),
+                "session_type": slot["slot_type"],
+                "status": "confirmed",
+                "notes": "",
+            })
+        rows, conflicts = split_conflicts(candidates)
+        _submit_recurring(cname, rows, conflicts, wa, label="book_multi")
 
         safe_execute(
             send_whatsapp_text,
             wa,
-            f"📅 Created {created} recurring bookings for {cname} across multiple days.",
+            f"📅 Creating {len(rows)} recurring bookings for {cname} across multiple days."
+            + _conflict_note(conflicts),
             label="book_multi",
         )
-
-        # 🔄 Auto-close any existing reschedule
-        _auto_close_reschedule(cname)
         return
 
     # ── Cancel Next ───────────────────────────────
@@ -186,7 +262,8 @@ def handle_booking_command(parsed: dict, wa: str):
         _, cname, wnum, _ = choice
 
         payload = {"action": "cancel_next", "wa": wnum}
-        post_to_webhook(f"{WEBHOOK_BASE}/sheets", payload)
+        post_to_webhook(SHEETS_API_URL, payload)
+        slots.cancel_next(wa_number=wnum, client_name=cname)
 
         safe_execute(
             send_whatsapp_text,
@@ -210,7 +287,7 @@ def handle_booking_command(parsed: dict, wa: str):
             "wa": wnum,
             "status": status,
         }
-        post_to_webhook(f"{WEBHOOK_BASE}/sheets", payload)
+        post_to_webhook(SHEETS_API_URL, payload)
 
         safe_execute(
             send_whatsapp_text,
@@ -16,7 +16,7 @@ Features:
 import re
 import logging
 from .utils import send_whatsapp_text, safe_execute, post_to_webhook
-from .config import WEBHOOK_BASE
+from .config import SHEETS_API_URL
 
 log = logging.getLogger(__name__)
 
@@ -30,7 +30,7 @@ _last_client_by_admin = {}   # { wa_number: "Client Name" }
 # ─────────────────────────────────────────────
 def _call_gas(action: str, payload: dict):
     try:
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets",
+        res = post_to_webhook(SHEETS_API_URL,
                               {**payload, "action": action})
         return res or {"ok": False, "error": "No response"}
     except Exception as e:
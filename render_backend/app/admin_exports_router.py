@@ -22,11 +22,13 @@ import os
 import logging
 import requests
 from flask import Blueprint, request, jsonify
+from .config import gas_url
+from .tracing import span
 
 bp = Blueprint("admin_exports_bp", __name__)
 log = logging.getLogger(__name__)
 
-GAS_WEBHOOK_URL = os.getenv("GAS_WEBHOOK_URL", "")
+GAS_WEBHOOK_URL = gas_url("GAS_WEBHOOK_URL")
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "35"))
 TEMPLATE_LANG = os.getenv("TEMPLATE_LANG", "en_US")
 
@@ -81,7 +83,8 @@ def _call_gas(action: str, wa_number: str | None) -> dict:
     if wa_number:
         payload["wa_number"] = str(wa_number).strip()
     try:
-        r = requests.post(GAS_WEBHOOK_URL, json=payload, timeout=REQUEST_TIMEOUT)
+        with span("gas", action):
+            r = requests.post(GAS_WEBHOOK_URL, json=payload, timeout=REQUEST_TIMEOUT)
         if not r.ok:
             return {"ok": False, "error": f"GAS HTTP {r.status_code}", "raw": r.text}
         return r.json()
@@ -8,7 +8,7 @@ Integrates directly with Google Sheets via webhook.
 
 import logging
 from .utils import safe_execute, send_whatsapp_text, normalize_wa, post_to_webhook
-from .config import WEBHOOK_BASE
+from .config import SHEETS_API_URL
 
 log = logging.getLogger(__name__)
 
@@ -46,7 +46,7 @@ def handle_flow_reply(msg: dict, from_wa: str):
             "notes": f"Registered via WhatsApp Flow ({from_wa})",
         }
 
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets", payload)
+        res = post_to_webhook(SHEETS_API_URL, payload)
         log.info(f"[ADMIN_FLOW] Added client via Sheets → {res}")
 
         # ✅ Confirm to Nadine (the admin submitting form)
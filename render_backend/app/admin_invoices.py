@@ -9,7 +9,8 @@ Now integrated with Google Sheets (Sessions, Clients, Packages).
 import logging
 from datetime import datetime, timedelta
 from .utils import send_whatsapp_text, safe_execute, normalize_wa, post_to_webhook
-from .config import WEBHOOK_BASE
+from .config import SHEETS_API_URL
+from .client_directory import directory as client_directory
 
 log = logging.getLogger(__name__)
 
@@ -44,16 +45,12 @@ def _normalize_month(month: str | None) -> tuple[str, str]:
 
 
 def _find_client(name: str):
-    """Look up a client by name via Google Sheets."""
+    """Look up a client by name via the shared client directory."""
     try:
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets", {"action": "get_clients"})
-        clients = res.get("clients", []) if isinstance(res, dict) else []
-
-        for c in clients:
-            cname = (c.get("name") or "").strip().lower()
-            if cname == name.lower():
-                wa = normalize_wa(c.get("phone") or "")
-                return c.get("client_id", None), wa
+        c = client_directory.by_name(name)
+        if c:
+            wa = normalize_wa(c.get("phone") or "")
+            return c.get("client_id", None), wa
         return None, None
     except Exception as e:
         log.error(f"❌ Error fetching clients from Sheets: {e}")
@@ -82,7 +79,7 @@ def send_invoice_admin(client_name: str, wa_number: str | None = None, month: st
 
     # Fetch sessions from Sheets
     try:
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets", {"action": "get_sessions"})
+        res = post_to_webhook(SHEETS_API_URL, {"action": "get_sessions"})
         sessions = res.get("sessions", []) if isinstance(res, dict) else []
         client_sessions = [
             s for s in sessions
@@ -133,15 +130,8 @@ def show_balance_admin(client_name: str, wa_number: str | None = None, admin_wa:
         return
 
     try:
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets", {"action": "get_packages"})
-        packages = res.get("packages", []) if isinstance(res, dict) else []
-
-        # Look for the latest active package
-        pkg = next(
-            (p for p in reversed(packages)
-             if (p.get("client_name", "").strip().lower() == client_name.lower())),
-            None
-        )
+        # Latest package per client, indexed by name in the client directory
+        pkg = client_directory.latest_package(client_name)
 
         if not pkg:
             msg = f"⚠ No active package found for {client_name}."
@@ -9,7 +9,7 @@ Replaces SQL logging with Google Sheets + webhook audit.
 import logging
 from datetime import datetime
 from .utils import send_whatsapp_text, normalize_wa, safe_execute, post_to_webhook
-from .config import WEBHOOK_BASE, TIMEZONE
+from .config import SHEETS_API_URL, TIMEZONE
 
 log = logging.getLogger(__name__)
 
@@ -30,7 +30,7 @@ def _log_notification(recipient: str, message: str, context: str = "general"):
             "message": message,
             "timestamp": ts,
         }
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets", payload)
+        res = post_to_webhook(SHEETS_API_URL, payload)
         log.info(f"[NOTIFY_LOG] {recipient} ({context}) → {res}")
     except Exception as e:
         log.error(f"❌ Failed to log notification ({context}): {e}")
@@ -4,9 +4,9 @@ admin_reminders.py
 Generates daily admin summaries from Google Sheets.
 
 Notes:
- • All time-based triggers (06h00 morning brief, 20h00 preview)
-   are executed in Google Apps Script.
- • Render backend exposes callable functions only — no CRON.
+ • Time-based triggers (06h00 morning brief, 20h00 preview) come from
+   Google Apps Script, or from app.scheduler when INPROCESS_SCHEDULER=1.
+ • Sessions are read from the per-worker session snapshot.
 
 Sends WhatsApp template messages:
  - Morning summary (06h00 via GAS)
@@ -18,27 +18,24 @@ import logging
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from typing import List, Dict
-from .config import ADMIN_NUMBERS, WEBHOOK_BASE
+from .config import ADMIN_NUMBERS
+from .session_snapshot import snapshot
 from . import utils
 
 log = logging.getLogger(__name__)
 TZ = ZoneInfo("Africa/Johannesburg")
 
 def _fetch_sessions(target_date: datetime.date) -> Dict[str, List[str]]:
-    """Fetch confirmed sessions for the given date from Google Sheets."""
+    """Confirmed sessions for the given date from the session snapshot."""
     try:
-        payload = {"action": "get_sessions"}
-        res = utils.post_to_webhook(f"{WEBHOOK_BASE}/sheets", payload)
-        rows = res.get("sessions", []) if isinstance(res, dict) else []
         by_hour: Dict[str, List[str]] = {}
         date_str = target_date.strftime("%Y-%m-%d")
 
-        for row in rows:
-            session_date = row.get("session_date")
+        for row in snapshot.on_date(date_str, active_only=False):
             time = row.get("start_time")
             client = row.get("client_name")
             status = (row.get("status") or "").lower()
-            if session_date == date_str and status == "confirmed":
+            if status == "confirmed":
                 by_hour.setdefault(time, []).append(client)
         return by_hour
     except Exception as e:
@@ -5,15 +5,15 @@ admin_utils.py
 Shared utilities for admin modules:
  - Client lookup and creation
  - DOB formatting
- - Hybrid fuzzy client matching (via Google Sheets)
+ - Hybrid fuzzy client matching (indexed, via client_directory)
  - Disambiguation helper
 """
 
 import logging
 from datetime import datetime
-from difflib import get_close_matches
 from .utils import send_whatsapp_text, safe_execute, post_to_webhook
-from .config import WEBHOOK_BASE, SHEETS_API_URL
+from .config import SHEETS_API_URL
+from .client_directory import directory as client_directory
 
 log = logging.getLogger(__name__)
 
@@ -23,28 +23,37 @@ CLIENTS_SHEET = "Clients"
 # ─────────────────────────────────────────────────────────────
 # Client Lookup / Creation
 # ─────────────────────────────────────────────────────────────
+def _client_tuple(r: dict):
+    cname = (r.get("name") or "").strip()
+    return r.get("client_id"), r.get("phone"), cname, f"{r.get('dob_day','')}-{r.get('dob_month','')}"
+
+
 def _find_or_create_client(name: str, wa_number: str | None = None):
     """
-    Look up a client by name in the Google Sheet.
-    If not found and wa_number is given, create a new record.
+    Look up a client by name in the shared client directory (Clients sheet).
+    If not found and wa_number is given, re-read the sheet and create a new
+    record only if neither the name nor the number is there
+    (all None if the sheet could not be read or rejected it).
     Returns (client_id, wa_number, name, dob_day+month)
     """
     try:
-        # ✅ Fetch client data from Apps Script (Clients sheet)
-        payload = {"action": "get_clients"}
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets", payload)
-        rows = res.get("clients", []) if isinstance(res, dict) else []
-
-        # Search for exact match
-        for r in rows:
-            cname = (r.get("name") or "").strip()
-            if cname.lower() == name.lower():
-                return r.get("client_id"), r.get("phone"), cname, f"{r.get('dob_day','')}-{r.get('dob_month','')}"
+        # ✅ O(1) lookup in the per-worker directory (no full-sheet fetch)
+        r = client_directory.by_name(name)
+        if r:
+            return _client_tuple(r)
     except Exception as e:
         log.warning(f"[Sheets] Failed to fetch clients: {e}")
 
     # Not found → create if number provided
     if wa_number:
+        # The directory can be minutes stale or miss rows added in the sheet / by
+        # another worker: check the sheet itself before adding a second row
+        if not client_directory.reload():
+            log.warning(f"[Sheets] Clients sheet unreadable; not creating {name} ({wa_number})")
+            return None, None, None, None
+        r = client_directory.by_name(name) or client_directory.by_wa(wa_number)
+        if r:
+            return _client_tuple(r)
         payload = {
             "action": "add_client",
             "name": name,
@@ -54,7 +63,12 @@ def _find_or_create_client(name: str, wa_number: str | None = None):
             "status": "active",
             "notes": "Auto-added via admin command"
         }
-        post_to_webhook(f"{WEBHOOK_BASE}/sheets", payload)
+        res = post_to_webhook(SHEETS_API_URL, payload)
+        if not (isinstance(res, dict) and res.get("ok")):
+            # Keep the directory in step with the sheet: no local row for a client GAS did not add
+            log.warning(f"[Sheets] add_client failed for {name} ({wa_number}): {res}")
+            return None, None, None, None
+        client_directory.upsert({k: v for k, v in payload.items() if k != "action"})
         log.info(f"[Sheets] Created new client {name} ({wa_number})")
         return None, wa_number, name, None
 
@@ -76,35 +90,20 @@ def _format_dob(dob: str | None) -> str | None:
 
 
 # ─────────────────────────────────────────────────────────────
-# Hybrid Client Matching (Fuzzy + Substring)
+# Hybrid Client Matching (Indexed Fuzzy + Substring)
 # ─────────────────────────────────────────────────────────────
 def _find_client_matches(name: str):
-    """Return list of possible client matches from Google Sheet."""
+    """Return ranked list of possible client matches from the client directory."""
     try:
-        payload = {"action": "get_clients"}
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets", payload)
-        rows = res.get("clients", []) if isinstance(res, dict) else []
-
-        if not rows:
-            return []
-
-        all_clients = [r.get("name", "") for r in rows if r.get("name")]
-        fuzzy = set(get_close_matches(name, all_clients, n=5, cutoff=0.6))
-        substring = [r for r in rows if name.lower() in (r.get("name", "").lower())]
-
-        # Combine
-        matches = []
-        for r in rows:
-            cname = r.get("name")
-            if cname in fuzzy or r in substring:
-                matches.append((
-                    r.get("client_id", ""),
-                    cname,
-                    r.get("phone", ""),
-                    f"{r.get('dob_day','')}-{r.get('dob_month','')}"
-                ))
-
-        return matches
+        return [
+            (
+                r.get("client_id", ""),
+                r.get("name"),
+                r.get("phone", ""),
+                f"{r.get('dob_day','')}-{r.get('dob_month','')}"
+            )
+            for _, r in client_directory.search(name, limit=5, cutoff=0.6)
+        ]
 
     except Exception as e:
         log.error(f"❌ Failed to match client: {e}")
@@ -0,0 +1,348 @@
+"""
+async_clients.py
+────────────────────────────────────────────
+Asyncio client layer for the Meta Graph API and GAS, for fan-out paths
+(reminders, broadcasts, invoice send + email) that would otherwise wait
+on one blocking `requests` call after another.
+
+ • One background event loop per worker process, in a daemon thread
+   started on first use (never at import, so it survives gunicorn forks)
+ • httpx.AsyncClient with a shared keep-alive pool when httpx is
+   installed (imported with the loop, not at cold start); without it
+   the same coroutines run `requests` on a bounded thread pool
+ • ASYNC_MAX_CONCURRENCY caps in-flight requests per worker
+ • Sync code uses run() / run_all() / submit(), or the ready-made
+   send_templates() / post_many(); results come back in input order and
+   have the same shape as the sync helpers in utils
+ • Under gevent (WORKER_PROFILE=gevent) there is no loop thread: each
+   coroutine runs to completion in its own greenlet, with the HTTP call
+   made through utils.http() (cooperative once monkey-patched) – an
+   asyncio loop cannot share its OS thread with other greenlets' loops
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import requests
+
+from . import utils
+from .tracing import span
+from .logging_setup import SAMPLED
+from .utils import DEFAULT_LANG, clean_text, normalize_wa
+from .wa_templates import build_payloads
+
+log = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = int(os.getenv("ASYNC_MAX_CONCURRENCY", "32"))
+GRAPH_TIMEOUT = 10.0
+GAS_TIMEOUT = 20.0
+
+stats = {"inflight": 0, "requests": 0}  # only touched on the loop thread (the hub's OS thread under gevent)
+
+
+class _BackgroundLoop:
+    """Event loop + HTTP state owned by one worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        # Created on the loop thread, reset with the loop
+        self.sem: Optional[asyncio.Semaphore] = None
+        self.client = None
+        self.pool: Optional[ThreadPoolExecutor] = None
+
+    def _alive(self) -> bool:
+        return self._loop is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def get(self) -> asyncio.AbstractEventLoop:
+        if not self._alive():
+            with self._lock:
+                if not self._alive():
+                    loop = asyncio.new_event_loop()
+                    self.sem, self.client, self.pool = None, None, None
+                    self._thread = threading.Thread(target=loop.run_forever, name="async-clients", daemon=True)
+                    self._thread.start()
+                    self._loop, self._pid = loop, os.getpid()
+                    log.info(f"[async] background loop started (httpx={'yes' if _httpx() else 'no'}, "
+                             f"max_concurrency={MAX_CONCURRENCY})")
+        return self._loop
+
+    def in_loop_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def state(self):
+        """Semaphore / client / pool; only called from coroutines on the loop."""
+        if self.sem is None:
+            self.sem = asyncio.Semaphore(MAX_CONCURRENCY)
+            httpx = _httpx()
+            if httpx is not None:
+                self.client = httpx.AsyncClient(
+                    follow_redirects=True,  # GAS web apps answer with a 302
+                    limits=httpx.Limits(max_connections=MAX_CONCURRENCY, max_keepalive_connections=MAX_CONCURRENCY),
+                )
+            else:
+                self.pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="async-io")
+        return self
+
+
+_bg = _BackgroundLoop()
+
+
+@functools.lru_cache(maxsize=1)
+def _httpx():
+    """httpx on first use (not at import – it is only needed once something fans out)."""
+    try:
+        import httpx
+    except ImportError:  # optional: fall back to requests on a thread pool
+        return None
+    return httpx
+
+
+@functools.lru_cache(maxsize=1)
+def _green() -> bool:
+    """True in a gevent-patched worker (checked on first use, after gunicorn.conf.py patched)."""
+    monkey = sys.modules.get("gevent.monkey")
+    return bool(monkey and monkey.is_module_patched("socket"))
+
+
+@functools.lru_cache(maxsize=1)
+def _green_slots() -> threading.BoundedSemaphore:
+    return threading.BoundedSemaphore(MAX_CONCURRENCY)  # a gevent semaphore once patched
+
+
+def _drive(coro):
+    """Run a coroutine that never suspends: in green mode every await below completes inline."""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    coro.close()
+    raise RuntimeError("coroutine suspended outside an event loop")
+
+
+def _green_submit(coro) -> Future:
+    import gevent
+
+    fut: Future = Future()
+    ctx = contextvars.copy_context()  # request ID / trace follow the greenlet
+
+    def _run():
+        try:
+            fut.set_result(ctx.run(_drive, coro))
+        except BaseException as e:
+            fut.set_exception(e)
+
+    gevent.spawn(_run)
+    return fut
+
+
+# ─────────────────────────────────────────────
+# Sync bridge
+# ─────────────────────────────────────────────
+def submit(coro) -> Future:
+    """Schedule a coroutine on the background loop (a greenlet under gevent); returns a concurrent Future."""
+    if _green():
+        return _green_submit(coro)
+    return asyncio.run_coroutine_threadsafe(coro, _bg.get())
+
+
+def run(coro, timeout: Optional[float] = None):
+    """Run a coroutine on the background loop and wait for its result."""
+    if _bg.in_loop_thread():
+        coro.close()
+        raise RuntimeError("async_clients.run() called from the event loop thread – await instead")
+    return submit(coro).result(timeout)
+
+
+async def _gather(coros: Sequence):
+    return await asyncio.gather(*coros, return_exceptions=True)
+
+
+def run_all(coros: Iterable, timeout: Optional[float] = None) -> list:
+    """Run coroutines concurrently; exceptions become {"ok": False, "error": ...} in place."""
+    coros = list(coros)
+    if not coros:
+        return []
+    if _green():
+        futures = [submit(c) for c in coros]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        results = []
+        for f in futures:
+            f_timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            results.append(f.exception(f_timeout) or f.result())
+    else:
+        results = run(_gather(coros), timeout)
+    return [
+        {"ok": False, "error": str(r) or type(r).__name__} if isinstance(r, BaseException) else r
+        for r in results
+    ]
+
+
+async def to_thread(func, *args, **kwargs):
+    """Await a blocking helper (e.g. send_safe_message) without blocking the loop."""
+    if _green():
+        with _green_slots():
+            return func(*args, **kwargs)  # already on its own greenlet
+    st = _bg.state()
+    ctx = contextvars.copy_context()  # keep the request ID / trace in the worker thread
+    async with st.sem:
+        return await asyncio.get_running_loop().run_in_executor(
+            st.pool, functools.partial(ctx.run, func, *args, **kwargs))
+
+
+# ─────────────────────────────────────────────
+# Transport
+# ─────────────────────────────────────────────
+async def _request(method: str, url: str, *, content: bytes = None, json_body=None,
+                   headers: dict = None, timeout: float = GRAPH_TIMEOUT) -> Tuple[int, str]:
+    stats["inflight"] += 1  # waiting for a slot or on the wire
+    stats["requests"] += 1
+    try:
+        if _green():
+            with _green_slots():
+                r = utils.http().request(method, url, data=content, json=json_body, headers=headers,
+                                         timeout=timeout)
+            return r.status_code, r.text
+        st = _bg.state()
+        async with st.sem:
+            if st.client is not None:
+                r = await st.client.request(method, url, content=content, json=json_body, headers=headers,
+                                            timeout=timeout)
+                return r.status_code, r.text
+            call = functools.partial(requests.request, method, url, data=content, json=json_body,
+                                     headers=headers, timeout=timeout)
+            r = await asyncio.get_running_loop().run_in_executor(st.pool, call)
+            return r.status_code, r.text
+    finally:
+        stats["inflight"] -= 1
+
+
+def _parse(text: str) -> dict:
+    try:
+        return json.loads(text) if text else {}
+    except ValueError:
+        return {}
+
+
+# ─────────────────────────────────────────────
+# Async Graph sender
+# ─────────────────────────────────────────────
+async def send_template(to: str, name: str, lang: str = DEFAULT_LANG, variables=None) -> dict:
+    """Async twin of utils.send_whatsapp_template (same validation, journal and result shape)."""
+    if not utils.META_PHONE_ID or not utils.META_ACCESS_TOKEN:
+        log.warning("⚠️ Meta credentials missing, cannot send message.")
+        return {"ok": False, "error": "missing credentials"}
+
+    safe_vars = [clean_text(v) for v in (variables or [])]
+    wa = normalize_wa(to)
+    started = time.perf_counter()
+    bodies, err = build_payloads(wa, name, lang, safe_vars)
+    if err:
+        log.error(f"❌ WhatsApp template rejected locally → {to} ({name}): {err}")
+        utils._journal(wa, name, started, None, {}, 0, error="invalid_params")
+        return {"ok": False, "error": err, "rejected": True}
+
+    out = None
+    for body in bodies:
+        out = await _post_graph(wa, to, name, body, started)
+        if not out["ok"]:
+            break
+        started = time.perf_counter()
+    return out
+
+
+async def send_text(to: str, text: str) -> dict:
+    """Async twin of utils.send_whatsapp_text."""
+    if not utils.META_PHONE_ID or not utils.META_ACCESS_TOKEN:
+        log.warning("⚠️ Meta credentials missing.")
+        return {"ok": False, "error": "missing credentials"}
+    wa = normalize_wa(to)
+    body = json.dumps({
+        "messaging_product": "whatsapp",
+        "recipient_type": "individual",
+        "to": wa,
+        "type": "text",
+        "text": {"preview_url": False, "body": clean_text(text)},
+    }).encode()
+    return await _post_graph(wa, to, "(text)", body, time.perf_counter())
+
+
+async def _post_graph(wa: str, to: str, name: str, body: bytes, started: float) -> dict:
+    try:
+        with span("graph", name):
+            status, text = await _request("POST", utils._MESSAGES_URL, content=body, headers=utils._HEADERS)
+        result = _parse(text)
+        utils._journal(wa, name, started, status, result, len(body))
+        if status >= 400:
+            log.error(f"❌ WhatsApp API error {status}: {text}")
+            return {"ok": False, "status_code": status, "error": text}
+        log.info("✅ WhatsApp message sent to %s (%s)", to, name, extra=SAMPLED)
+        return {"ok": True, "status_code": status, "response": result}
+    except Exception as e:
+        utils._journal(wa, name, started, None, {}, len(body), error=type(e).__name__)
+        log.error(f"❌ WhatsApp send failed ({name} → {to}): {e!r}")
+        return {"ok": False, "error": str(e) or type(e).__name__}
+
+
+# ─────────────────────────────────────────────
+# Async GAS gateway
+# ─────────────────────────────────────────────
+async def post_json(url: str, payload: dict, timeout: float = GAS_TIMEOUT,
+                    retries: int = 0, backoff: float = 2.0) -> dict:
+    """
+    Async twin of utils.post_to_webhook (parsed JSON or an {ok: False}
+    fallback). HTTP / transport failures are retried `retries` times,
+    sleeping `backoff` seconds between attempts without holding a slot.
+    """
+    if not url:
+        return {"ok": False, "error": "missing url"}
+    res = {}
+    for attempt in range(retries + 1):
+        if attempt:
+            if _green():
+                time.sleep(backoff)  # patched: yields to other greenlets
+            else:
+                await asyncio.sleep(backoff)
+        try:
+            with span("gas", payload.get("action") or "post"):
+                status, text = await _request("POST", url, json_body=payload, timeout=timeout)
+            if 200 <= status < 300:
+                return _parse(text) or {"ok": True}
+            log.warning(f"⚠️ post_json: {url} returned {status} ({attempt + 1}/{retries + 1})")
+            res = {"ok": False, "status": status, "text": text}
+        except Exception as e:
+            log.error(f"❌ post_json failed ({attempt + 1}/{retries + 1}): {e!r}")
+            res = {"ok": False, "error": str(e) or type(e).__name__}
+    return res
+
+
+def fire_and_forget(url: str, payload: dict, timeout: float = GAS_TIMEOUT):
+    """Best-effort POST (log lines etc.); returns immediately, failures are only logged."""
+    if url:
+        submit(post_json(url, payload, timeout))
+
+
+# ─────────────────────────────────────────────
+# Ready-made sync fan-outs
+# ─────────────────────────────────────────────
+def send_templates(jobs: Sequence[tuple], timeout: Optional[float] = None) -> List[dict]:
+    """Send (to, name, lang, variables) jobs concurrently; results in job order."""
+    return run_all((send_template(*job) for job in jobs), timeout)
+
+
+def post_many(calls: Sequence[Tuple[str, dict]], timeout: Optional[float] = None) -> List[dict]:
+    """POST (url, payload) pairs concurrently; results in call order."""
+    return run_all((post_json(url, payload) for url, payload in calls), timeout)
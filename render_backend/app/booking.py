@@ -10,13 +10,21 @@ Functions:
  - admin_reserve() — Admin books a single session (posts to Sheets)
  - create_recurring_bookings() — Admin sets up a recurring booking
  - create_multi_recurring_bookings() — Admin creates multiple recurring slots
+
+Admin bookings are checked against the slot index (capacity / double
+booking) before anything is posted to Sheets, and recorded in it only
+once Sheets has accepted them. Weekday-based recurring slots are
+checked and written on their next date.
 """
 
 from __future__ import annotations
 import logging
 import requests
+from datetime import date as _date, timedelta
 from .utils import send_whatsapp_text, normalize_wa, safe_execute
 from .config import NADINE_WA, WEB_APP_URL  # ✅ ensure WEB_APP_URL is defined in .config
+from .slot_index import slots as slot_index
+from .recurring import weekday_index
 
 log = logging.getLogger(__name__)
 
@@ -45,6 +53,31 @@ def show_bookings(wa_number: str):
 
 
 # ── Admin booking functions ───────────────────────────
+def _post_session(payload: dict, label: str) -> bool:
+    """POST one add_session to the Apps Script Web App; True on HTTP 200."""
+    try:
+        res = requests.post(WEB_APP_URL, json=payload, timeout=10)
+        if res.status_code == 200:
+            log.info(f"[{label}] Added session to Sheets: {payload}")
+            return True
+        log.warning(f"[{label}] Failed to post session ({res.status_code}): {res.text}")
+    except Exception as e:
+        log.exception(f"[{label}] Error posting to Sheets: {e}")
+    return False
+
+
+def _slot_date(s: dict) -> str:
+    """A slot's explicit date, else the next date (today included) on its weekday."""
+    if s.get("date"):
+        return str(s["date"])
+    wd = s.get("weekday")
+    wd = wd if isinstance(wd, int) else weekday_index(str(wd or ""))
+    if wd is None:
+        return ""
+    today = _date.today()
+    return (today + timedelta(days=(wd - today.weekday()) % 7)).isoformat()
+
+
 def admin_reserve(
     name: str,
     date: str,
@@ -56,7 +89,22 @@ def admin_reserve(
     """
     Create a single booking entry and notify Nadine.
     Posts directly to Google Sheets via Apps Script Web App.
+    Returns the slot check; full or double-booked slots are not posted.
     """
+    check = slot_index.check(date, time, slot_type.lower(), name, wa_number or "")
+    if not check["ok"]:
+        log.warning(f"[booking.admin_reserve] Rejected {name} on {date} {time}: {check}")
+        if NADINE_WA:
+            why = "already booked in that slot" if check["reason"] == "double_booked" \
+                else f"slot full ({check['booked']}/{check['capacity']})"
+            safe_execute(
+                send_whatsapp_text,
+                normalize_wa(NADINE_WA),
+                f"⚠ Booking not created for {name} on {date} {time}: {why}.",
+                label="admin_booking_rejected",
+            )
+        return check
+
     log.info(f"[booking.admin_reserve] Booking created for {name} ({slot_type}) on {date} {time}")
 
     # Build payload for Apps Script
@@ -71,14 +119,16 @@ def admin_reserve(
         "notes": partner or "",
     }
 
-    try:
-        res = requests.post(WEB_APP_URL, json=payload, timeout=10)
-        if res.status_code == 200:
-            log.info(f"[booking.admin_reserve] Added session to Sheets for {name}")
-        else:
-            log.warning(f"[booking.admin_reserve] Failed to post session ({res.status_code}): {res.text}")
-    except Exception as e:
-        log.exception(f"[booking.admin_reserve] Error posting to Sheets: {e}")
+    if not _post_session(payload, "booking.admin_reserve"):
+        if NADINE_WA:
+            safe_execute(
+                send_whatsapp_text,
+                normalize_wa(NADINE_WA),
+                f"⚠ Booking for {name} on {date} {time} could not be saved to Sheets.",
+                label="admin_booking_write_failed",
+            )
+        return {**check, "ok": False, "reason": "write_failed"}
+    slot_index.book([payload])
 
     if NADINE_WA:
         safe_execute(
@@ -88,6 +138,7 @@ def admin_reserve(
             f"📅 {date} {time}\n✨ {slot_type.title()}",
             label="admin_booking_notify",
         )
+    return check
 
 
 def create_recurring_bookings(
@@ -124,13 +175,33 @@ def create_multi_recurring_bookings(
     """
     Create multiple recurring bookings (e.g. Mon 08h00, Wed 09h00).
     Logs, posts each to Sheets, and notifies Nadine.
+    Slots that are full or already hold this client are skipped.
     """
     log.info(f"[booking.multi] Creating multi recurring bookings for {name}: {slots}")
 
-    for s in slots:
+    dates = [_slot_date(s) for s in slots]
+    rows = [
+        {
+            "session_date": d,
+            "start_time": s.get("time", ""),
+            "client_name": name,
+            "wa_number": wa_number or "",
+            "session_type": s.get("slot_type", "session").lower(),
+        }
+        for s, d in zip(slots, dates)
+    ]
+    _, rejected = slot_index.split(rows)
+    skipped = {(r["session_date"], r["start_time"]) for r in rejected}
+    if rejected:
+        log.warning(f"[booking.multi] Skipping {len(rejected)} slots: {rejected}")
+
+    failed = set()
+    for s, d in zip(slots, dates):
+        if (d, s.get("time", "")) in skipped:
+            continue
         payload = {
             "action": "add_session",
-            "session_date": s.get("date", ""),
+            "session_date": d,
             "start_time": s.get("time", ""),
             "client_name": name,
             "wa_number": wa_number or "",
@@ -138,20 +209,19 @@ def create_multi_recurring_bookings(
             "status": "confirmed",
             "notes": partner or "",
         }
-        try:
-            res = requests.post(WEB_APP_URL, json=payload, timeout=10)
-            if res.status_code == 200:
-                log.info(f"[booking.multi] Added session to Sheets: {payload}")
-            else:
-                log.warning(f"[booking.multi] Failed to post ({res.status_code}): {res.text}")
-        except Exception as e:
-            log.exception(f"[booking.multi] Error posting multi slot: {e}")
+        if _post_session(payload, "booking.multi"):
+            slot_index.book([payload])
+        else:
+            failed.add((d, s.get("time", "")))
 
     if NADINE_WA:
         slot_lines = []
-        for s in slots:
+        for s, d in zip(slots, dates):
             weekday_name = WEEKDAY_NAMES.get(s.get("weekday"), s.get("weekday", "Day"))
-            slot_lines.append(f"- {weekday_name} @ {s['time']} ({s['slot_type']})")
+            key = (d, s.get("time", ""))
+            flag = " ⚠ skipped (full / already booked)" if key in skipped else \
+                " ⚠ not saved (Sheets error)" if key in failed else ""
+            slot_lines.append(f"- {weekday_name} @ {s['time']} ({s['slot_type']}){flag}")
         details = "\n".join(slot_lines)
         safe_execute(
             send_whatsapp_text,
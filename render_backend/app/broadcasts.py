@@ -10,12 +10,15 @@ Supports:
 
 import logging
 import requests
-from . import utils
-from .config import TEMPLATE_LANG
+from . import async_clients
+from .config import gas_url, TEMPLATE_LANG
 
 log = logging.getLogger(__name__)
 
-GOOGLE_WEB_APP_URL = "https://script.google.com/macros/s/AKfycbzXQgwxZZDisjHRs78yQeG7xsDNynSLLKcAV57fn1mflZa1dtCKdNvK-0YpkqNtyJiBqQ/exec"  # ⚙️ Replace with your deployed URL
+GOOGLE_WEB_APP_URL = gas_url(
+    "BROADCASTS_WEB_APP_URL",
+    "https://script.google.com/macros/s/AKfycbzXQgwxZZDisjHRs78yQeG7xsDNynSLLKcAV57fn1mflZa1dtCKdNvK-0YpkqNtyJiBqQ/exec",  # ⚙️ Replace with your deployed URL
+)
 
 
 # ─────────────────────────────────────────────────────────────
@@ -33,22 +36,17 @@ def send_broadcast(to_numbers: list[str], message: str) -> int:
         log.warning("[broadcast] Skipped empty broadcast (no recipients or message).")
         return 0
 
+    # All recipients go out concurrently on the async client layer
+    results = async_clients.send_templates(
+        [(to, "admin_update_us", TEMPLATE_LANG, [message]) for to in to_numbers]  # ✅ Marketing template
+    )
     sent = 0
-    for to in to_numbers:
-        try:
-            resp = utils.send_whatsapp_template(
-                to,
-                "admin_update_us",  # ✅ Marketing template
-                TEMPLATE_LANG,
-                [message],
-            )
-            ok = resp.get("ok", False)
-            log.info("[broadcast] to=%s msg=%s status=%s ok=%s",
-                     to, message, resp.get("status_code"), ok)
-            if ok:
-                sent += 1
-        except Exception as e:
-            log.exception("[broadcast] Error sending to %s: %s", to, e)
+    for to, resp in zip(to_numbers, results):
+        ok = resp.get("ok", False)
+        log.info("[broadcast] to=%s msg=%s status=%s ok=%s",
+                 to, message, resp.get("status_code"), ok)
+        if ok:
+            sent += 1
 
     return sent
 
@@ -77,6 +75,7 @@ def send_broadcast_from_sheet(sheet_name: str = "Broadcasts") -> dict:
         sent = 0
         failed = 0
 
+        jobs = []
         for r in rows:
             name = (r.get("name") or "").strip()
             wa = (r.get("wa_number") or "").strip()
@@ -88,19 +87,18 @@ def send_broadcast_from_sheet(sheet_name: str = "Broadcasts") -> dict:
                 continue
 
             full_msg = msg.replace("{name}", name or "there")
-            try:
-                resp = utils.send_whatsapp_template(
-                    wa, "admin_update_us", TEMPLATE_LANG, [full_msg]
-                )
-                ok = resp.get("ok", False)
-                if ok:
-                    sent += 1
-                else:
-                    failed += 1
-                log.info("[broadcast_sheet] to=%s (%s) ok=%s", wa, name, ok)
-            except Exception as e:
+            jobs.append((wa, name, full_msg))
+
+        results = async_clients.send_templates(
+            [(wa, "admin_update_us", TEMPLATE_LANG, [full_msg]) for wa, _, full_msg in jobs]
+        )
+        for (wa, name, _), resp in zip(jobs, results):
+            ok = resp.get("ok", False)
+            if ok:
+                sent += 1
+            else:
                 failed += 1
-                log.exception("[broadcast_sheet] Error sending to %s: %s", wa, e)
+            log.info("[broadcast_sheet] to=%s (%s) ok=%s", wa, name, ok)
 
         summary = {"ok": True, "sent": sent, "failed": failed, "total": len(rows)}
         log.info("[broadcast_sheet] Summary: %s", summary)
@@ -14,11 +14,12 @@ import os
 import requests
 from datetime import datetime
 from .utils import send_whatsapp_text, send_safe_message, safe_execute
+from .config import gas_url
 
 log = logging.getLogger(__name__)
 
 # Your deployed Google Apps Script Web App URL
-APPS_SCRIPT_URL = os.getenv("APPS_SCRIPT_URL")
+APPS_SCRIPT_URL = gas_url("APPS_SCRIPT_URL")
 NADINE_WA = os.getenv("NADINE_WA", "")
 
 
@@ -10,11 +10,15 @@ import logging
 import requests
 from datetime import datetime
 from .utils import send_whatsapp_text, safe_execute, normalize_wa
+from .config import gas_url
 
 log = logging.getLogger(__name__)
 
 # Your deployed Google Apps Script URL
-APPS_SCRIPT_URL = "https://script.google.com/macros/s/AKfycbzXQgwxZZDisjHRs78yQeG7xsDNynSLLKcAV57fn1mflZa1dtCKdNvK-0YpkqNtyJiBqQ/exec"
+APPS_SCRIPT_URL = gas_url(
+    "CLIENT_BOOKINGS_URL",
+    "https://script.google.com/macros/s/AKfycbzXQgwxZZDisjHRs78yQeG7xsDNynSLLKcAV57fn1mflZa1dtCKdNvK-0YpkqNtyJiBqQ/exec",
+)
 
 
 # ───────────────────────────────────────────────
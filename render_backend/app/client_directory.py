@@ -0,0 +1,268 @@
+"""
+client_directory.py
+────────────────────────────────────────────
+Shared in-process client directory (Clients + Packages sheets).
+
+Replaces the per-command "get_clients → scan every row" lookups with
+hash indexes:
+ • normalised name  → client rows
+ • normalised WA    → client row
+ • client_id        → client row
+ • client name      → latest package row (balance checks)
+
+Loaded once per worker, then refreshed incrementally: stale data is
+served while a single background refresh diffs the sheet export and
+only touches rows that changed. Local writes (add_client) are applied
+immediately via upsert(). Hot-path lookups pass wait=False: a cold
+directory then loads in the background and answers "not found" (the
+caller falls back to a single GAS lookup) instead of blocking on the
+full export. reload() re-reads the sheet synchronously before writes
+that must not duplicate a row.
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .utils import normalize_wa, post_to_webhook
+from .config import SHEETS_API_URL
+from .client_index import ClientNameIndex, normalize_name
+
+log = logging.getLogger(__name__)
+
+DIRECTORY_TTL = int(os.getenv("CLIENT_DIRECTORY_TTL", "300"))   # seconds
+PACKAGES_TTL = int(os.getenv("CLIENT_PACKAGES_TTL", "120"))     # seconds
+RETRY_BACKOFF = 30  # seconds between load attempts while the sheet is unreachable
+
+
+def _row_key(r: dict) -> str:
+    """Stable identity for a Clients row (client_id, else WA, else name)."""
+    cid = str(r.get("client_id") or "").strip()
+    if cid:
+        return f"id:{cid}"
+    wa = normalize_wa(r.get("phone") or r.get("wa_number") or "")
+    if wa:
+        return f"wa:{wa}"
+    return f"name:{normalize_name(r.get('name'))}"
+
+
+class ClientDirectory:
+    """Hash-indexed view of the Clients sheet for one worker."""
+
+    def __init__(self, sheets_url: str = SHEETS_API_URL, ttl: int = DIRECTORY_TTL):
+        self.sheets_url = sheets_url
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._refreshing = False
+        self._rows: Dict[str, dict] = {}
+        self._by_id: Dict[str, dict] = {}
+        self._by_wa: Dict[str, dict] = {}
+        self._by_name: Dict[str, List[dict]] = {}
+        self._index: Optional[ClientNameIndex] = None
+        self._loaded_at = 0.0
+        self._attempted_at = 0.0
+        self._packages: Dict[str, dict] = {}
+        self._packages_loaded_at = 0.0
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "rows_changed": 0}
+
+    # ── Index maintenance ────────────────────────────────────
+    def _index_row(self, r: dict):
+        cid = str(r.get("client_id") or "").strip()
+        if cid:
+            self._by_id[cid] = r
+        wa = normalize_wa(r.get("phone") or r.get("wa_number") or "")
+        if wa:
+            self._by_wa[wa] = r
+        norm = normalize_name(r.get("name"))
+        if norm:
+            self._by_name.setdefault(norm, []).append(r)
+
+    def _unindex_row(self, r: dict):
+        cid = str(r.get("client_id") or "").strip()
+        if cid and self._by_id.get(cid) is r:
+            del self._by_id[cid]
+        wa = normalize_wa(r.get("phone") or r.get("wa_number") or "")
+        if wa and self._by_wa.get(wa) is r:
+            del self._by_wa[wa]
+        norm = normalize_name(r.get("name"))
+        bucket = self._by_name.get(norm)
+        if bucket:
+            bucket[:] = [x for x in bucket if x is not r]
+            if not bucket:
+                del self._by_name[norm]
+
+    def _apply(self, rows: List[dict]) -> int:
+        """Diff a full export against the current rows; returns rows changed."""
+        seen = set()
+        changed = 0
+        names_changed = False
+        for r in rows:
+            key = _row_key(r)
+            seen.add(key)
+            old = self._rows.get(key)
+            if old == r:
+                continue
+            if old is not None:
+                self._unindex_row(old)
+                names_changed |= old.get("name") != r.get("name")
+            else:
+                names_changed = True
+            self._rows[key] = r
+            self._index_row(r)
+            changed += 1
+        for key in [k for k in self._rows if k not in seen]:
+            self._unindex_row(self._rows.pop(key))
+            changed += 1
+            names_changed = True
+        if names_changed:
+            self._index = None  # fuzzy index rebuilt lazily on next search
+        return changed
+
+    # ── Loading ──────────────────────────────────────────────
+    def refresh(self) -> int:
+        """Fetch the Clients export and apply only the rows that changed."""
+        self._attempted_at = time.time()
+        res = post_to_webhook(self.sheets_url, {"action": "get_clients"})
+        rows = res.get("clients") if isinstance(res, dict) else None
+        if not isinstance(rows, list):
+            log.warning(f"[directory] get_clients failed: {res}")
+            return 0
+        with self._lock:
+            changed = self._apply(rows)
+            self._loaded_at = time.time()
+            self.stats["refreshes"] += 1
+            self.stats["rows_changed"] += changed
+        log.info(f"[directory] refreshed {len(rows)} clients ({changed} changed)")
+        return changed
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            log.warning(f"[directory] background refresh failed: {e}")
+        finally:
+            self._refreshing = False
+
+    def _start_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="client-directory-refresh", daemon=True).start()
+
+    def ensure_loaded(self, wait: bool = True):
+        """
+        First call loads synchronously (in the background with wait=False);
+        stale data triggers one background refresh.
+        """
+        if not self._loaded_at:
+            if time.time() - self._attempted_at < RETRY_BACKOFF:
+                return  # sheet unreachable; callers fall back to "not found"
+            if not wait:
+                self._start_refresh()
+                return
+            with self._load_lock:
+                if not self._loaded_at and time.time() - self._attempted_at >= RETRY_BACKOFF:
+                    self.refresh()
+            return
+        if time.time() - self._loaded_at > self.ttl:
+            self._start_refresh()
+
+    def reload(self) -> bool:
+        """Synchronous refresh from the sheet; False if it could not be read."""
+        before = self._loaded_at
+        with self._load_lock:
+            self.refresh()
+        return self._loaded_at != before
+
+    def warm(self) -> int:
+        """Load now and build the fuzzy index (gunicorn pre-fork warm-up); returns the client count."""
+        if not self._loaded_at:
+            self.refresh()
+        with self._lock:
+            if self._index is None and self._rows:
+                self._index = ClientNameIndex(list(self._rows.values()))
+        return len(self._rows)
+
+    def upsert(self, row: dict):
+        """Apply a locally-known client write without a sheet round-trip."""
+        key = _row_key(row)
+        with self._lock:
+            old = self._rows.get(key)
+            if old is not None:
+                self._unindex_row(old)
+            self._rows[key] = row
+            self._index_row(row)
+            self._index = None
+
+    # ── Lookups ──────────────────────────────────────────────
+    def _count(self, found) -> None:
+        self.stats["hits" if found else "misses"] += 1
+
+    def by_id(self, client_id: str, wait: bool = True) -> Optional[dict]:
+        self.ensure_loaded(wait)
+        r = self._by_id.get(str(client_id or "").strip())
+        self._count(r)
+        return r
+
+    def by_wa(self, wa_number: str, wait: bool = True) -> Optional[dict]:
+        self.ensure_loaded(wait)
+        r = self._by_wa.get(normalize_wa(wa_number))
+        self._count(r)
+        return r
+
+    def by_name(self, name: str, wait: bool = True) -> Optional[dict]:
+        """Exact (normalised) name match; first row wins, like the old scans."""
+        self.ensure_loaded(wait)
+        bucket = self._by_name.get(normalize_name(name))
+        self._count(bucket)
+        return bucket[0] if bucket else None
+
+    def search(self, name: str, limit: int = 5, cutoff: float = 0.6) -> List[Tuple[float, dict]]:
+        """Ranked fuzzy/substring candidates (see client_index.ClientNameIndex)."""
+        self.ensure_loaded()
+        idx = self._index
+        if idx is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = ClientNameIndex(list(self._rows.values()))
+                idx = self._index
+        return idx.search(name, limit=limit, cutoff=cutoff)
+
+    def all(self) -> List[dict]:
+        self.ensure_loaded()
+        return list(self._rows.values())
+
+    # ── Packages ─────────────────────────────────────────────
+    def latest_package(self, client_name: str) -> Optional[dict]:
+        """Latest Packages row for a client name (last row in the sheet wins)."""
+        if time.time() - self._packages_loaded_at > PACKAGES_TTL:
+            res = post_to_webhook(self.sheets_url, {"action": "get_packages"})
+            packages = res.get("packages", []) if isinstance(res, dict) else []
+            by_name: Dict[str, dict] = {}
+            for p in packages:
+                by_name[normalize_name(p.get("client_name"))] = p
+            self._packages = by_name
+            self._packages_loaded_at = time.time()
+        return self._packages.get(normalize_name(client_name))
+
+    def invalidate_packages(self):
+        self._packages_loaded_at = 0.0
+
+    def summary(self) -> dict:
+        return {
+            "clients": len(self._rows),
+            "age_s": round(time.time() - self._loaded_at, 1) if self._loaded_at else None,
+            **self.stats,
+        }
+
+
+# ─────────────────────────────────────────────────────────────
+# Shared per-worker instance
+# ─────────────────────────────────────────────────────────────
+directory = ClientDirectory()
@@ -0,0 +1,190 @@
+"""
+client_index.py
+────────────────────────────────────────────
+In-memory fuzzy index over client names (Clients sheet).
+
+Replaces the per-command difflib scan in admin_utils with:
+ • normalised names + token postings (exact / whole-word hits)
+ • padded trigram postings (substring + typo-tolerant candidates)
+ • Soundex phonetic keys per token ("Jon" ≈ "John", "Smyth" ≈ "Smith")
+
+The shared instance lives in client_directory and is rebuilt only when
+client names change; each search scores a small candidate set instead
+of every client.
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import re
+import unicodedata
+from collections import Counter
+from difflib import SequenceMatcher
+from itertools import chain
+from typing import Dict, List, Set, Tuple
+
+_NON_ALNUM = re.compile(r"[^a-z0-9 ]+")
+_SPACES = re.compile(r"\s+")
+
+# Trigrams shared by more than this share of clients carry almost no signal
+# ("an ", " ma"); they are skipped when scoring as long as rarer grams exist.
+_STOPGRAM_RATIO = 0.05
+_MAX_FUZZY_CANDIDATES = 25
+
+
+# ─────────────────────────────────────────────────────────────
+# Normalisation helpers
+# ─────────────────────────────────────────────────────────────
+def normalize_name(name: str) -> str:
+    """Lower-case, strip accents and punctuation, collapse whitespace."""
+    s = unicodedata.normalize("NFKD", str(name or ""))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).lower()
+    s = _NON_ALNUM.sub(" ", s)
+    return _SPACES.sub(" ", s).strip()
+
+
+def trigrams(norm: str) -> Set[str]:
+    """Padded trigrams of an already-normalised name."""
+    if not norm:
+        return set()
+    padded = f"  {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+def phonetic_key(token: str) -> str:
+    """American Soundex code for a single name token ('' for non-alpha)."""
+    letters = [ch for ch in token.lower() if ch.isalpha()]
+    if not letters:
+        return ""
+    first = letters[0]
+    out = [first.upper()]
+    prev = _SOUNDEX_CODES.get(first, "")
+    for ch in letters[1:]:
+        code = _SOUNDEX_CODES.get(ch, "")
+        if code and code != prev:
+            out.append(code)
+            if len(out) == 4:
+                break
+        if ch not in "hw":
+            prev = code
+    return "".join(out).ljust(4, "0")
+
+
+# ─────────────────────────────────────────────────────────────
+# Index
+# ─────────────────────────────────────────────────────────────
+class ClientNameIndex:
+    """
+    Immutable name index over a list of Clients rows.
+    Postings point at distinct normalised names, so clients sharing a
+    name cost nothing extra when scoring.
+    """
+
+    def __init__(self, rows: List[dict]):
+        self.rows = [r for r in rows if (r.get("name") or "").strip()]
+        self._names: List[str] = []              # name id → normalised name
+        self._name_rows: List[List[int]] = []    # name id → row indices
+        self._name_ids: Dict[str, int] = {}      # normalised name → name id
+        self._tokens: Dict[str, Set[int]] = {}
+        self._grams: Dict[str, List[int]] = {}
+        self._phonetic: Dict[str, Set[int]] = {}
+
+        for ri, r in enumerate(self.rows):
+            norm = normalize_name(r.get("name"))
+            nid = self._name_ids.get(norm)
+            if nid is not None:
+                self._name_rows[nid].append(ri)
+                continue
+            nid = len(self._names)
+            self._name_ids[norm] = nid
+            self._names.append(norm)
+            self._name_rows.append([ri])
+            for tok in norm.split():
+                self._tokens.setdefault(tok, set()).add(nid)
+                key = phonetic_key(tok)
+                if key:
+                    self._phonetic.setdefault(key, set()).add(nid)
+            for g in trigrams(norm):
+                self._grams.setdefault(g, []).append(nid)
+
+        self._stop_len = max(8, int(len(self._names) * _STOPGRAM_RATIO))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    # ── Lookups ──────────────────────────────────────────────
+    def exact(self, name: str) -> List[dict]:
+        """Rows whose normalised name equals the normalised query."""
+        nid = self._name_ids.get(normalize_name(name))
+        return [] if nid is None else [self.rows[ri] for ri in self._name_rows[nid]]
+
+    def _substring_ids(self, q: str) -> Set[int]:
+        inner = {q[i:i + 3] for i in range(len(q) - 2)}
+        if not inner:
+            # 1–2 character queries: match on token prefixes only
+            return {n for tok, ids in self._tokens.items() if tok.startswith(q) for n in ids}
+        postings = sorted((self._grams.get(g, []) for g in inner), key=len)
+        if not postings[0]:
+            return set()
+        ids = set(postings[0])
+        for p in postings[1:]:
+            ids.intersection_update(p)
+            if not ids:
+                break
+        return {n for n in ids if q in self._names[n]}
+
+    def _shortlist(self, q: str) -> List[int]:
+        """Name ids sharing the most (rare) trigrams / phonetic tokens with q."""
+        lists = [self._grams.get(g, []) for g in trigrams(q)]
+        rare = [p for p in lists if len(p) <= self._stop_len]
+        hits = Counter(chain.from_iterable(rare or lists))
+        for tok in q.split():
+            phon = self._phonetic.get(phonetic_key(tok))
+            if phon and len(phon) <= self._stop_len:
+                hits.update(dict.fromkeys(phon, 2))
+        return [n for n, _ in hits.most_common(_MAX_FUZZY_CANDIDATES)]
+
+    def search(self, query: str, limit: int = 5, cutoff: float = 0.6) -> List[Tuple[float, dict]]:
+        """
+        Ranked candidates as (score, row), best first.
+        Substring matches are always returned (as the old scan did);
+        fuzzy/phonetic matches are limited to `limit` above `cutoff`.
+        """
+        q = normalize_name(query)
+        if not q or not self.rows:
+            return []
+
+        scores: Dict[int, float] = {}
+        nid = self._name_ids.get(q)
+        if nid is not None:
+            scores[nid] = 2.0
+        for n in self._substring_ids(q):
+            scores.setdefault(n, 1.0 + len(q) / max(len(self._names[n]), 1))
+
+        # difflib caches the b-sequence, so keep the query fixed on that side
+        sm = SequenceMatcher(None, "", q)
+        fuzzy: List[Tuple[float, int]] = []
+        for n in self._shortlist(q):
+            if n in scores:
+                continue
+            sm.set_seq1(self._names[n])
+            if sm.real_quick_ratio() < cutoff or sm.quick_ratio() < cutoff:
+                continue
+            ratio = sm.ratio()
+            if ratio >= cutoff:
+                fuzzy.append((ratio, n))
+        fuzzy.sort(reverse=True)
+        for ratio, n in fuzzy[:limit]:
+            scores[n] = ratio
+
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], self._names[kv[0]]))
+        return [(round(score, 3), self.rows[ri]) for n, score in ranked for ri in self._name_rows[n]]
@@ -18,6 +18,9 @@ from .utils import (
     send_whatsapp_text,
     normalize_wa,
 )
+from .config import gas_url, WEBHOOK_BASE
+from .tracing import span, outbound_headers
+from .logging_setup import SAMPLED
 
 bp = Blueprint("client_menu", __name__)
 log = logging.getLogger(__name__)
@@ -27,8 +30,7 @@ NADINE_WA = os.getenv("NADINE_WA", "")
 TEMPLATE_LANG = os.getenv("TEMPLATE_LANG", "en_US")
 MENU_TEMPLATE = "pilateshq_menu_main"
 CLIENT_ALERT_TEMPLATE = "client_generic_alert_us"
-GAS_WEBHOOK_URL = os.getenv("GAS_WEBHOOK_URL", "")
-WEBHOOK_BASE = os.getenv("WEBHOOK_BASE", "https://pilateshq-booking-bot.onrender.com")
+GAS_WEBHOOK_URL = gas_url("GAS_WEBHOOK_URL")
 
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "35"))
 INVOICE_ENDPOINT = f"{WEBHOOK_BASE}/invoices/review-one"
@@ -86,7 +88,7 @@ def _rebuild_summary_from_sessions(sessions: list) -> str:
 def send_client_menu(wa_number: str, name: str = "there"):
     try:
         send_whatsapp_template(wa_number, MENU_TEMPLATE, TEMPLATE_LANG, [name])
-        log.info(f"✅ Menu template sent to {wa_number}")
+        log.info("✅ Menu template sent to %s", wa_number, extra=SAMPLED)
         return {"ok": True}
     except Exception as e:
         log.error(f"❌ send_client_menu failed: {e}")
@@ -106,19 +108,21 @@ def handle_client_action():
     action = normalise_action(raw_action)
     handled = False
 
-    log.info(f"[client_menu] Action received: raw='{raw_action}', normalised='{action}' from {wa_number}")
+    log.info("[client_menu] Action received: raw='%s', normalised='%s' from %s", raw_action, action, wa_number,
+             extra=SAMPLED)
 
     try:
         # 1️⃣ My Schedule
         if action == "my_schedule" and not handled:
             handled = True
             if GAS_WEBHOOK_URL:
-                r = requests.post(
-                    GAS_WEBHOOK_URL,
-                    json={"action": "export_sessions_week", "wa_number": wa_number},
-                    timeout=REQUEST_TIMEOUT,
-                )
-                log.info(f"🔗 export_sessions_week → HTTP {r.status_code}")
+                with span("gas", "export_sessions_week"):
+                    r = requests.post(
+                        GAS_WEBHOOK_URL,
+                        json={"action": "export_sessions_week", "wa_number": wa_number},
+                        timeout=REQUEST_TIMEOUT,
+                    )
+                log.debug("🔗 export_sessions_week → HTTP %s", r.status_code)
                 if r.ok:
                     result = r.json() or {}
                     sessions = result.get("sessions") or []
@@ -137,8 +141,10 @@ def handle_client_action():
             handled = True
             payload = {"client_name": name, "wa_number": wa_number}
             try:
-                r = requests.post(INVOICE_ENDPOINT, json=payload, timeout=REQUEST_TIMEOUT)
-                log.info(f"🧾 Invoice request → HTTP {r.status_code}")
+                with span("self", "/invoices/review-one"):
+                    r = requests.post(INVOICE_ENDPOINT, json=payload, headers=outbound_headers(),
+                                      timeout=REQUEST_TIMEOUT)
+                log.debug("🧾 Invoice request → HTTP %s", r.status_code)
                 if r.ok:
                     return jsonify({"ok": True, "routed": "invoice"}), 200
             except Exception as e:
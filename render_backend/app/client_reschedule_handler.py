@@ -21,14 +21,15 @@ import time
 import logging
 import requests
 from .utils import send_safe_message
+from .config import gas_url
+from .tracing import span
 
 log = logging.getLogger(__name__)
 
 # ── Environment setup ─────────────────────────────────────────────
 NADINE_WA = os.getenv("NADINE_WA", "")
-GAS_ATTENDANCE_URL = os.getenv("GAS_ATTENDANCE_URL", "")
-GAS_SCHEDULE_URL = os.getenv("GAS_SCHEDULE_URL", "")
-WEBHOOK_BASE = os.getenv("WEBHOOK_BASE", "https://pilateshq-booking-bot.onrender.com")
+GAS_ATTENDANCE_URL = gas_url("GAS_ATTENDANCE_URL")
+GAS_SCHEDULE_URL = gas_url("GAS_SCHEDULE_URL")
 
 _seen_clients = set()  # in-memory duplicate prevention
 
@@ -42,7 +43,8 @@ def _post_to_gas(payload: dict):
 
     for attempt in range(2):
         try:
-            r = requests.post(url, json=payload, timeout=10)
+            with span("gas", payload.get("action") or "post"):
+                r = requests.post(url, json=payload, timeout=10)
             if r.ok:
                 data = r.json()
                 if data.get("ok"):
@@ -1,5 +1,5 @@
 # app/config.py
-import os, logging
+import hmac, os, logging
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 def _canon_wa(s: str) -> str:
@@ -13,6 +13,22 @@ def _canon_wa(s: str) -> str:
 def _split_csv(env_val: str) -> list[str]:
     return [x.strip() for x in (env_val or "").split(",") if x.strip()]
 
+# ── Local fakes (load testing) ───────────────────────────────────────────────
+# FAKE_BACKEND_URL=http://127.0.0.1:8765 points the Graph API, every GAS web app
+# and the /sheets bridge at bench/fake_backend.py instead of the real services.
+# Self-calls to the app's own routes (WEBHOOK_BASE) are not faked.
+FAKE_BACKEND_URL = os.environ.get("FAKE_BACKEND_URL", "").rstrip("/")
+
+def gas_url(env_name: str, default: str = "") -> str:
+    """GAS web-app URL from `env_name` (or `default`); the fake's /gas/<name> when faked."""
+    if FAKE_BACKEND_URL:
+        return f"{FAKE_BACKEND_URL}/gas/{env_name.lower()}"
+    return os.environ.get(env_name, default)
+
+def graph_base(version: str) -> str:
+    """Graph API base URL for `version` (the fake when FAKE_BACKEND_URL is set)."""
+    return f"{FAKE_BACKEND_URL or 'https://graph.facebook.com'}/{version}"
+
 # ── Meta / WhatsApp Cloud API ────────────────────────────────────────────────
 ACCESS_TOKEN     = os.environ.get("ACCESS_TOKEN", "")
 PHONE_NUMBER_ID  = os.environ.get("PHONE_NUMBER_ID", "")  # e.g. "802833389569115"
@@ -20,7 +36,7 @@ VERIFY_TOKEN     = os.environ.get("VERIFY_TOKEN", "testtoken")
 
 # Graph endpoint (version can be bumped without code changes)
 GRAPH_VER = os.environ.get("GRAPH_VER", "v21.0")
-GRAPH_URL = f"https://graph.facebook.com/{GRAPH_VER}/{PHONE_NUMBER_ID}/messages"
+GRAPH_URL = f"{graph_base(GRAPH_VER)}/{PHONE_NUMBER_ID}/messages"
 
 # ── Admin numbers ────────────────────────────────────────────────────────────
 _raw_admins = _split_csv(os.environ.get("ADMIN_NUMBERS", ""))
@@ -38,6 +54,13 @@ NADINE_WA = _canon_wa(_nadine_wa) if _nadine_wa else (ADMIN_NUMBERS[0] if ADMIN_
 # ── Database ─────────────────────────────────────────────────────────────────
 DATABASE_URL = os.environ.get("DATABASE_URL", "")
 
+# ── Diagnostics (/diag/* runtime endpoints, X-Profile) ──────────────────────
+DIAG_TOKEN = os.environ.get("DIAG_TOKEN", "")
+
+def diag_token_ok(given: str) -> bool:
+    """Closed when DIAG_TOKEN is unset."""
+    return bool(DIAG_TOKEN) and hmac.compare_digest(str(given or "").encode(), DIAG_TOKEN.encode())
+
 # ── Local timezone ───────────────────────────────────────────────────────────
 TZ_NAME = os.environ.get("TZ_NAME", "Africa/Johannesburg")
 
@@ -65,4 +88,6 @@ logger.info(f"[CONFIG] Loaded ADMIN_NUMBERS={ADMIN_NUMBERS}, NADINE_WA={NADINE_W
 
 # ── Legacy variable aliases (for backward compatibility) ─────────────────────
 WEBHOOK_BASE = os.environ.get("WEBHOOK_BASE", "https://pilateshq-booking-bot.onrender.com")
+SHEETS_API_URL = gas_url("SHEETS_API_URL", f"{WEBHOOK_BASE}/sheets")
+WEB_APP_URL = gas_url("WEB_APP_URL")
 TIMEZONE = TZ_NAME
@@ -13,31 +13,11 @@ All operations now use:
 import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-import requests
-from .utils import normalize_wa
-from .config import WEBHOOK_BASE, TIMEZONE
+from .utils import normalize_wa, post_to_webhook
+from .config import SHEETS_API_URL, TIMEZONE
 
 log = logging.getLogger(__name__)
 
-# ──────────────────────────────────────────────
-# Legacy-safe webhook helper
-# ──────────────────────────────────────────────
-def post_to_webhook(url: str, payload: dict) -> dict:
-    """
-    Legacy compatibility helper to post JSON payloads to Google Apps Script or webhook endpoints.
-    Returns parsed JSON or an {ok: False} fallback on error.
-    """
-    try:
-        r = requests.post(url, json=payload, timeout=10)
-        if r.ok:
-            return r.json()
-        log.warning(f"⚠️ post_to_webhook: {url} returned {r.status_code}")
-        return {"ok": False, "status": r.status_code, "text": r.text}
-    except Exception as e:
-        log.error(f"❌ post_to_webhook failed: {e}")
-        return {"ok": False, "error": str(e)}
-
-
 # ──────────────────────────────────────────────
 # Utility Helpers
 # ──────────────────────────────────────────────
@@ -57,7 +37,7 @@ def get_next_lesson(wa_number: str) -> Optional[Dict]:
     """Return the next confirmed session for the given client (by WA number)."""
     try:
         wa = normalize_wa(wa_number)
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets", {"action": "get_sessions"})
+        res = post_to_webhook(SHEETS_API_URL, {"action": "get_sessions"})
         sessions = res.get("sessions", []) if isinstance(res, dict) else []
 
         today = datetime.now()
@@ -89,7 +69,7 @@ def get_sessions_this_week(wa_number: str) -> List[Dict]:
     start, end = _date_range(7)
     try:
         wa = normalize_wa(wa_number)
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets", {"action": "get_sessions"})
+        res = post_to_webhook(SHEETS_API_URL, {"action": "get_sessions"})
         sessions = res.get("sessions", []) if isinstance(res, dict) else []
 
         out = []
@@ -121,7 +101,7 @@ def cancel_next_lesson(wa_number: str) -> bool:
             "day": next_lesson["date"],
             "time": next_lesson["time"],
         }
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets", payload)
+        res = post_to_webhook(SHEETS_API_URL, payload)
         ok = res.get("ok", False)
         log.info(f"[cancel_next_lesson] {wa_number} → {next_lesson['date']} {next_lesson['time']} ok={ok}")
         return ok
@@ -137,7 +117,7 @@ def get_weekly_schedule() -> List[Dict]:
     """Return next 7 days of sessions."""
     start, end = _date_range(7)
     try:
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets", {"action": "get_sessions"})
+        res = post_to_webhook(SHEETS_API_URL, {"action": "get_sessions"})
         sessions = res.get("sessions", []) if isinstance(res, dict) else []
 
         return [
@@ -160,7 +140,7 @@ def get_client_sessions_for_month(wa_number: str, year: int, month: int) -> List
     """Get all confirmed sessions for a client in a given month."""
     try:
         wa = normalize_wa(wa_number)
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets", {"action": "get_sessions"})
+        res = post_to_webhook(SHEETS_API_URL, {"action": "get_sessions"})
         sessions = res.get("sessions", []) if isinstance(res, dict) else []
 
         out = []
@@ -183,7 +163,7 @@ def get_cancellations_today() -> List[Dict]:
     """Return today's cancellations."""
     try:
         today = _today()
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets", {"action": "get_sessions"})
+        res = post_to_webhook(SHEETS_API_URL, {"action": "get_sessions"})
         sessions = res.get("sessions", []) if isinstance(res, dict) else []
 
         return [
@@ -204,10 +184,10 @@ def get_clients_without_bookings_this_week() -> List[str]:
     """List clients who have no confirmed sessions this week."""
     try:
         start, end = _date_range(7)
-        res_clients = post_to_webhook(f"{WEBHOOK_BASE}/sheets", {"action": "get_clients"})
+        res_clients = post_to_webhook(SHEETS_API_URL, {"action": "get_clients"})
         clients = res_clients.get("clients", []) if isinstance(res_clients, dict) else []
 
-        res_sessions = post_to_webhook(f"{WEBHOOK_BASE}/sheets", {"action": "get_sessions"})
+        res_sessions = post_to_webhook(SHEETS_API_URL, {"action": "get_sessions"})
         sessions = res_sessions.get("sessions", []) if isinstance(res_sessions, dict) else []
 
         booked = {
@@ -228,7 +208,7 @@ def get_weekly_recap() -> List[Dict]:
     try:
         today = datetime.now()
         last_week = today - timedelta(days=7)
-        res = post_to_webhook(f"{WEBHOOK_BASE}/sheets", {"action": "get_sessions"})
+        res = post_to_webhook(SHEETS_API_URL, {"action": "get_sessions"})
         sessions = res.get("sessions", []) if isinstance(res, dict) else []
 
         past = [
@@ -0,0 +1,131 @@
+"""
+delivery_ledger.py
+────────────────────────────────────────────
+Compact SQLite ledger of reminder/template deliveries.
+
+Each send first claims (recipient, template, session identity). A GAS
+retry, an overlapping trigger, or the in-process scheduler firing for
+the same session finds the claim already taken and skips the Graph API
+call.
+
+ • One file shared by all gunicorn workers (DELIVERY_LEDGER_DB);
+   INSERT OR IGNORE makes the claim atomic across processes
+ • Failed sends release their claim so a retry can go out
+ • Rows older than DELIVERY_LEDGER_TTL are compacted away
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .utils import normalize_wa
+
+log = logging.getLogger(__name__)
+
+LEDGER_DB = os.getenv("DELIVERY_LEDGER_DB", "/tmp/pilateshq-ledger.sqlite3")
+LEDGER_TTL = int(os.getenv("DELIVERY_LEDGER_TTL", str(8 * 24 * 3600)))  # seconds (covers week-ahead)
+COMPACT_EVERY = 600  # seconds between compaction passes
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    recipient TEXT NOT NULL,
+    template  TEXT NOT NULL,
+    ident     TEXT NOT NULL,
+    sent_at   REAL NOT NULL,
+    PRIMARY KEY (recipient, template, ident)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS deliveries_sent_at ON deliveries (sent_at);
+"""
+
+
+class DeliveryLedger:
+    def __init__(self, path: str = LEDGER_DB, ttl: int = LEDGER_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = None
+        self._compacted_at = 0.0
+        self.stats = {"claimed": 0, "duplicates": 0, "released": 0, "compacted": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def claim(self, recipient: str, template: str, ident: str) -> bool:
+        """
+        True if this (recipient, template, ident) has not been sent within
+        the TTL and is now reserved for the caller; False for a duplicate.
+        """
+        key = (normalize_wa(recipient), template, str(ident or ""))
+        now = time.time()
+        try:
+            with self._lock:
+                db = self._db()
+                cur = db.execute(
+                    "INSERT INTO deliveries VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (recipient, template, ident) DO UPDATE SET sent_at = excluded.sent_at "
+                    "WHERE deliveries.sent_at < ?",
+                    (*key, now, now - self.ttl),
+                )
+                claimed = cur.rowcount == 1
+                self.stats["claimed" if claimed else "duplicates"] += 1
+                if now - self._compacted_at > COMPACT_EVERY:
+                    self._compact(db, now)
+            return claimed
+        except sqlite3.Error as e:
+            # Never block a reminder because the ledger is unavailable
+            log.warning(f"[ledger] claim failed ({e}); sending without dedupe")
+            return True
+
+    def release(self, recipient: str, template: str, ident: str):
+        """Drop a claim after a failed send so a retry can deliver it."""
+        try:
+            with self._lock:
+                self._db().execute(
+                    "DELETE FROM deliveries WHERE recipient = ? AND template = ? AND ident = ?",
+                    (normalize_wa(recipient), template, str(ident or "")),
+                )
+                self.stats["released"] += 1
+        except sqlite3.Error as e:
+            log.warning(f"[ledger] release failed: {e}")
+
+    def _compact(self, db: sqlite3.Connection, now: float):
+        cur = db.execute("DELETE FROM deliveries WHERE sent_at < ?", (now - self.ttl,))
+        self._compacted_at = now
+        self.stats["compacted"] += cur.rowcount
+        if cur.rowcount:
+            log.info(f"[ledger] compacted {cur.rowcount} expired deliveries")
+
+    def summary(self) -> dict:
+        try:
+            with self._lock:
+                rows = self._db().execute("SELECT COUNT(*) FROM deliveries").fetchone()[0]
+        except sqlite3.Error:
+            rows = None
+        return {"rows": rows, **self.stats}
+
+
+ledger = DeliveryLedger()
+
+
+def send_once(recipient: str, template: str, ident: str, send, *args, **kwargs):
+    """
+    Claim then call send(*args, **kwargs). Returns None for a duplicate;
+    otherwise the send result (claim released if the result is not ok).
+    """
+    if not ledger.claim(recipient, template, ident):
+        log.info(f"[ledger] duplicate suppressed → {recipient} {template} {ident}")
+        return None
+    res = send(*args, **kwargs)
+    if not res or (isinstance(res, dict) and res.get("ok") is False):
+        ledger.release(recipient, template, ident)
+    return res
@@ -8,8 +8,6 @@ Pulls real booking data from the database using crud.py.
 import os
 from io import BytesIO
 from datetime import datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
 from . import crud
 from .utils import send_whatsapp_text
 
@@ -23,6 +21,10 @@ def generate_invoice_pdf(client: str, wa_number: str, month_spec: str = "this mo
     Generate a simple invoice PDF summarising the client’s sessions and charges.
     Displays mobile number in header (for admin verification).
     """
+    # ReportLab costs ~0.3 s to import – only pay it when a PDF is rendered
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
     buffer = BytesIO()
     p = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
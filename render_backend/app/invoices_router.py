@@ -8,24 +8,27 @@ invoices_router.py – Phase 30 (Dual Delivery + Confirmation Callback)
 ─────────────────────────────────────────────────────────────────────
 """
 
-import os, io, time, re, logging, requests
+import os, io, re, logging
+from concurrent.futures import TimeoutError as FutureTimeout
 from datetime import datetime
 from flask import Blueprint, request, jsonify, send_file
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
 from .utils import send_safe_message
+from . import async_clients
+from .profiling import profiled
 from .tokens import generate_invoice_token, verify_invoice_token
+from .config import gas_url
 
 bp = Blueprint("invoices_bp", __name__)
 log = logging.getLogger(__name__)
 
 # ── Environment ─────────────────────────────────────────────
 NADINE_WA = os.getenv("NADINE_WA", "")
-GAS_INVOICE_URL = os.getenv("GAS_INVOICE_URL", "")
-GAS_WEBHOOK_URL = os.getenv("GAS_WEBHOOK_URL", "")  # for append_log_event
+GAS_INVOICE_URL = gas_url("GAS_INVOICE_URL")
+GAS_WEBHOOK_URL = gas_url("GAS_WEBHOOK_URL")  # for append_log_event
 SHEET_ID = os.getenv("CLIENT_SHEET_ID", "")
 BASE_URL = os.getenv("BASE_URL", "https://pilateshq-booking-bot.onrender.com")
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "35"))
+INVOICE_EMAIL_WAIT = float(os.getenv("INVOICE_EMAIL_WAIT", "2"))  # s to wait for email once WhatsApp is sent
 
 TPL_ADMIN_ALERT = "admin_generic_alert_us"
 TPL_CLIENT_ALERT = "client_generic_alert_us"
@@ -35,12 +38,12 @@ STATIC_DIR = os.path.join(os.path.dirname(__file__), "../static")
 LOGO_PATH = os.path.join(STATIC_DIR, "pilateshq_logo.png")
 
 def _append_log_event(message: str, context: str):
-    """Append a compact event line to GAS Logs tab (best-effort)."""
+    """Append a compact event line to GAS Logs tab (best-effort, fire-and-forget)."""
     if not GAS_WEBHOOK_URL:
         return
     try:
         payload = {"action": "append_log_event", "sheet_id": SHEET_ID, "message": f"{context}: {message}"}
-        requests.post(GAS_WEBHOOK_URL, json=payload, timeout=REQUEST_TIMEOUT)
+        async_clients.fire_and_forget(GAS_WEBHOOK_URL, payload, timeout=REQUEST_TIMEOUT)
     except Exception as e:
         log.debug(f"[log-append] skipped ({e})")
 
@@ -55,23 +58,34 @@ def flatten_message(text: str) -> str:
         clean = clean.replace("  ", " ")
     return clean.strip()
 
-def _post_to_gas(payload: dict, retries: int = 2) -> dict:
-    for attempt in range(retries + 1):
-        try:
-            if not GAS_INVOICE_URL:
-                raise ValueError("Missing GAS_INVOICE_URL")
-            r = requests.post(GAS_INVOICE_URL, json=payload, timeout=20)
-            if r.ok:
-                return r.json()
-            log.warning(f"GAS HTTP {r.status_code}: {r.text}")
-        except Exception as e:
-            log.error(f"GAS POST failed ({attempt+1}/{retries+1}): {e}")
-        time.sleep(2)
-    return {"ok": False, "error": "GAS communication failed"}
-
 # ─────────────────────────────────────────────────────────────
 # /invoices/send  → dual delivery
+# WhatsApp (primary) and the GAS email go out in parallel on the async
+# client layer. The response waits for WhatsApp, then at most
+# INVOICE_EMAIL_WAIT for the email ("Pending" if still running); log
+# events are posted in the background once the email settles.
 # ─────────────────────────────────────────────────────────────
+def _delivery_status(result) -> str:
+    if result is None:
+        return "Pending"
+    return "Sent" if result.get("ok") else f"Failed: {result.get('error') or result.get('status')}"
+
+def _log_dual_delivery(client_name: str, email_future):
+    try:
+        email_status = _delivery_status(email_future.result())
+    except Exception as e:
+        email_status = f"Failed: {e}"
+    async_clients.fire_and_forget(
+        GAS_INVOICE_URL,
+        {
+            "action": "append_log_event",
+            "sheet_id": SHEET_ID,
+            "event": "INVOICE_DUAL",
+            "message": f"{client_name} | Email={email_status}",
+        },
+    )
+    _append_log_event(f"{client_name} | Email={email_status}", "invoices/send")
+
 @bp.route("/send", methods=["POST"])
 def send_invoice_dual():
     """Send invoice to client via WhatsApp and email."""
@@ -89,44 +103,37 @@ def send_invoice_dual():
         view_url = f"{BASE_URL}/invoices/view/{token}"
 
         msg = flatten_message(f"🧾 Invoice for *{client_name}*: {view_url} (expires in 48 h)")
-        send_safe_message(
-            to=wa_number,
-            is_template=True,
-            template_name=TPL_CLIENT_ALERT,
-            variables=[msg],
-            label="invoice_dual_send",
+        wa_future = async_clients.submit(
+            async_clients.send_template(wa_number, TPL_CLIENT_ALERT, variables=[msg])
         )
-
-        email_result = _post_to_gas(
-            {
-                "action": "send_invoice_email",
-                "sheet_id": SHEET_ID,
-                "client_name": client_name,
-                "invoice_id": invoice_id,
-            }
-        )
-        email_status = (
-            "Sent"
-            if email_result.get("ok")
-            else f"Failed: {email_result.get('error')}"
+        email_future = async_clients.submit(
+            async_clients.post_json(
+                GAS_INVOICE_URL,
+                {
+                    "action": "send_invoice_email",
+                    "sheet_id": SHEET_ID,
+                    "client_name": client_name,
+                    "invoice_id": invoice_id,
+                },
+                retries=2,
+            )
         )
+        email_future.add_done_callback(lambda f: _log_dual_delivery(client_name, f))
 
-        _post_to_gas(
-            {
-                "action": "append_log_event",
-                "sheet_id": SHEET_ID,
-                "event": "INVOICE_DUAL",
-                "message": f"{client_name} | Email={email_status}",
-            }
-        )
-        _append_log_event(f"{client_name} | Email={email_status}", "invoices/send")
+        wa_result = wa_future.result(timeout=REQUEST_TIMEOUT)
+        try:
+            # Email becomes the primary channel when WhatsApp failed: wait for it in full
+            email_result = email_future.result(timeout=INVOICE_EMAIL_WAIT if wa_result.get("ok") else None)
+        except FutureTimeout:
+            email_result = None
 
         return jsonify(
             {
-                "ok": True,
+                "ok": bool(wa_result.get("ok") or (email_result or {}).get("ok")),
                 "client_name": client_name,
                 "invoice_id": invoice_id,
-                "email_status": email_status,
+                "whatsapp_status": _delivery_status(wa_result),
+                "email_status": _delivery_status(email_result),
                 "link": view_url,
             }
         )
@@ -147,6 +154,7 @@ def send_invoice_dual():
 # /invoices/view/<token>  → secure PDF
 # ─────────────────────────────────────────────────────────────
 @bp.route("/view/<token>", methods=["GET"])
+@profiled
 def view_invoice(token):
     check = verify_invoice_token(token)
     if not check or not check.get("client"):
@@ -155,6 +163,10 @@ def view_invoice(token):
     client_name = check["client"]
     invoice_id = check["invoice"]
 
+    # ReportLab costs ~0.3 s to import – loaded on the first PDF, not at cold start
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
     buf = io.BytesIO()
     pdf = canvas.Canvas(buf, pagesize=A4)
     pdf.setTitle(f"{client_name} Invoice {invoice_id}")
@@ -0,0 +1,159 @@
+"""
+logging_setup.py
+────────────────────────────────────────────
+Non-blocking, structured logging for the whole backend.
+
+ • Request threads only build the LogRecord and put it on a queue; a
+   QueueListener thread formats and writes it (stdout for Render)
+ • Formatting is lazy: records keep msg + args until the listener
+   renders them, so %-style calls (log.info("… %s", x)) cost almost
+   nothing on the hot path, and nothing at all below LOG_LEVEL
+ • LOG_FORMAT=json (default) → one JSON object per line with the
+   request ID from tracing; LOG_FORMAT=text → the old
+   "time [LEVEL] name: message" layout
+ • High-volume INFO/DEBUG lines pass extra=SAMPLED and only every
+   1/LOG_SAMPLE_RATE-th occurrence (per logger + message) is kept;
+   warnings and errors are never sampled
+ • The listener is per process and restarts itself after a gunicorn
+   fork, so a preloaded app still logs from every worker (the master
+   drains it before each fork, see gunicorn.conf.py)
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from .tracing import request_id
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+
+SAMPLED = {"sampled": True}  # extra= for per-message / per-receipt lines
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+stats = {"dropped_sampled": 0}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        rid = getattr(record, "rid", "-")
+        if rid != "-":
+            out["rid"] = rid
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep 1 in N records tagged extra=SAMPLED, counted per (logger, message template)."""
+
+    def __init__(self, rate: float = SAMPLE_RATE):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._seen: Dict[tuple, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False) or record.levelno >= logging.WARNING:
+            return True
+        if not self.every:
+            stats["dropped_sampled"] += 1
+            return False
+        key = (record.name, record.msg)
+        n = self._seen.get(key, 0)
+        self._seen[key] = n + 1
+        if n % self.every:
+            stats["dropped_sampled"] += 1
+            return False
+        return True
+
+
+class _AsyncHandler(logging.handlers.QueueHandler):
+    """QueueHandler that defers formatting and owns a per-process listener."""
+
+    def __init__(self, target: logging.Handler):
+        super().__init__(queue.SimpleQueue())
+        self.target = target
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # After a fork the parent's listener thread is gone: new queue, new thread
+                self.queue = queue.SimpleQueue()
+                self._listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same process: hand the record over as-is and let the listener format it
+        record.rid = request_id.get()
+        return record
+
+    def emit(self, record: logging.LogRecord):
+        self._ensure_listener()
+        super().emit(record)
+
+    def stop(self):
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()  # drains the queue
+            self._pid = None
+
+
+_handler: Optional[_AsyncHandler] = None
+
+
+def configure(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> logging.Logger:
+    """Route the root logger through the queue (idempotent; replaces logging.basicConfig)."""
+    global _handler
+    root = logging.getLogger()
+    if _handler is not None and _handler in root.handlers:
+        return root
+
+    target = logging.StreamHandler(sys.stdout)
+    target.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+    _handler = _AsyncHandler(target)
+    _handler.addFilter(SamplingFilter())
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(_handler)
+    root.setLevel(level)
+    atexit.register(_handler.stop)
+    return root
+
+
+def drain():
+    """Write out everything queued and stop the listener; the next record restarts it.
+    Called before each gunicorn fork – under gevent the listener is a greenlet and a
+    forked copy would write the inherited backlog a second time."""
+    if _handler is not None:
+        _handler.stop()
+
+
+def summary() -> dict:
+    return {
+        "level": logging.getLevelName(logging.getLogger().level),
+        "format": LOG_FORMAT,
+        "sample_every": max(1, round(1 / SAMPLE_RATE)) if SAMPLE_RATE > 0 else None,
+        "queued": _handler.queue.qsize() if _handler is not None else 0,
+        **stats,
+    }
@@ -0,0 +1,249 @@
+"""
+message_status.py
+────────────────────────────────────────────
+WhatsApp delivery-status store.
+
+ • send_whatsapp_template / send_whatsapp_text call record_send() for
+   each attempt; accepted ones also record their wamid with template
+   and recipient in `outgoing`
+ • router_webhook hands `statuses` events (sent / delivered / read /
+   failed) to ingest() instead of discarding them
+ • Both are queued and written in batches by one background thread
+   into SQLite (MESSAGE_STATUS_DB), indexed by wamid
+ • template_stats() joins statuses to outgoing messages: per-template
+   delivery latency (p50/p95) and failure rate, for tuning fan-out
+ • Every send attempt (ok or not) is also appended to the `journal`
+   table: wamid, template, recipient, HTTP status, error code, Graph
+   latency and payload size; journal() queries it by recipient and
+   time range
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+STATUS_DB = os.getenv("MESSAGE_STATUS_DB", "/tmp/pilateshq-messages.sqlite3")
+STATUS_RETENTION = int(os.getenv("MESSAGE_STATUS_RETENTION", str(30 * 24 * 3600)))  # seconds
+FLUSH_EVERY = 1.0   # seconds
+BATCH_MAX = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outgoing (
+    wamid     TEXT PRIMARY KEY,
+    template  TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    sent_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outgoing_sent_at ON outgoing (sent_at);
+CREATE TABLE IF NOT EXISTS journal (
+    ts            REAL NOT NULL,
+    recipient     TEXT NOT NULL,
+    template      TEXT NOT NULL,
+    wamid         TEXT,
+    status_code   INTEGER,
+    error_code    TEXT,
+    latency_ms    REAL,
+    payload_bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS journal_recipient_ts ON journal (recipient, ts);
+CREATE INDEX IF NOT EXISTS journal_ts ON journal (ts);
+CREATE TABLE IF NOT EXISTS statuses (
+    wamid      TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    ts         REAL NOT NULL,
+    error_code TEXT,
+    PRIMARY KEY (wamid, status)
+) WITHOUT ROWID;
+"""
+
+STATUSES = ("sent", "delivered", "read", "failed")
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(pct * len(values)))], 2)
+
+
+class MessageStatusStore:
+    def __init__(self, path: str = STATUS_DB):
+        self.path = path
+        self._q: "queue.Queue[tuple]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._read_conn = None
+        self._pruned_at = 0.0
+        self.stats = {"outgoing": 0, "statuses": 0, "journal": 0, "flushes": 0, "errors": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    # ── Producers (request threads) ──────────────────────────
+    def _ensure_writer(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._writer, name="message-status-writer", daemon=True)
+                self._thread.start()
+
+    def record_send(self, recipient: str, template: str, wamid: str = "", status_code: Optional[int] = None,
+                    error_code: Optional[str] = None, latency_ms: Optional[float] = None,
+                    payload_bytes: Optional[int] = None):
+        """Append one send attempt to the journal (and to outgoing when it has a wamid)."""
+        now = time.time()
+        self._ensure_writer()
+        self._q.put(("jr", (now, recipient or "", template or "(text)", wamid or None,
+                            status_code, error_code, latency_ms, payload_bytes)))
+        if wamid:
+            self._q.put(("out", (wamid, template or "(text)", recipient or "", now)))
+
+    def ingest(self, statuses: List[dict]) -> int:
+        """Queue Meta `statuses` entries; returns how many were accepted."""
+        n = 0
+        for st in statuses or []:
+            wamid, status = st.get("id"), (st.get("status") or "").lower()
+            if not wamid or status not in STATUSES:
+                continue
+            errors = st.get("errors") or []
+            code = str(errors[0].get("code")) if errors else None
+            try:
+                ts = float(st.get("timestamp") or time.time())
+            except (TypeError, ValueError):
+                ts = time.time()
+            self._q.put(("st", (wamid, status, ts, code)))
+            n += 1
+        if n:
+            self._ensure_writer()
+        return n
+
+    # ── Writer ───────────────────────────────────────────────
+    def _writer(self):
+        conn = self._connect()
+        while True:
+            try:
+                first = self._q.get(timeout=60)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.time() + FLUSH_EVERY
+            while len(batch) < BATCH_MAX:
+                try:
+                    batch.append(self._q.get(timeout=max(0.0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            self._flush(conn, batch)
+
+    def _flush(self, conn: sqlite3.Connection, batch: List[tuple]):
+        out = [row for kind, row in batch if kind == "out"]
+        sts = [row for kind, row in batch if kind == "st"]
+        jrn = [row for kind, row in batch if kind == "jr"]
+        try:
+            with conn:
+                if jrn:
+                    conn.executemany("INSERT INTO journal VALUES (?, ?, ?, ?, ?, ?, ?, ?)", jrn)
+                if out:
+                    conn.executemany("INSERT OR IGNORE INTO outgoing VALUES (?, ?, ?, ?)", out)
+                if sts:
+                    conn.executemany("INSERT OR IGNORE INTO statuses VALUES (?, ?, ?, ?)", sts)
+                now = time.time()
+                if now - self._pruned_at > 3600:
+                    cutoff = now - STATUS_RETENTION
+                    conn.execute("DELETE FROM statuses WHERE wamid IN (SELECT wamid FROM outgoing WHERE sent_at < ?)", (cutoff,))
+                    conn.execute("DELETE FROM outgoing WHERE sent_at < ?", (cutoff,))
+                    conn.execute("DELETE FROM statuses WHERE ts < ?", (cutoff,))
+                    conn.execute("DELETE FROM journal WHERE ts < ?", (cutoff,))
+                    self._pruned_at = now
+            self.stats["outgoing"] += len(out)
+            self.stats["statuses"] += len(sts)
+            self.stats["journal"] += len(jrn)
+            self.stats["flushes"] += 1
+        except sqlite3.Error as e:
+            self.stats["errors"] += 1
+            log.warning(f"[msg-status] dropped batch of {len(batch)}: {e}")
+
+    # ── Queries ──────────────────────────────────────────────
+    def _reader(self) -> sqlite3.Connection:
+        if self._read_conn is None:
+            self._read_conn = self._connect()
+        return self._read_conn
+
+    def status_of(self, wamid: str) -> Dict[str, float]:
+        with self._read_lock:
+            rows = self._reader().execute("SELECT status, ts FROM statuses WHERE wamid = ?", (wamid,)).fetchall()
+        return dict(rows)
+
+    def journal(self, recipient: str = "", start: Optional[float] = None, end: Optional[float] = None,
+                limit: int = 200) -> List[dict]:
+        """Send attempts, newest first, optionally for one recipient and a [start, end) epoch range."""
+        where, args = ["ts >= ?", "ts < ?"], [start or 0.0, end or time.time() + 1]
+        if recipient:
+            where.insert(0, "recipient = ?")
+            args.insert(0, recipient)
+        sql = (f"SELECT ts, recipient, template, wamid, status_code, error_code, latency_ms, payload_bytes "
+               f"FROM journal WHERE {' AND '.join(where)} ORDER BY ts DESC LIMIT ?")
+        with self._read_lock:
+            cur = self._reader().execute(sql, (*args, int(limit)))
+            cols = [c[0] for c in cur.description]
+            return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+    def template_stats(self, since_s: float = 24 * 3600) -> Dict[str, dict]:
+        """
+        Per template since `since_s` seconds ago:
+        messages, delivered, read, failed (+ error codes), failure_rate,
+        delivery latency p50/p95 (s) and read latency p50 (s).
+        """
+        cutoff = time.time() - since_s
+        sql = """
+            SELECT o.wamid, o.template, o.sent_at, s.status, s.ts, s.error_code
+            FROM outgoing o LEFT JOIN statuses s ON s.wamid = o.wamid
+            WHERE o.sent_at >= ?
+        """
+        with self._read_lock:
+            rows = self._reader().execute(sql, (cutoff,)).fetchall()
+
+        per: Dict[str, dict] = {}
+        seen = set()
+        for wamid, template, sent_at, status, ts, code in rows:
+            t = per.setdefault(template, {"messages": 0, "delivered": 0, "read": 0, "failed": 0,
+                                          "_deliver": [], "_read": [], "error_codes": {}})
+            if wamid not in seen:
+                seen.add(wamid)
+                t["messages"] += 1
+            if status == "delivered":
+                t["delivered"] += 1
+                t["_deliver"].append(ts - sent_at)
+            elif status == "read":
+                t["read"] += 1
+                t["_read"].append(ts - sent_at)
+            elif status == "failed":
+                t["failed"] += 1
+                t["error_codes"][code] = t["error_codes"].get(code, 0) + 1
+
+        for t in per.values():
+            deliver, read = t.pop("_deliver"), t.pop("_read")
+            t["failure_rate"] = round(t["failed"] / t["messages"], 4) if t["messages"] else 0.0
+            t["delivery_p50_s"] = _percentile(deliver, 0.50)
+            t["delivery_p95_s"] = _percentile(deliver, 0.95)
+            t["read_p50_s"] = _percentile(read, 0.50)
+        return per
+
+    def summary(self) -> dict:
+        return {"queued": self._q.qsize(), **self.stats}
+
+
+store = MessageStatusStore()
@@ -0,0 +1,443 @@
+"""
+metrics.py
+────────────────────────────────────────────
+In-process metrics registry exported in Prometheus text format at
+/metrics.
+
+ • Counter / Gauge / Histogram (fixed buckets), with labels; recording
+   is a dict update under a lock, no I/O on the request thread
+ • Cache hit rates and queue depths are read from the stores' existing
+   `stats` / summary() at scrape time, not counted twice
+ • Multi-worker (gunicorn): set METRICS_DIR and every worker writes a
+   JSON snapshot there each METRICS_FLUSH_S; whichever worker serves
+   /metrics merges them all. Counters and histograms are summed across
+   every file; gauges only across live workers. When a worker exits
+   the master (gunicorn child_exit → retire_worker) folds its counters
+   into exited.json and deletes its file, so totals never drop and a
+   reused PID starts clean. Files written before the current master
+   started (METRICS_SINCE, set by gunicorn.conf.py) are ignored
+ • Without METRICS_DIR, /metrics shows the serving worker only
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import bisect
+import glob
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+log = logging.getLogger(__name__)
+
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+FLUSH_S = float(os.getenv("METRICS_FLUSH_S", "5"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_SINCE = float(os.getenv("METRICS_SINCE") or 0)  # master start (epoch); older snapshots are a previous run
+EXITED_FILE = "exited.json"
+
+# Seconds; the top end covers REQUEST_TIMEOUT (35 s) GAS calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 35.0)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(k, "")) for k in self.labelnames)
+
+    def _copy(self, value):
+        return value
+
+    def family(self) -> dict:
+        with self._lock:
+            samples = [[list(k), self._copy(v)] for k, v in self._values.items()]
+        return {"kind": self.kind, "help": self.help, "labels": list(self.labelnames), "samples": samples}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)  # first bucket with le >= value
+        with self._lock:
+            h = self._values.get(key)
+            if h is None:
+                h = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            h[0][i] += 1
+            h[1] += value
+            h[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def family(self) -> dict:
+        return {**super().family(), "buckets": list(self.buckets)}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[tuple]]] = []
+
+    def _add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._add(Counter(name, help_, labelnames))
+
+    def gauge(self, name: str, help_: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help_, labelnames))
+
+    def histogram(self, name: str, help_: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_, labelnames, buckets))
+
+    def collector(self, fn: Callable[[], Iterable[tuple]]):
+        """fn() yields (name, kind, help, labels_dict, value) at scrape time; kind = counter | gauge."""
+        self._collectors.append(fn)
+        return fn
+
+    def collect(self) -> Dict[str, dict]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        out = {m.name: m.family() for m in metrics}
+        for fn in self._collectors:
+            try:
+                for name, kind, help_, labels, value in fn():
+                    if value is None:
+                        continue
+                    fam = out.setdefault(name, {"kind": kind, "help": help_, "labels": sorted(labels), "samples": []})
+                    fam["samples"].append([[str(labels[k]) for k in fam["labels"]], float(value)])
+            except Exception as e:
+                log.debug(f"[metrics] collector {getattr(fn, '__name__', fn)} failed: {e}")
+        return out
+
+
+REGISTRY = Registry()
+
+# ─────────────────────────────────────────────
+# Hot-path metrics
+# ─────────────────────────────────────────────
+http_seconds = REGISTRY.histogram(
+    "pilateshq_http_request_seconds", "Flask request handling time", ("endpoint", "method"))
+http_requests = REGISTRY.counter(
+    "pilateshq_http_requests_total", "Flask requests by response status", ("endpoint", "status"))
+webhook_seconds = REGISTRY.histogram(
+    "pilateshq_webhook_seconds", "Meta webhook handling time by routing branch", ("branch",))
+graph_send_seconds = REGISTRY.histogram(
+    "pilateshq_graph_send_seconds", "Graph /messages send latency by template", ("template",))
+graph_sends = REGISTRY.counter(
+    "pilateshq_graph_sends_total", "Graph sends by template and result (ok / Meta error code / HTTP status)",
+    ("template", "code"))
+outbound_seconds = REGISTRY.histogram(
+    "pilateshq_outbound_seconds", "Outbound call latency (kind = gas / graph / self, name = GAS action or path)",
+    ("kind", "name"))
+
+
+def _module(name: str):
+    """An app module only if something already imported it – collectors never trigger imports."""
+    return sys.modules.get(f"{__package__}.{name}")
+
+
+@REGISTRY.collector
+def _store_stats():
+    directory = getattr(_module("client_directory"), "directory", None)
+    if directory is not None:
+        yield ("pilateshq_cache_lookups_total", "counter", "Cache lookups by result",
+               {"cache": "client_directory", "result": "hit"}, directory.stats["hits"])
+        yield ("pilateshq_cache_lookups_total", "counter", "Cache lookups by result",
+               {"cache": "client_directory", "result": "miss"}, directory.stats["misses"])
+        yield ("pilateshq_cache_refreshes_total", "counter", "Cache refreshes from GAS",
+               {"cache": "client_directory"}, directory.stats["refreshes"])
+        yield ("pilateshq_cache_age_seconds", "gauge", "Seconds since the cache was last loaded",
+               {"cache": "client_directory"}, directory.summary()["age_s"])
+
+    snapshot = getattr(_module("session_snapshot"), "snapshot", None)
+    if snapshot is not None:
+        summary = snapshot.summary()
+        yield ("pilateshq_cache_refreshes_total", "counter", "Cache refreshes from GAS",
+               {"cache": "session_snapshot"}, summary["refreshes"])
+        yield ("pilateshq_cache_age_seconds", "gauge", "Seconds since the cache was last loaded",
+               {"cache": "session_snapshot"}, summary["age_s"])
+        yield ("pilateshq_queue_depth", "gauge", "Items waiting in an in-process queue",
+               {"queue": "session_snapshot_pending"}, summary["pending_local"])
+
+    window = getattr(_module("session_window"), "tracker", None)
+    if window is not None:
+        for state in ("open", "closed", "unknown"):
+            yield ("pilateshq_session_window_checks_total", "counter", "24h window lookups by answer",
+                   {"state": state}, window.stats[state])
+
+    ledger = getattr(_module("delivery_ledger"), "ledger", None)
+    if ledger is not None:
+        for result in ("claimed", "duplicates"):
+            yield ("pilateshq_ledger_claims_total", "counter", "Delivery ledger claims by result",
+                   {"result": result}, ledger.stats[result])
+
+    status = getattr(_module("message_status"), "store", None)
+    if status is not None:
+        yield ("pilateshq_queue_depth", "gauge", "Items waiting in an in-process queue",
+               {"queue": "message_status"}, status._q.qsize())
+
+    clients = _module("async_clients")
+    if clients is not None:
+        yield ("pilateshq_queue_depth", "gauge", "Items waiting in an in-process queue",
+               {"queue": "async_inflight"}, clients.stats["inflight"])
+
+    logs = _module("logging_setup")
+    if logs is not None and logs._handler is not None:
+        yield ("pilateshq_queue_depth", "gauge", "Items waiting in an in-process queue",
+               {"queue": "log"}, logs._handler.queue.qsize())
+        yield ("pilateshq_log_sampled_out_total", "counter", "Log lines dropped by sampling",
+               {}, logs.stats["dropped_sampled"])
+
+    timeline = getattr(_module("reminder_timeline"), "timeline", None)
+    if timeline is not None:
+        yield ("pilateshq_queue_depth", "gauge", "Items waiting in an in-process queue",
+               {"queue": "reminder_timeline"}, len(timeline._events))
+
+
+# ─────────────────────────────────────────────
+# Multi-worker snapshots (METRICS_DIR)
+# ─────────────────────────────────────────────
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def _dump(path: str, pid, families: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"pid": pid, "ts": time.time(), "metrics": families}, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _write_snapshot():
+    _dump(os.path.join(METRICS_DIR, f"{os.getpid()}.json"), os.getpid(), REGISTRY.collect())
+
+
+def _read_snapshot(path: str):
+    """A snapshot of this run, or None (missing, unreadable, or older than METRICS_SINCE)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            snap = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if float(snap.get("ts") or 0) < METRICS_SINCE:
+        return None
+    return snap
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_S)
+        try:
+            _write_snapshot()
+        except OSError as e:
+            log.warning(f"[metrics] snapshot write failed: {e}")
+
+
+def ensure_flusher():
+    """Start this worker's snapshot thread (after fork – never at import)."""
+    global _flusher_pid
+    if not METRICS_DIR or _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        if _flusher_pid != os.getpid():
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+            _flusher_pid = os.getpid()
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge_into(merged: dict, families: dict, live: bool):
+    for name, fam in families.items():
+        if fam["kind"] == "gauge" and not live:
+            continue
+        dst = merged.setdefault(name, {**fam, "samples": {}})
+        if fam["kind"] == "histogram" and dst.get("buckets") != fam.get("buckets"):
+            continue  # bucket layout changed between deploys – keep the first seen
+        for labels, value in fam["samples"]:
+            key = tuple(labels)
+            cur = dst["samples"].get(key)
+            if fam["kind"] == "histogram":
+                if cur is None:
+                    dst["samples"][key] = [list(value[0]), value[1], value[2]]
+                else:
+                    cur[0] = [a + b for a, b in zip(cur[0], value[0])]
+                    cur[1] += value[1]
+                    cur[2] += value[2]
+            else:
+                dst["samples"][key] = (cur or 0.0) + value
+
+
+def _as_families(merged: Dict[str, dict]) -> Dict[str, dict]:
+    for fam in merged.values():
+        fam["samples"] = [[list(k), v] for k, v in fam["samples"].items()]
+    return merged
+
+
+def retire_worker(pid: int):
+    """gunicorn child_exit (master): fold an exited worker's counters into exited.json, drop its file."""
+    if not METRICS_DIR:
+        return
+    path = os.path.join(METRICS_DIR, f"{pid}.json")
+    exited = os.path.join(METRICS_DIR, EXITED_FILE)
+    merged: Dict[str, dict] = {}
+    for snap in (_read_snapshot(exited), _read_snapshot(path)):
+        if snap:
+            _merge_into(merged, snap.get("metrics") or {}, live=False)
+    try:
+        _dump(exited, None, _as_families(merged))
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        log.warning(f"[metrics] could not retire worker {pid}: {e}")
+
+
+def gather() -> Dict[str, dict]:
+    """Families for /metrics: this worker alone, or every worker under METRICS_DIR."""
+    if not METRICS_DIR:
+        return REGISTRY.collect()
+    try:
+        ensure_flusher()
+        _write_snapshot()
+    except OSError as e:
+        log.warning(f"[metrics] snapshot write failed: {e}")
+    merged: Dict[str, dict] = {}
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        snap = _read_snapshot(path)
+        if snap is None:
+            continue
+        pid = int(snap.get("pid") or 0)
+        _merge_into(merged, snap.get("metrics") or {}, pid > 0 and _alive(pid))
+    return _as_families(merged)
+
+
+# ─────────────────────────────────────────────
+# Prometheus text exposition (format 0.0.4)
+# ─────────────────────────────────────────────
+def _num(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _labels(pairs: List[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    esc = (lambda s: s.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+def render(families: Dict[str, dict]) -> str:
+    lines = []
+    for name in sorted(families):
+        fam = families[name]
+        lines.append(f"# HELP {name} {fam['help']}")
+        lines.append(f"# TYPE {name} {fam['kind']}")
+        for labels, value in sorted(fam["samples"], key=lambda s: s[0]):
+            base = list(zip(fam["labels"], labels))
+            if fam["kind"] != "histogram":
+                lines.append(f"{name}{_labels(base)} {_num(value)}")
+                continue
+            counts, total, n = value
+            cum = 0
+            for le, c in zip(list(fam["buckets"]) + [math.inf], counts):
+                cum += c
+                lines.append(f"{name}_bucket{_labels(base + [('le', _num(le))])} {cum}")
+            lines.append(f"{name}_sum{_labels(base)} {_num(total)}")
+            lines.append(f"{name}_count{_labels(base)} {n}")
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    """Request timing hooks + GET /metrics (both factories call this)."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _metrics_begin():
+        ensure_flusher()
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _metrics_end(response):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            http_seconds.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+            http_requests.inc(endpoint=endpoint, status=response.status_code)
+        return response
+
+    def metrics_view():
+        if METRICS_TOKEN and request.headers.get("Authorization", "") != f"Bearer {METRICS_TOKEN}":
+            return Response("forbidden\n", status=403, mimetype="text/plain")
+        return Response(render(gather()), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
@@ -0,0 +1,166 @@
+"""
+profiling.py
+────────────────────────────────────────────
+Production profiling for the hot paths, served by router_diag.
+
+ • sample(seconds) – wall-clock sampling profiler: reads every thread's
+   stack (sys._current_frames) PROFILE_HZ times a second and counts
+   collapsed stacks ("thread;file:func;file:func N"), ready for
+   flamegraph.pl / speedscope. Nothing is hooked into the interpreter,
+   so the rest of the worker runs at full speed.
+ • @profiled – opt-in cProfile for one request: send X-Profile: 1 plus
+   a valid X-Diag-Token. The pstats report is kept in a small ring
+   buffer (GET /diag/profiles/<id>) and the response carries
+   X-Profile-Id. cProfile sees the request thread only – time spent on
+   the async_clients loop shows up as the wait for its result.
+ • One profile at a time per worker (cProfile allows a single active
+   profiler on 3.12); a busy profiler just serves the request normally
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import cProfile
+import functools
+import io
+import itertools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from .config import diag_token_ok
+
+PROFILE_HZ = int(os.getenv("PROFILE_HZ", "100"))
+MAX_SECONDS = 60
+KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+TOP_N = 60
+
+# Leaf frames that mean "parked, not working" – skipped unless idle=1
+_IDLE = re.compile(r"(threading|queue|selectors|socketserver|socket|ssl)\.py:(wait|get|select|poll|accept|"
+                   r"serve_forever|_wait_for_tstate_lock|recv_into|read|readinto)$"
+                   r"|logging/handlers\.py:dequeue$")  # log listener blocked on its queue
+
+_busy = threading.Lock()
+_reports: "OrderedDict[str, dict]" = OrderedDict()
+_reports_lock = threading.Lock()
+_ids = itertools.count(1)
+
+
+def _label(code) -> str:
+    parts = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return f"{'/'.join(parts[-2:])}:{code.co_name}"
+
+
+def _thread_name(name: str) -> str:
+    return re.sub(r"[-_]\d+$", "", name)  # pool threads collapse into one root
+
+
+def sample(seconds: float, hz: int = PROFILE_HZ, idle: bool = False) -> Optional[dict]:
+    """Sample all other threads for `seconds`; None if a profile is already running."""
+    if not _busy.acquire(blocking=False):
+        return None
+    try:
+        seconds = max(0.1, min(float(seconds), MAX_SECONDS))
+        interval = 1.0 / max(1, hz)
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        ticks = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(_label(frame.f_code))
+                    frame = frame.f_back
+                if not frames or (not idle and _IDLE.search(frames[0])):
+                    continue
+                frames.append(_thread_name(names.get(tid, str(tid))))
+                stacks[";".join(reversed(frames))] += 1
+            ticks += 1
+            time.sleep(interval)
+        return {
+            "seconds": round(time.perf_counter() - started, 2),
+            "hz": hz,
+            "ticks": ticks,
+            "samples": sum(stacks.values()),
+            "stacks": stacks,
+        }
+    finally:
+        _busy.release()
+
+
+def collapsed(result: dict) -> str:
+    return "".join(f"{stack} {n}\n" for stack, n in result["stacks"].most_common())
+
+
+def top_functions(result: dict, limit: int = 30) -> list:
+    """Self / total sample counts per function, busiest first."""
+    own, total = Counter(), Counter()
+    for stack, n in result["stacks"].items():
+        frames = stack.split(";")[1:]
+        if frames:
+            own[frames[-1]] += n
+        for f in set(frames):
+            total[f] += n
+    return [{"func": f, "self": n, "total": total[f]} for f, n in own.most_common(limit)]
+
+
+# ─────────────────────────────────────────────
+# Per-request cProfile
+# ─────────────────────────────────────────────
+def _store(report: dict) -> str:
+    pid = f"{os.getpid()}-{next(_ids)}"
+    with _reports_lock:
+        _reports[pid] = report
+        while len(_reports) > KEEP:
+            _reports.popitem(last=False)
+    return pid
+
+
+def reports() -> list:
+    with _reports_lock:
+        return [{"id": k, **{f: v[f] for f in ("endpoint", "path", "at", "ms")}} for k, v in reversed(_reports.items())]
+
+
+def report(pid: str) -> Optional[dict]:
+    with _reports_lock:
+        return _reports.get(pid)
+
+
+def profiled(view):
+    """Run the view under cProfile when the request asks for it (X-Profile: 1 + X-Diag-Token)."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        from flask import make_response, request
+
+        if request.headers.get("X-Profile") != "1" or not diag_token_ok(request.headers.get("X-Diag-Token", "")):
+            return view(*args, **kwargs)
+        if not _busy.acquire(blocking=False):
+            resp = make_response(view(*args, **kwargs))
+            resp.headers["X-Profile-Id"] = "busy"
+            return resp
+        prof = cProfile.Profile()
+        t0 = time.perf_counter()
+        try:
+            result = prof.runcall(view, *args, **kwargs)
+        finally:
+            _busy.release()
+        ms = round((time.perf_counter() - t0) * 1000, 1)
+        out = io.StringIO()
+        pstats.Stats(prof, stream=out).strip_dirs().sort_stats("cumulative").print_stats(TOP_N)
+        pid = _store({"endpoint": request.endpoint, "path": request.path, "at": round(time.time(), 3),
+                      "ms": ms, "text": out.getvalue()})
+        resp = make_response(result)
+        resp.headers["X-Profile-Id"] = pid
+        return resp
+
+    return wrapper
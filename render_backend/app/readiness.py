@@ -0,0 +1,213 @@
+"""
+readiness.py
+────────────────────────────────────────────
+GET /ready – readiness for Render / load balancers, answered from cached
+state only, so the check never waits on GAS or Graph.
+
+ • A per-worker background prober (daemon thread, restarted after a
+   fork) HEADs the GAS and Graph origins every READY_PROBE_S through the
+   pooled utils.http() session (nothing runs server-side) and keeps the
+   result: reachable, round-trip ms, consecutive failures
+ • Dependency state: up / degraded (last probe failed) / down
+   (READY_DOWN_AFTER failures in a row) / unknown (not probed yet)
+ • Recent latency: p50 / p95 of real outbound calls per kind (gas /
+   graph / self) over the last READY_WINDOW_S, from the delta between
+   the prober's snapshots of metrics.outbound_seconds; Graph send errors
+   over the same window
+ • Queue depths and cache warmness (client directory, session snapshot,
+   compiled templates, pre-fork warm-up) from the stores' summaries
+ • 503 until create_app has finished; dependency state is informational
+   unless listed in READY_REQUIRE (e.g. `gas,graph`; default none)
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+PROBE_S = float(os.getenv("READY_PROBE_S", "30"))
+PROBE_TIMEOUT = float(os.getenv("READY_PROBE_TIMEOUT", "3"))
+DOWN_AFTER = int(os.getenv("READY_DOWN_AFTER", "3"))
+WINDOW_S = float(os.getenv("READY_WINDOW_S", "300"))
+REQUIRE = [d.strip() for d in os.getenv("READY_REQUIRE", "").split(",") if d.strip()]
+
+_deps: Dict[str, dict] = {}
+_history: deque = deque()  # (ts, {kind: bucket counts}, graph errors, graph sends)
+_lock = threading.Lock()
+_prober = {"pid": None}
+_prober_lock = threading.Lock()
+
+
+def _targets() -> Dict[str, str]:
+    from .config import SHEETS_API_URL, gas_url
+    from .utils import META_BASE_URL
+    return {"gas": gas_url("GAS_WEBHOOK_URL") or SHEETS_API_URL, "graph": META_BASE_URL}
+
+
+# ─────────────────────────────────────────────
+# Background prober
+# ─────────────────────────────────────────────
+def probe_once():
+    from .utils import warm_connections
+
+    for name, url in _targets().items():
+        result = warm_connections([url], timeout=PROBE_TIMEOUT)
+        value = next(iter(result.values()), "no url")
+        ok = isinstance(value, float)
+        with _lock:
+            prev = _deps.get(name, {})
+            failures = 0 if ok else prev.get("failures", 0) + 1
+            _deps[name] = {
+                "state": "up" if ok else ("down" if failures >= DOWN_AFTER else "degraded"),
+                "reachable": ok,
+                "probe_ms": value if ok else None,
+                "error": None if ok else value,
+                "failures": failures,
+                "checked_at": round(time.time(), 1),
+                "last_ok_at": round(time.time(), 1) if ok else prev.get("last_ok_at"),
+            }
+    _snapshot()
+
+
+def _snapshot():
+    fam = metrics.outbound_seconds.family()
+    by_kind: Dict[str, list] = {}
+    for labels, (counts, _, _) in fam["samples"]:
+        acc = by_kind.setdefault(labels[0], [0] * len(counts))
+        for i, c in enumerate(counts):
+            acc[i] += c
+    errors = sends = 0
+    for labels, value in metrics.graph_sends.family()["samples"]:
+        sends += value
+        if labels[1] != "ok":
+            errors += value
+    now = time.time()
+    with _lock:
+        _history.append((now, by_kind, errors, sends))
+        while len(_history) > 2 and _history[1][0] <= now - WINDOW_S:
+            _history.popleft()
+
+
+def _loop():
+    while True:
+        try:
+            probe_once()
+        except Exception as e:
+            log.warning(f"[ready] probe failed: {e}")
+        time.sleep(PROBE_S)
+
+
+def ensure_prober():
+    """Start this process's prober if it is not running (cheap; called per /ready hit)."""
+    if _prober["pid"] == os.getpid():
+        return
+    with _prober_lock:
+        if _prober["pid"] != os.getpid():
+            threading.Thread(target=_loop, name="ready-prober", daemon=True).start()
+            _prober["pid"] = os.getpid()
+
+
+# ─────────────────────────────────────────────
+# Report
+# ─────────────────────────────────────────────
+def _quantile(buckets: tuple, counts: list, q: float) -> Optional[float]:
+    """Linear interpolation inside the bucket holding the q-th observation (Prometheus style)."""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for i, c in enumerate(counts):
+        if seen + c >= rank and c:
+            lo = buckets[i - 1] if i else 0.0
+            hi = buckets[i] if i < len(buckets) else buckets[-1]
+            return round((lo + (hi - lo) * (rank - seen) / c) * 1000, 1)
+        seen += c
+    return None
+
+
+def latencies() -> dict:
+    """p50 / p95 (ms) of outbound calls per kind between the oldest and newest snapshot in the window."""
+    with _lock:
+        if not _history:
+            return {"window_s": 0}
+        (t0, old, err0, sent0), (t1, new, err1, sent1) = _history[0], _history[-1]
+        if len(_history) == 1:  # first probe: everything since start counts as recent
+            old, err0, sent0 = {}, 0, 0
+    buckets = metrics.outbound_seconds.buckets
+    out = {"window_s": round(t1 - t0)}
+    for kind, counts in sorted(new.items()):
+        delta = [c - o for c, o in zip(counts, old.get(kind, [0] * len(counts)))]
+        if sum(delta):
+            out[kind] = {"calls": sum(delta), "p50_ms": _quantile(buckets, delta, 0.50),
+                         "p95_ms": _quantile(buckets, delta, 0.95)}
+    out["graph_send_errors"] = int(err1 - err0)
+    out["graph_sends"] = int(sent1 - sent0)
+    return out
+
+
+def queues() -> dict:
+    return {labels["queue"]: value for name, _, _, labels, value in metrics._store_stats()
+            if name == "pilateshq_queue_depth" and value is not None}
+
+
+def caches() -> dict:
+    out = {}
+    directory = getattr(metrics._module("client_directory"), "directory", None)
+    if directory is not None:
+        s = directory.summary()
+        out["client_directory"] = {"warm": s["age_s"] is not None and s["age_s"] < 2 * directory.ttl,
+                                   "clients": s["clients"], "age_s": s["age_s"]}
+    snapshot = getattr(metrics._module("session_snapshot"), "snapshot", None)
+    if snapshot is not None:
+        s = snapshot.summary()
+        out["session_snapshot"] = {"warm": s["age_s"] is not None and s["age_s"] < 2 * snapshot.ttl,
+                                   "age_s": s["age_s"]}
+    templates = metrics._module("wa_templates")
+    if templates is not None:
+        out["templates"] = {"warm": bool(templates._compiled), "compiled": len(templates._compiled)}
+    warmup = metrics._module("warmup")
+    if warmup is not None:
+        out["prefork_warmup"] = warmup._state["prefork"] is not None
+    return out
+
+
+def report() -> dict:
+    from . import startup
+
+    with _lock:
+        deps = {name: dict(d) for name, d in _deps.items()}
+    for name in _targets():
+        deps.setdefault(name, {"state": "unknown"})
+    app_ready = startup._state["ready_at"] is not None
+    blocking = [name for name in REQUIRE if deps.get(name, {}).get("state") == "down"]
+    return {
+        "ready": app_ready and not blocking,
+        "app_ready": app_ready,
+        "blocking": blocking,
+        "pid": os.getpid(),
+        "dependencies": deps,
+        "latency": latencies(),
+        "queues": queues(),
+        "caches": caches(),
+    }
+
+
+def init_app(app):
+    """GET /ready (create_app calls this)."""
+    from flask import jsonify
+
+    def ready_view():
+        ensure_prober()
+        body = report()
+        return jsonify(body), 200 if body["ready"] else 503
+
+    app.add_url_rule("/ready", "ready", ready_view, methods=["GET"])
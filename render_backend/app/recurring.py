@@ -0,0 +1,150 @@
+"""
+recurring.py
+────────────────────────────────────────────
+Recurring-booking engine for admin commands ("Book Peter every Tuesday
+09h00 duo").
+
+ • Dates come from logic_models.materialise_upcoming_from_standing
+   (weekday arithmetic, no day-by-day strftime walk)
+ • One pass over the slot index drops dates the client is already
+   booked on, or whose slot is full
+ • All rows are written with a single `add_sessions_bulk` GAS call on a
+   background worker, so Nadine's confirmation goes out immediately.
+   Rows are reserved in the slot index up front and released again if
+   the write fails. Per-row `add_session` is only a fallback for a GAS
+   deployment that answers "unknown action"; a timeout or GAS error is
+   reported, never rewritten (the bulk write may still have landed)
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Callable, List, Optional, Tuple
+
+from .logic_models import StandingSlot, materialise_upcoming_from_standing
+from .slot_index import slots
+from .utils import post_to_webhook
+from .config import SHEETS_API_URL
+
+log = logging.getLogger(__name__)
+
+WEEKDAY_INDEX = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
+    "friday": 4, "saturday": 5, "sunday": 6,
+}
+DEFAULT_WEEKS = 8
+
+# Sheet writes run off the request thread; two workers keep order per admin burst.
+_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bulk-sessions")
+
+
+def weekday_index(name: str) -> Optional[int]:
+    """'Tuesday' / 'tue' → 1; None if unrecognised."""
+    n = (name or "").strip().lower()
+    if n in WEEKDAY_INDEX:
+        return WEEKDAY_INDEX[n]
+    for full, idx in WEEKDAY_INDEX.items():
+        if len(n) >= 3 and full.startswith(n):
+            return idx
+    return None
+
+
+def _row(client_name: str, wa_number: str, d: str, start_time: str, slot_type: str, notes: str = "") -> dict:
+    return {
+        "client_name": client_name,
+        "wa_number": wa_number or "",
+        "session_date": d,
+        "start_time": start_time,
+        "session_type": slot_type,
+        "status": "confirmed",
+        "notes": notes,
+    }
+
+
+def plan_weekly(
+    client_name: str,
+    wa_number: str,
+    weekday: int,
+    start_time: str,
+    slot_type: str,
+    weeks: int = DEFAULT_WEEKS,
+    today: Optional[date] = None,
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Materialise `weeks` weekly occurrences and split them into
+    (rows_to_create, conflicts) against the slot index.
+    """
+    slot = StandingSlot(client_id=client_name, weekday=weekday, time_hhmm=start_time, slot_type=slot_type)
+    candidates = [
+        _row(client_name, wa_number, d.isoformat(), t, slot_type)
+        for d, t, _ in materialise_upcoming_from_standing([slot], today=today, horizon_weeks=weeks)
+    ]
+    return split_conflicts(candidates)
+
+
+def split_conflicts(rows: List[dict]) -> Tuple[List[dict], List[dict]]:
+    """
+    One pass: rows whose client is already in the slot, or whose slot is
+    full, are conflicts (each carries a "conflict" reason).
+    """
+    return slots.split(rows)
+
+
+def _unknown_action(res) -> bool:
+    """GAS answered, but without an add_sessions_bulk route (older deployment)."""
+    if not isinstance(res, dict) or res.get("ok"):
+        return False
+    detail = " ".join(str(res.get(k) or "") for k in ("error", "message", "text")).lower()
+    return "unknown action" in detail
+
+
+def _write_bulk(rows: List[dict]) -> dict:
+    """Write rows to the sheet; the result's "failed_rows" are the rows known not to be written."""
+    res = post_to_webhook(SHEETS_API_URL, {"action": "add_sessions_bulk", "sessions": rows})
+    if isinstance(res, dict) and res.get("ok"):
+        return res
+    if not _unknown_action(res):
+        # Timeout or GAS error: GAS may still finish the bulk write (it waits up to 20 s
+        # for its lock), so rewriting row by row could duplicate sessions
+        error = res.get("error") if isinstance(res, dict) else None
+        return {"ok": False, "error": error or f"add_sessions_bulk failed: {res}", "failed_rows": rows}
+    log.warning(f"[recurring] add_sessions_bulk unknown to GAS; writing {len(rows)} rows individually")
+    failed_rows = []
+    for r in rows:
+        one = post_to_webhook(SHEETS_API_URL, {"action": "add_session", **r})
+        if isinstance(one, dict) and one.get("ok") is False:
+            failed_rows.append(r)
+    return {"ok": not failed_rows, "written": len(rows) - len(failed_rows), "failed": len(failed_rows),
+            "failed_rows": failed_rows}
+
+
+def submit_bulk(rows: List[dict], on_done: Optional[Callable[[dict], None]] = None):
+    """
+    Record rows in the slot index now and write them to the sheet in the background;
+    rows that were not written are released from the index and reminder timeline.
+    `on_done(result)` runs on the writer thread once GAS has answered.
+    """
+    if not rows:
+        return None
+    slots.book(rows)
+
+    def _job():
+        try:
+            result = _write_bulk(rows)
+        except Exception as e:
+            log.exception("[recurring] bulk write failed")
+            result = {"ok": False, "error": str(e)}
+        failed_rows = result.pop("failed_rows", [] if result.get("ok") else rows)
+        if failed_rows:
+            slots.release(failed_rows)
+        log.info(f"[recurring] bulk write of {len(rows)} sessions → {result}")
+        if on_done:
+            try:
+                on_done(result)
+            except Exception as e:
+                log.warning(f"[recurring] on_done callback failed: {e}")
+        return result
+
+    return _writer.submit(_job)
@@ -0,0 +1,229 @@
+"""
+reminder_timeline.py
+────────────────────────────────────────────
+Precomputed next-hour reminder timeline.
+
+Instead of GAS polling the calendar every 5 minutes, the scheduler
+leader keeps a min-heap of (session_start − REMINDER_LEAD_MIN, session)
+events:
+
+ • built from the session snapshot (rebuilt when the snapshot refreshes)
+ • updated on booking / cancel via slot_index (other workers' bookings
+   arrive with the next snapshot refresh)
+ • one timer thread sleeps exactly until the next event is due
+
+Each session is reminded once (keys persisted in REMINDER_STATE_FILE
+after delivery), so there are no duplicate or skipped reminders at
+5-minute boundaries. Rows that fail to send go back on the heap and are
+retried after RETRY_S while the session has not begun.
+Events that fell due while no leader was running are sent on start-up
+as long as the session has not begun.
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from .session_snapshot import snapshot, session_key, is_active
+
+log = logging.getLogger(__name__)
+TZ = ZoneInfo("Africa/Johannesburg")
+
+LEAD_MIN = int(os.getenv("REMINDER_LEAD_MIN", "60"))
+STATE_FILE = os.getenv("REMINDER_STATE_FILE", "/tmp/pilateshq-reminders.json")
+RESYNC_EVERY = 120  # seconds; upper bound on a sleep so snapshot refreshes are picked up
+RETRY_S = 60        # seconds before a failed reminder is retried
+
+Key = Tuple[str, str, str]
+
+
+def session_start(s: dict) -> Optional[datetime]:
+    try:
+        return datetime.strptime(f"{s.get('session_date')} {str(s.get('start_time') or '')[:5]}",
+                                 "%Y-%m-%d %H:%M").replace(tzinfo=TZ)
+    except ValueError:
+        return None
+
+
+class ReminderTimeline:
+    def __init__(self, lead_min: int = LEAD_MIN, state_file: str = STATE_FILE):
+        self.lead = timedelta(minutes=lead_min)
+        self.state_file = state_file
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, Key]] = []
+        self._events: Dict[Key, Tuple[float, dict]] = {}  # live events; heap entries not matching are stale
+        self._sent: Dict[Key, float] = {}                  # key → session start ts
+        self._inflight: set = set()                        # popped, not yet delivered
+        self._generation = -1
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"sent": 0, "rebuilds": 0, "late": 0, "wakeups": 0}
+
+    # ── Sent-key persistence ─────────────────────────────────
+    def _load_sent(self):
+        try:
+            with open(self.state_file) as f:
+                self._sent = {tuple(k.split("|")): v for k, v in json.load(f).items()}
+        except (OSError, ValueError):
+            self._sent = {}
+
+    def _save_sent(self):
+        cutoff = time.time() - 6 * 3600
+        self._sent = {k: v for k, v in self._sent.items() if v >= cutoff}
+        tmp = f"{self.state_file}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"|".join(k): v for k, v in self._sent.items()}, f)
+            os.replace(tmp, self.state_file)
+        except OSError as e:
+            log.warning(f"[timeline] could not save state: {e}")
+
+    # ── Event maintenance (caller holds _cond) ───────────────
+    def _push(self, row: dict, now: float, due: Optional[float] = None):
+        if not is_active(row) or not (row.get("wa_number") or "").strip():
+            return
+        start = session_start(row)
+        if start is None or start.timestamp() <= now:
+            return
+        key = session_key(row)
+        if key in self._sent or key in self._inflight:
+            return
+        due = (start - self.lead).timestamp() if due is None else due
+        self._events[key] = (due, row)
+        heapq.heappush(self._heap, (due, key))
+
+    def _sync(self):
+        """Rebuild from the snapshot when it has refreshed (caller holds _cond;
+        the snapshot itself is refreshed by _loop before taking it)."""
+        generation = snapshot.stats["refreshes"]
+        if generation == self._generation:
+            return
+        now = time.time()
+        self._heap, self._events = [], {}
+        for s in snapshot.sessions():
+            self._push(s, now)
+        self._generation = generation
+        self.stats["rebuilds"] += 1
+        log.info(f"[timeline] rebuilt: {len(self._events)} upcoming reminders")
+
+    def add(self, rows: List[dict]):
+        if not self._thread:
+            return  # not the leader; the snapshot rebuild covers it
+        with self._cond:
+            now = time.time()
+            for r in rows:
+                self._push(r, now)
+            self._cond.notify()
+
+    def remove(self, row: dict):
+        if not self._thread:
+            return
+        with self._cond:
+            self._events.pop(session_key(row), None)
+            self._cond.notify()
+
+    def _pop_due(self, now: float) -> Tuple[List[dict], Optional[float]]:
+        """Due rows, and the timestamp of the next live event."""
+        due: List[dict] = []
+        while self._heap:
+            ts, key = self._heap[0]
+            live = self._events.get(key)
+            if live is None or live[0] != ts:
+                heapq.heappop(self._heap)  # cancelled or re-timed
+                continue
+            if ts > now:
+                return due, ts
+            heapq.heappop(self._heap)
+            del self._events[key]
+            due.append(live[1])
+        return due, None
+
+    # ── Timer ────────────────────────────────────────────────
+    def _send(self, rows: List[dict]) -> List[dict]:
+        """Send reminders for `rows`; returns the rows that were not delivered."""
+        from .tasks_router import send_next_hour_reminders
+        now = time.time()
+        payload = []
+        for r in rows:
+            start = session_start(r)
+            if now - ((start - self.lead).timestamp()) > 60:
+                self.stats["late"] += 1
+            payload.append({**r, "session_time": str(r.get("start_time") or "")[:5]})
+        failed: List[dict] = []
+        sent = send_next_hour_reminders(payload, failed)
+        self.stats["sent"] += sent
+        log.info(f"[timeline] next-hour reminders sent={sent} of {len(rows)}")
+        return failed
+
+    def _settle(self, rows: List[dict], failed: List[dict]):
+        """Record delivered rows as sent and requeue failed ones (caller holds _cond)."""
+        failed_keys = {session_key(r) for r in failed}
+        now = time.time()
+        for r in rows:
+            key = session_key(r)
+            self._inflight.discard(key)
+            if key in failed_keys:
+                self._push(r, now, due=now + RETRY_S)
+            else:
+                self._sent[key] = session_start(r).timestamp()
+        self._save_sent()
+
+    def _loop(self):
+        self._load_sent()
+        while not self._stop.is_set():
+            try:
+                snapshot.ensure_loaded()
+            except Exception as e:
+                log.warning(f"[timeline] snapshot refresh failed: {e}")
+            with self._cond:
+                try:
+                    self._sync()
+                except Exception as e:
+                    log.warning(f"[timeline] sync failed: {e}")
+                due, next_ts = self._pop_due(time.time())
+                self._inflight.update(session_key(r) for r in due)
+                if not due:
+                    wait = RESYNC_EVERY if next_ts is None else min(RESYNC_EVERY, next_ts - time.time())
+                    self._cond.wait(max(0.0, wait))
+                    self.stats["wakeups"] += 1
+            if due:
+                try:
+                    failed = self._send(due)
+                except Exception:
+                    log.exception("[timeline] sending reminders failed")
+                    failed = due
+                with self._cond:
+                    self._settle(due, failed)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="reminder-timeline", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+
+    def summary(self) -> dict:
+        with self._cond:
+            _, next_ts = self._pop_due(0)
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "upcoming": len(self._events),
+            "next_due": datetime.fromtimestamp(next_ts, TZ).isoformat(timespec="seconds") if next_ts else None,
+            **self.stats,
+        }
+
+
+timeline = ReminderTimeline()
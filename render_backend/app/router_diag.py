@@ -3,15 +3,26 @@
 router_diag.py
 ───────────────────────────────────────────────
 Handles diagnostic and utility routes such as
-invoice PDF rendering for client view.
+invoice PDF rendering for client view, plus the
+runtime diagnostics below (guarded by DIAG_TOKEN):
+ • /diag/slow-requests → slowest recent requests (tracing)
+ • /diag/profile       → sampling profiler, collapsed stacks
+ • /diag/profiles[/id] → per-request cProfile reports (X-Profile: 1)
+ • /diag/startup       → cold-start report (import steps, first request, pre-fork warm-up)
 """
 
 import io
-from flask import Blueprint, request, send_file, jsonify
-from .invoices import generate_invoice_pdf
+from flask import Blueprint, request, send_file, jsonify, Response
+from . import tracing, profiling, startup, warmup
+from .config import diag_token_ok
 
 bp = Blueprint("diag_bp", __name__)
 
+
+def _authorised() -> bool:
+    """X-Diag-Token header (or ?token=) must match DIAG_TOKEN; closed when unset."""
+    return diag_token_ok(request.headers.get("X-Diag-Token") or request.args.get("token") or "")
+
 @bp.route("/diag/invoice-pdf", methods=["GET"])
 def invoice_pdf():
     """
@@ -20,6 +31,8 @@ def invoice_pdf():
     /diag/invoice-pdf?client=Fatima%20Khan&month=Oct%202025&mobile=27720000000
     """
     try:
+        from .invoices import generate_invoice_pdf  # ReportLab only when a PDF is asked for
+
         client = request.args.get("client", "Unknown Client")
         month = request.args.get("month", "this month")
         mobile = request.args.get("mobile", "N/A")
@@ -33,3 +46,78 @@ def invoice_pdf():
         )
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@bp.route("/diag/slow-requests", methods=["GET"])
+def slow_requests():
+    """
+    Slowest requests from the tracing ring buffer, with their span breakdown.
+    Example: /diag/slow-requests?limit=10&path=/webhook
+    """
+    if not _authorised():
+        return jsonify({"ok": False, "error": "forbidden"}), 403
+    limit = request.args.get("limit", 20, type=int)
+    path = request.args.get("path")
+    items = tracing.slowest(tracing.RING_SIZE)
+    if path:
+        items = [r for r in items if r["path"].startswith(path)]
+    return jsonify({"ok": True, **tracing.summary(), "requests": items[:limit]}), 200
+
+
+@bp.route("/diag/profile", methods=["GET"])
+def sample_profile():
+    """
+    Samples every thread of this worker for N seconds (max 60).
+    Example: /diag/profile?seconds=10            → collapsed stacks (flamegraph.pl / speedscope)
+             /diag/profile?seconds=10&format=json → samples + busiest functions
+    Add idle=1 to keep threads parked in wait / select / accept.
+    """
+    if not _authorised():
+        return jsonify({"ok": False, "error": "forbidden"}), 403
+    result = profiling.sample(
+        request.args.get("seconds", 5, type=float),
+        hz=request.args.get("hz", profiling.PROFILE_HZ, type=int),
+        idle=request.args.get("idle") == "1",
+    )
+    if result is None:
+        return jsonify({"ok": False, "error": "profiler busy"}), 409
+    if request.args.get("format") == "json":
+        return jsonify({
+            "ok": True,
+            **{k: v for k, v in result.items() if k != "stacks"},
+            "top": profiling.top_functions(result),
+            "stacks": dict(result["stacks"].most_common(200)),
+        }), 200
+    return Response(profiling.collapsed(result), mimetype="text/plain")
+
+
+@bp.route("/diag/profiles", methods=["GET"])
+def list_profiles():
+    if not _authorised():
+        return jsonify({"ok": False, "error": "forbidden"}), 403
+    return jsonify({"ok": True, "profiles": profiling.reports()}), 200
+
+
+@bp.route("/diag/profiles/<pid>", methods=["GET"])
+def get_profile(pid):
+    """pstats report (cumulative) for one X-Profile request on this worker."""
+    if not _authorised():
+        return jsonify({"ok": False, "error": "forbidden"}), 403
+    rep = profiling.report(pid)
+    if rep is None:
+        return jsonify({"ok": False, "error": "unknown profile id (other worker, or rotated out)"}), 404
+    head = f"{rep['endpoint']} {rep['path']} – {rep['ms']} ms\n\n"
+    return Response(head + rep["text"], mimetype="text/plain")
+
+
+@bp.route("/diag/startup", methods=["GET"])
+def startup_report():
+    """
+    Cold-start breakdown for this worker: per-blueprint import/registration
+    time, heavy packages loaded, process start → ready, first request.
+    Per-module import times need STARTUP_IMPORT_TRACE=1 at boot.
+    """
+    if not _authorised():
+        return jsonify({"ok": False, "error": "forbidden"}), 403
+    return jsonify({"ok": True, **startup.report(request.args.get("top", 25, type=int)),
+                    "warmup": warmup.summary()}), 200
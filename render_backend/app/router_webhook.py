@@ -4,31 +4,40 @@ router_webhook.py – Phase 27J (Enhanced Debug Logs + Client Lookup Trace)
 Handles all incoming Meta Webhook events (GET verify + POST messages).
 
 ✅ Improvements vs 27I:
- • Adds detailed debug logs for client lookup (GAS response printed)
+ • Adds detailed debug logs for client lookup (GAS response at DEBUG)
  • Logs full message path: admin / NLP / client / guest
  • Confirms client fallback route execution
 ────────────────────────────────────────────────────────────
 """
 
 import os
-import json
 import re
+import time
+import logging
 import requests
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from .utils import send_whatsapp_text, send_whatsapp_template, normalize_wa
 from .client_reschedule_handler import handle_reschedule_event
 from .client_menu_router import send_client_menu
+from .client_directory import directory as client_directory
+from .message_status import store as message_status
+from .session_window import tracker as session_window
+from .config import gas_url, WEBHOOK_BASE
+from .tracing import span, outbound_headers
+from . import metrics
+from .logging_setup import SAMPLED
+from .profiling import profiled
 
 # ─────────────────────────────────────────────────────────────
 router_bp = Blueprint("router_bp", __name__)
+log = logging.getLogger(__name__)
 
 # ── Environment variables ─────────────────────────────────────
 VERIFY_TOKEN = os.getenv("META_VERIFY_TOKEN", "")
-WEBHOOK_BASE = os.getenv("WEBHOOK_BASE", "https://pilateshq-booking-bot.onrender.com")
 NADINE_WA = os.getenv("NADINE_WA", "")
 TEMPLATE_LANG = os.getenv("TEMPLATE_LANG", "en_US")
 TEMPLATE_GUEST_WELCOME = os.getenv("TEMPLATE_GUEST_WELCOME", "guest_welcome_us")
-GAS_WEBHOOK_URL = os.getenv("GAS_WEBHOOK_URL", "")
+GAS_WEBHOOK_URL = gas_url("GAS_WEBHOOK_URL")
 DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() == "true"
 
 # ── Endpoint constants ────────────────────────────────────────
@@ -59,9 +68,9 @@ def notify_admin(message: str):
         send_whatsapp_template(
             NADINE_WA, "admin_generic_alert_us", TEMPLATE_LANG, [message],
         )
-        print(f"✅ Admin alert: {message}")
+        log.info("✅ Admin alert: %s", message)
     except Exception as e:
-        print(f"⚠️ notify_admin failed: {e}")
+        log.warning("⚠️ notify_admin failed: %s", e)
 
 
 # ─────────────────────────────────────────────────────────────
@@ -102,17 +111,24 @@ def _matches_any(text: str, keywords: set[str]) -> bool:
     return any(kw in text for kw in keywords)
 
 
+def _branch(name: str):
+    """Label this webhook call for metrics (admin / menu / button / nlp / reschedule / lookup / guest …)."""
+    g.webhook_branch = name
+
+
 def forward_client_action(payload: str, wa_number: str, name: str):
     """Forward an NLP-matched or button action to client_menu_router."""
     try:
-        requests.post(
-            CLIENT_MENU_ACTION_ENDPOINT,
-            json={"wa_number": wa_number, "name": name, "payload": payload},
-            timeout=REQUEST_TIMEOUT,
-        )
-        print(f"➡️ Forwarded action '{payload}' to client_menu_router for {wa_number}")
+        with span("self", "/client-menu/action"):
+            requests.post(
+                CLIENT_MENU_ACTION_ENDPOINT,
+                json={"wa_number": wa_number, "name": name, "payload": payload},
+                headers=outbound_headers(),
+                timeout=REQUEST_TIMEOUT,
+            )
+        log.info("➡️ Forwarded action '%s' to client_menu_router for %s", payload, wa_number, extra=SAMPLED)
     except Exception as e:
-        print(f"⚠️ Failed to forward client action '{payload}': {e}")
+        log.warning("⚠️ Failed to forward client action '%s': %s", payload, e)
 
 
 # ─────────────────────────────────────────────────────────────
@@ -124,7 +140,7 @@ def verify():
         request.args.get("hub.mode") == "subscribe"
         and request.args.get("hub.verify_token") == VERIFY_TOKEN
     ):
-        print("✅ Meta webhook verified.")
+        log.info("✅ Meta webhook verified.")
         return request.args.get("hub.challenge"), 200
     return "Forbidden", 403
 
@@ -132,14 +148,27 @@ def verify():
 # ─────────────────────────────────────────────────────────────
 # META MESSAGE HANDLER
 # ─────────────────────────────────────────────────────────────
+@router_bp.before_request
+def _webhook_timer():
+    g.webhook_started = time.perf_counter()
+
+
+@router_bp.after_request
+def _webhook_metrics(response):
+    started = g.pop("webhook_started", None)
+    if started is not None and request.endpoint == "router_bp.webhook" and request.method == "POST":
+        branch = g.pop("webhook_branch", "error" if response.status_code >= 500 else "other")
+        metrics.webhook_seconds.observe(time.perf_counter() - started, branch=branch)
+    return response
+
+
 @router_bp.route("/webhook", methods=["POST"])
+@profiled
 def webhook():
     data = request.get_json(force=True)
     if DEBUG_MODE:
-        try:
-            print("📩 Full webhook (DEBUG):", json.dumps(data, indent=2))
-        except Exception:
-            print("📩 Full webhook (DEBUG): <non-serializable payload>")
+        # Rendered on the log thread, and only when DEBUG is actually enabled
+        log.debug("📩 Full webhook (DEBUG): %r", data)
 
     try:
         entry = (data.get("entry") or [{}])[0]
@@ -147,38 +176,54 @@ def webhook():
         value = change.get("value", {})
 
         if "statuses" in value:
+            _branch("status")
+            # Delivery / read receipts → batched status store (joined to outgoing wamids)
+            statuses = value.get("statuses") or []
+            message_status.ingest(statuses)
+            for st in statuses:
+                # Async re-engagement failure: the 24h window is closed for this contact
+                if any(str(e.get("code")) == "131047" for e in st.get("errors") or []):
+                    session_window.mark_closed(normalize_wa(st.get("recipient_id", "")))
             return jsonify({"ok": True, "type": "status"}), 200
         if "messages" not in value:
+            _branch("ignored")
             return jsonify({"ok": True, "type": "ignored"}), 200
 
         msg = value["messages"][0]
         wa_number = normalize_wa(msg.get("from", ""))
+        session_window.touch(wa_number, msg.get("timestamp"))
         contacts = value.get("contacts", [])
         profile_name = contacts[0]["profile"]["name"] if contacts else "Unknown"
         cmd_upper = extract_message_text(msg)
         lower_text = cmd_upper.lower()
 
-        print(f"💬 Received message '{cmd_upper}' from {profile_name} ({wa_number})")
+        log.info("💬 Received %s message from %s", msg.get("type") or "?", wa_number, extra=SAMPLED)
+        log.debug("💬 Message text '%s' from %s (%s)", cmd_upper, profile_name, wa_number)
 
         # ─────────────────────────────
         # ADMIN COMMANDS
         # ─────────────────────────────
         if wa_number == NADINE_WA:
-            print("👑 Admin message detected.")
+            _branch("admin")
+            log.info("👑 Admin message detected.")
             if any(lower_text.startswith(c) for c in ["book ", "suspend ", "resume "]):
-                r = requests.post(
-                    STANDING_ENDPOINT,
-                    json={"from": wa_number, "text": cmd_upper},
-                    timeout=REQUEST_TIMEOUT,
-                )
+                with span("self", "/tasks/standing/command"):
+                    r = requests.post(
+                        STANDING_ENDPOINT,
+                        json={"from": wa_number, "text": cmd_upper},
+                        headers=outbound_headers(),
+                        timeout=REQUEST_TIMEOUT,
+                    )
                 notify_admin(f"Standing command processed ({r.status_code})")
                 return jsonify({"status": "standing handled"}), 200
 
             if lower_text.startswith("invoice "):
                 client = cmd_upper.split(" ", 1)[1].strip()
-                requests.post(
-                    INVOICE_ENDPOINT, json={"client_name": client}, timeout=REQUEST_TIMEOUT
-                )
+                with span("self", "/invoices/review-one"):
+                    requests.post(
+                        INVOICE_ENDPOINT, json={"client_name": client},
+                        headers=outbound_headers(), timeout=REQUEST_TIMEOUT,
+                    )
                 notify_admin(f"Invoice sent for {client}")
                 return jsonify({"status": "invoice handled"}), 200
 
@@ -191,70 +236,85 @@ def webhook():
         # CLIENT MENU / ACTIONS
         # ─────────────────────────────
         if lower_text in ["menu", "help", "hi", "hello", "start"]:
-            print("📋 Client requested menu (keyword trigger).")
+            _branch("menu")
+            log.debug("📋 Client requested menu (keyword trigger).")
             send_client_menu(wa_number, profile_name)
             return jsonify({"status": "menu sent"}), 200
 
         # Buttons or direct payloads
         if cmd_upper in ("MY_SCHEDULE", "MY SCHEDULE"):
+            _branch("button")
             forward_client_action("MY_SCHEDULE", wa_number, profile_name)
             return jsonify({"status": "client action forwarded"}), 200
         if cmd_upper in ("VIEW_INVOICE", "VIEW LATEST INVOICE"):
+            _branch("button")
             forward_client_action("VIEW_INVOICE", wa_number, profile_name)
             return jsonify({"status": "client action forwarded"}), 200
 
         # NLP text routing
         norm = _normalize_for_nlp(lower_text)
         if _matches_any(norm, SCHEDULE_KWS):
-            print("🧭 NLP match → MY_SCHEDULE")
+            _branch("nlp")
+            log.debug("🧭 NLP match → MY_SCHEDULE")
             forward_client_action("MY_SCHEDULE", wa_number, profile_name)
             return jsonify({"status": "client action forwarded"}), 200
         if _matches_any(norm, INVOICE_KWS):
-            print("🧭 NLP match → VIEW_INVOICE")
+            _branch("nlp")
+            log.debug("🧭 NLP match → VIEW_INVOICE")
             forward_client_action("VIEW_INVOICE", wa_number, profile_name)
             return jsonify({"status": "client action forwarded"}), 200
 
         # Reschedule / cancel
         if any(x in norm for x in ["reschedule", "cancel", "cant make", "can't make", "no show", "skip"]):
-            print("🔁 Detected reschedule or cancellation phrase.")
+            _branch("reschedule")
+            log.info("🔁 Detected reschedule or cancellation phrase from %s", wa_number)
             return handle_reschedule_event(profile_name, wa_number, cmd_upper, is_admin=False)
 
         # ─────────────────────────────
         # CLIENT LOOKUP → fallback menu if known
         # ─────────────────────────────
-        print(f"🔍 Performing client lookup for WA={wa_number}")
+        _branch("lookup")
+        log.debug("🔍 Performing client lookup for WA=%s", wa_number)
         lookup = {}
-        if GAS_WEBHOOK_URL:
+        known = client_directory.by_wa(wa_number, wait=False)  # cold directory → GAS lookup below
+        if known:
+            lookup = {"ok": True, "client_name": known.get("name")}
+            log.debug("📇 Client directory hit for WA=%s", wa_number)
+        elif GAS_WEBHOOK_URL:
             try:
-                r = requests.post(
-                    GAS_WEBHOOK_URL,
-                    json={"action": "lookup_client_name", "wa_number": wa_number},
-                    timeout=REQUEST_TIMEOUT,
-                )
-                print(f"🔎 GAS responded ({r.status_code}): {r.text[:300]}")
+                with span("gas", "lookup_client_name"):
+                    r = requests.post(
+                        GAS_WEBHOOK_URL,
+                        json={"action": "lookup_client_name", "wa_number": wa_number},
+                        timeout=REQUEST_TIMEOUT,
+                    )
+                log.debug("🔎 GAS responded (%s): %.300s", r.status_code, r.text)
                 lookup = r.json() if r.ok else {}
+                if lookup.get("ok"):
+                    client_directory.upsert({"name": lookup.get("client_name") or profile_name, "phone": wa_number})
             except Exception as e:
-                print(f"⚠️ lookup_client_name request failed: {e}")
+                log.warning("⚠️ lookup_client_name request failed: %s", e)
 
         if lookup.get("ok"):
             client_found = lookup.get("client_name") or profile_name
-            print(f"✅ Known client detected ({client_found}) → Sending client menu.")
+            log.info("✅ Known client detected (%s) → Sending client menu.", client_found, extra=SAMPLED)
             send_client_menu(wa_number, client_found)
             return jsonify({"status": "client fallback"}), 200
         else:
-            print("❌ Client lookup returned no match. Proceeding to guest response.")
+            log.debug("❌ Client lookup returned no match. Proceeding to guest response.")
 
         # ─────────────────────────────
         # Guest fallback
         # ─────────────────────────────
-        print(f"🙋 Guest detected: {profile_name} ({wa_number})")
+        _branch("guest")
+        log.info("🙋 Guest detected: %s (%s)", profile_name, wa_number)
         try:
             send_whatsapp_template(
                 wa_number, TEMPLATE_GUEST_WELCOME, TEMPLATE_LANG, [profile_name or "there"]
             )
-            print(f"✅ Guest template sent via {TEMPLATE_GUEST_WELCOME}")
+            log.debug("✅ Guest template sent via %s", TEMPLATE_GUEST_WELCOME)
         except Exception as e:
-            print(f"⚠️ Template send failed ({e}), using text fallback.")
+            log.warning("⚠️ Template send failed (%s), using text fallback.", e)
             msg = (
                 "🤖 Hello! This is the PilatesHQ Chatbot.\n\n"
                 "This WhatsApp number is reserved for *registered clients* to manage bookings, reminders, and invoices.\n\n"
@@ -262,11 +322,11 @@ def webhook():
                 "email 📧 lu@pilateshq.co.za, or visit 🌐 www.pilateshq.co.za 💜"
             )
             send_whatsapp_text(wa_number, msg)
-        print("✅ Guest politely redirected (no lead created)")
         return jsonify({"status": "guest message"}), 200
 
     except Exception as e:
-        print(f"❌ Webhook processing error: {e}")
+        _branch("error")
+        log.exception("❌ Webhook processing error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -18,13 +18,15 @@ import os, logging, requests
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 from .utils import send_safe_message
+from .config import gas_url
+from .tracing import span
 
 bp = Blueprint("schedule_bp", __name__)
 log = logging.getLogger(__name__)
 
 # ── Environment ─────────────────────────────────────────────
-GAS_SCHEDULE_URL   = os.getenv("GAS_SCHEDULE_URL", "")
-GAS_ATTENDANCE_URL = os.getenv("GAS_ATTENDANCE_URL", "")
+GAS_SCHEDULE_URL   = gas_url("GAS_SCHEDULE_URL")
+GAS_ATTENDANCE_URL = gas_url("GAS_ATTENDANCE_URL")
 NADINE_WA          = os.getenv("NADINE_WA", "")
 TPL_ADMIN          = "admin_generic_alert_us"
 
@@ -37,7 +39,8 @@ def _post_to_gas(payload: dict):
     if not url:
         return {"ok": False, "error": "Missing GAS_ATTENDANCE_URL or GAS_SCHEDULE_URL"}
     try:
-        r = requests.post(url, json=payload, timeout=20)
+        with span("gas", payload.get("action") or "post"):
+            r = requests.post(url, json=payload, timeout=20)
         return r.json() if r.ok else {"ok": False, "error": f"GAS HTTP {r.status_code}"}
     except Exception as e:
         log.error(f"GAS POST failed: {e}")
@@ -0,0 +1,289 @@
+"""
+scheduler.py
+────────────────────────────────────────────
+Optional in-process scheduler for the time-based jobs that otherwise
+arrive as Apps Script trigger POSTs to tasks_router.
+
+ • Enabled with INPROCESS_SCHEDULER=1 (GAS triggers should then be
+   switched off to avoid double sends)
+ • One leader across gunicorn workers: whoever holds the flock on
+   SCHEDULER_LOCK_FILE runs the jobs; others retry every LEADER_RETRY s
+ • Jobs read the local session snapshot, not a fresh GAS export per run
+ • Last run per job is kept in SCHEDULER_STATE_FILE; after a restart any
+   run missed within the job's catch-up window is executed once
+ • Per-job metrics (runs, failures, durations) via summary()
+ • Next-hour client reminders are not polled: the leader runs the
+   reminder_timeline heap/timer instead
+
+Times are Africa/Johannesburg.
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX dev machines: single process, always leader
+    fcntl = None
+
+from .session_snapshot import snapshot
+from .reminder_timeline import timeline
+
+log = logging.getLogger(__name__)
+TZ = ZoneInfo("Africa/Johannesburg")
+
+ENABLED = os.getenv("INPROCESS_SCHEDULER", "0").lower() in ("1", "true", "yes")
+LOCK_FILE = os.getenv("SCHEDULER_LOCK_FILE", "/tmp/pilateshq-scheduler.lock")
+STATE_FILE = os.getenv("SCHEDULER_STATE_FILE", "/tmp/pilateshq-scheduler.json")
+LEADER_RETRY = 60      # seconds between lock attempts by non-leaders
+JOB_DATA_MAX_AGE = 300  # seconds; older snapshots are refreshed before a job runs
+
+
+# ─────────────────────────────────────────────────────────────
+# Job definitions
+# ─────────────────────────────────────────────────────────────
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], object]
+    at: str = ""                   # "HH:MM" for daily / weekly jobs
+    weekday: Optional[int] = None  # 0=Mon … 6=Sun for weekly jobs
+    every_min: int = 0             # interval jobs (aligned to the clock)
+    catchup: timedelta = timedelta(hours=3)
+    stats: dict = field(default_factory=lambda: {
+        "runs": 0, "failures": 0, "catchups": 0, "last_run": None,
+        "last_ms": None, "avg_ms": None, "max_ms": None, "last_result": None, "last_error": None,
+    })
+
+    def _at(self, day: datetime) -> datetime:
+        hh, mm = (int(x) for x in self.at.split(":"))
+        return day.replace(hour=hh, minute=mm, second=0, microsecond=0)
+
+    def previous(self, now: datetime) -> datetime:
+        """Latest scheduled time at or before now."""
+        if self.every_min:
+            midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            steps = int((now - midnight).total_seconds() // (self.every_min * 60))
+            return midnight + timedelta(minutes=steps * self.every_min)
+        t = self._at(now)
+        if self.weekday is not None:
+            t -= timedelta(days=(now.weekday() - self.weekday) % 7)
+            return t if t <= now else t - timedelta(days=7)
+        return t if t <= now else t - timedelta(days=1)
+
+    def next_after(self, now: datetime) -> datetime:
+        prev = self.previous(now)
+        if self.every_min:
+            return prev + timedelta(minutes=self.every_min)
+        return prev + timedelta(days=7 if self.weekday is not None else 1)
+
+
+# ─────────────────────────────────────────────────────────────
+# Snapshot-driven job bodies
+# ─────────────────────────────────────────────────────────────
+def _reminder_rows(date_str: str) -> List[dict]:
+    """Snapshot sessions for a date in the shape the GAS triggers post."""
+    return [
+        {
+            "client_name": s.get("client_name"),
+            "wa_number": s.get("wa_number") or "",
+            "session_date": s.get("session_date"),
+            "session_time": str(s.get("start_time") or "")[:5],
+            "session_type": s.get("session_type"),
+        }
+        for s in snapshot.on_date(date_str)
+    ]
+
+
+def _fresh():
+    snapshot.ensure_fresh(JOB_DATA_MAX_AGE)
+
+
+def run_admin_morning():
+    from .admin_reminders import run_admin_morning
+    _fresh()
+    return run_admin_morning()
+
+
+def run_admin_daily():
+    from .admin_reminders import run_admin_daily
+    _fresh()
+    return run_admin_daily()
+
+
+def run_client_night_before():
+    from .tasks_router import send_night_before_reminders, _send_admin_message, _append_log_event
+    _fresh()
+    tomorrow = (datetime.now(TZ).date() + timedelta(days=1)).isoformat()
+    sent = send_night_before_reminders(_reminder_rows(tomorrow))
+    _send_admin_message(f"🌙 Sent night-before reminders ({sent}).")
+    _append_log_event(f"sent={sent}", "scheduler/night-before")
+    return sent
+
+
+def run_client_week_ahead():
+    from .tasks_router import send_week_ahead_reminders, _send_admin_message, _append_log_event
+    _fresh()
+    start = datetime.now(TZ).date() + timedelta(days=1)
+    rows: List[dict] = []
+    for i in range(7):
+        rows.extend(_reminder_rows((start + timedelta(days=i)).isoformat()))
+    sent = send_week_ahead_reminders(rows)
+    _send_admin_message(f"📅 Sent week-ahead reminders ({sent}).")
+    _append_log_event(f"sent={sent}", "scheduler/week-ahead")
+    return sent
+
+
+JOBS: List[Job] = [
+    Job("admin-morning", run_admin_morning, at="06:00"),
+    Job("admin-daily", run_admin_daily, at="20:00"),
+    Job("client-night-before", run_client_night_before, at="20:00"),
+    Job("client-week-ahead", run_client_week_ahead, at="20:00", weekday=6, catchup=timedelta(hours=2)),
+]
+
+
+# ─────────────────────────────────────────────────────────────
+# Scheduler
+# ─────────────────────────────────────────────────────────────
+class Scheduler:
+    def __init__(self, jobs: List[Job], lock_file: str = LOCK_FILE, state_file: str = STATE_FILE):
+        self.jobs = {j.name: j for j in jobs}
+        self.lock_file = lock_file
+        self.state_file = state_file
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_fd = None
+        self.is_leader = False
+
+    # ── Leader election ──────────────────────────────────────
+    def _try_lead(self) -> bool:
+        if fcntl is None:
+            return True
+        fd = open(self.lock_file, "a+")
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fd.close()
+            return False
+        fd.seek(0)
+        fd.truncate()
+        fd.write(str(os.getpid()))
+        fd.flush()
+        self._lock_fd = fd  # held for the life of the process
+        return True
+
+    # ── Persistent last-run state ────────────────────────────
+    def _load_state(self) -> Dict[str, float]:
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict[str, float]):
+        tmp = f"{self.state_file}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp, self.state_file)
+        except OSError as e:
+            log.warning(f"[scheduler] could not save state: {e}")
+
+    # ── Running ──────────────────────────────────────────────
+    def run_job(self, job: Job, catchup: bool = False):
+        st = job.stats
+        started = time.perf_counter()
+        try:
+            st["last_result"] = job.func()
+            st["last_error"] = None
+        except Exception as e:
+            st["failures"] += 1
+            st["last_error"] = str(e)
+            log.exception(f"[scheduler] job {job.name} failed")
+        ms = round((time.perf_counter() - started) * 1000, 1)
+        st["runs"] += 1
+        st["catchups"] += catchup
+        st["last_run"] = datetime.now(TZ).isoformat(timespec="seconds")
+        st["last_ms"] = ms
+        st["max_ms"] = max(st["max_ms"] or 0, ms)
+        st["avg_ms"] = ms if st["avg_ms"] is None else round(st["avg_ms"] + (ms - st["avg_ms"]) / st["runs"], 1)
+        log.info(f"[scheduler] {job.name}{' (catch-up)' if catchup else ''} → {st['last_result']} in {ms} ms")
+
+    def _catch_up(self, state: Dict[str, float]):
+        now = datetime.now(TZ)
+        for job in self.jobs.values():
+            if job.name not in state:
+                state[job.name] = time.time()  # first start: nothing to catch up
+                continue
+            due = job.previous(now)
+            if state[job.name] < due.timestamp() and now - due <= job.catchup:
+                self.run_job(job, catchup=True)
+                state[job.name] = time.time()
+        self._save_state(state)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if self._try_lead():
+                break
+            self._stop.wait(LEADER_RETRY)
+        if self._stop.is_set():
+            return
+        self.is_leader = True
+        log.info(f"[scheduler] pid {os.getpid()} is leader; jobs={list(self.jobs)}")
+
+        timeline.start()
+        state = self._load_state()
+        self._catch_up(state)
+        while not self._stop.is_set():
+            now = datetime.now(TZ)
+            due = min(j.next_after(now) for j in self.jobs.values())
+            if self._stop.wait(max(0.0, (due - datetime.now(TZ)).total_seconds())):
+                break
+            # Run every job sharing this due time (e.g. the 20h00 batch)
+            for j in self.jobs.values():
+                if j.next_after(now) == due:
+                    self.run_job(j)
+                    state[j.name] = time.time()
+            self._save_state(state)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        timeline.stop()
+
+    def summary(self) -> dict:
+        now = datetime.now(TZ)
+        return {
+            "enabled": ENABLED,
+            "leader": self.is_leader,
+            "pid": os.getpid(),
+            "jobs": {
+                name: {**j.stats, "next_run": j.next_after(now).isoformat(timespec="seconds")}
+                for name, j in self.jobs.items()
+            },
+            "next_hour_timeline": timeline.summary() if self.is_leader else None,
+        }
+
+
+scheduler = Scheduler(JOBS)
+
+
+def start_if_enabled():
+    """Called from create_app(); every worker starts a thread, one becomes leader."""
+    if ENABLED:
+        scheduler.start()
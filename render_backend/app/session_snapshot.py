@@ -0,0 +1,157 @@
+"""
+session_snapshot.py
+────────────────────────────────────────────
+Per-worker snapshot of the Sessions sheet.
+
+ • Loaded once via `get_sessions`, refreshed in the background after TTL
+ • Local bookings/cancellations are applied immediately (optimistic),
+   so conflict checks see writes that are still in flight to GAS
+ • Rows keep the sheet shape: session_date, start_time, client_name,
+   wa_number, session_type, status, notes
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from .utils import normalize_wa, post_to_webhook
+from .config import SHEETS_API_URL
+from .client_index import normalize_name
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_TTL = int(os.getenv("SESSION_SNAPSHOT_TTL", "120"))  # seconds
+RETRY_BACKOFF = 30
+
+
+def session_key(s: dict) -> Tuple[str, str, str]:
+    """(date, HH:MM, client identity) – identity is WA number, else normalised name."""
+    who = normalize_wa(s.get("wa_number") or "") or normalize_name(s.get("client_name"))
+    return (str(s.get("session_date") or ""), str(s.get("start_time") or "")[:5], who)
+
+
+def is_active(s: dict) -> bool:
+    """Rows that still occupy a slot (everything except cancelled / rescheduled)."""
+    st = (s.get("status") or "confirmed").strip().lower()
+    return "cancel" not in st and st != "rescheduled"
+
+
+class SessionSnapshot:
+    """Cached Sessions rows for one worker."""
+
+    def __init__(self, sheets_url: str = SHEETS_API_URL, ttl: int = SNAPSHOT_TTL):
+        self.sheets_url = sheets_url
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._refreshing = False
+        self._rows: List[dict] = []
+        self._pending: Dict[Tuple[str, str, str], dict] = {}  # local writes not yet seen in the sheet
+        self._loaded_at = 0.0
+        self._attempted_at = 0.0
+        self.stats = {"refreshes": 0, "local_writes": 0}
+
+    # ── Loading ──────────────────────────────────────────────
+    def refresh(self) -> int:
+        self._attempted_at = time.time()
+        res = post_to_webhook(self.sheets_url, {"action": "get_sessions"})
+        rows = res.get("sessions") if isinstance(res, dict) else None
+        if not isinstance(rows, list):
+            log.warning(f"[snapshot] get_sessions failed: {res}")
+            return 0
+        with self._lock:
+            seen = {session_key(r) for r in rows}
+            # Local writes stay visible until the sheet export includes them
+            self._pending = {k: v for k, v in self._pending.items() if k not in seen}
+            self._rows = rows
+            self._loaded_at = time.time()
+            self.stats["refreshes"] += 1
+        log.info(f"[snapshot] refreshed {len(rows)} sessions ({len(self._pending)} pending local)")
+        return len(rows)
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            log.warning(f"[snapshot] background refresh failed: {e}")
+        finally:
+            self._refreshing = False
+
+    def ensure_loaded(self):
+        if not self._loaded_at:
+            if time.time() - self._attempted_at < RETRY_BACKOFF:
+                return
+            with self._load_lock:
+                if not self._loaded_at and time.time() - self._attempted_at >= RETRY_BACKOFF:
+                    self.refresh()
+            return
+        if time.time() - self._loaded_at > self.ttl:
+            with self._lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            threading.Thread(target=self._background_refresh, name="session-snapshot-refresh", daemon=True).start()
+
+    def ensure_fresh(self, max_age: float):
+        """Synchronous refresh when older than max_age (scheduled jobs); keeps old rows on failure."""
+        if time.time() - self._loaded_at > max_age:
+            with self._load_lock:
+                if time.time() - self._loaded_at > max_age:
+                    self.refresh()
+
+    # ── Reads ────────────────────────────────────────────────
+    def sessions(self) -> List[dict]:
+        """All known rows (sheet + pending local writes)."""
+        self.ensure_loaded()
+        with self._lock:
+            return self._rows + list(self._pending.values())
+
+    def booked_keys(self) -> Set[Tuple[str, str, str]]:
+        """Keys of active rows, for one-pass duplicate checks."""
+        return {session_key(s) for s in self.sessions() if is_active(s)}
+
+    def on_date(self, date_str: str, active_only: bool = True) -> List[dict]:
+        return [s for s in self.sessions() if s.get("session_date") == date_str and (is_active(s) or not active_only)]
+
+    # ── Local writes ─────────────────────────────────────────
+    def add_local(self, rows: List[dict]):
+        """Record bookings written (or being written) to the sheet."""
+        with self._lock:
+            for r in rows:
+                self._pending[session_key(r)] = r
+            self.stats["local_writes"] += len(rows)
+
+    def drop_local(self, row: dict) -> bool:
+        """Forget a local write that never reached the sheet; True if it was pending."""
+        with self._lock:
+            return self._pending.pop(session_key(row), None) is not None
+
+    def cancel_local(self, session_date: str, start_time: str, wa_number: str = "", client_name: str = "") -> Optional[dict]:
+        """Mark a known row cancelled; returns the row if one matched."""
+        key = session_key({"session_date": session_date, "start_time": start_time,
+                           "wa_number": wa_number, "client_name": client_name})
+        with self._lock:
+            for r in list(self._pending.values()) + self._rows:
+                if session_key(r) == key and is_active(r):
+                    r["status"] = "cancelled"
+                    self.stats["local_writes"] += 1
+                    return r
+        return None
+
+    def summary(self) -> dict:
+        return {
+            "sessions": len(self._rows),
+            "pending_local": len(self._pending),
+            "age_s": round(time.time() - self._loaded_at, 1) if self._loaded_at else None,
+            **self.stats,
+        }
+
+
+# ─────────────────────────────────────────────────────────────
+# Shared per-worker instance
+# ─────────────────────────────────────────────────────────────
+snapshot = SessionSnapshot()
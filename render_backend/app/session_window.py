@@ -0,0 +1,139 @@
+"""
+session_window.py
+────────────────────────────────────────────
+Tracks each contact's last inbound WhatsApp message so senders know
+whether Meta's 24-hour customer-service window is open.
+
+ • router_webhook calls touch() for every inbound message
+ • send_safe_message asks state() up front: "open" → free text,
+   "closed" → template straight away, "unknown" → old behaviour
+   (text first, template on 131047)
+ • Shared by all workers via SQLite (SESSION_WINDOW_DB); open windows
+   are also cached in-process, but a cached entry is only trusted while
+   no other worker has written to the store (PRAGMA data_version), so a
+   131047 seen by one worker (mark_closed) closes the window for all
+ • Numbers are expected already normalised (normalize_wa) – utils
+   imports this module, so it cannot import utils back
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+log = logging.getLogger(__name__)
+
+WINDOW_DB = os.getenv("SESSION_WINDOW_DB", "/tmp/pilateshq-window.sqlite3")
+WINDOW_S = 24 * 3600
+SAFETY_S = 120  # treat windows about to close as closed
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS inbound (
+    wa      TEXT PRIMARY KEY,
+    last_in REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    k TEXT PRIMARY KEY,
+    v REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class SessionWindowTracker:
+    def __init__(self, path: str = WINDOW_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._tracking_since: Optional[float] = None
+        self._open: Dict[str, float] = {}  # wa → last inbound (only entries known to be recent)
+        self._data_version: Optional[int] = None  # store version the cache was last checked against
+        self.stats = {"open": 0, "closed": 0, "unknown": 0, "touches": 0, "cache_resets": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('tracking_since', ?)", (time.time(),))
+            self._tracking_since = conn.execute("SELECT v FROM meta WHERE k = 'tracking_since'").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def _store_changed(self) -> bool:
+        """True if another connection committed since the last call (caller holds _lock)."""
+        version = self._db().execute("PRAGMA data_version").fetchone()[0]
+        changed, self._data_version = version != self._data_version, version
+        return changed
+
+    def touch(self, wa: str, ts: Optional[float] = None):
+        """Record an inbound message (ts = Meta's message timestamp, epoch seconds)."""
+        if not wa:
+            return
+        try:
+            ts = float(ts or time.time())
+        except (TypeError, ValueError):
+            ts = time.time()
+        self._open[wa] = max(ts, self._open.get(wa, 0.0))
+        try:
+            with self._lock:
+                self._db().execute(
+                    "INSERT INTO inbound VALUES (?, ?) ON CONFLICT (wa) DO UPDATE SET last_in = "
+                    "MAX(last_in, excluded.last_in)",
+                    (wa, ts),
+                )
+            self.stats["touches"] += 1
+        except sqlite3.Error as e:
+            log.warning(f"[window] touch failed for {wa}: {e}")
+
+    def mark_closed(self, wa: str):
+        """Meta said 131047: the window is closed whatever we recorded."""
+        self._open.pop(wa, None)
+        try:
+            with self._lock:
+                self._db().execute(
+                    "INSERT INTO inbound VALUES (?, 0) ON CONFLICT (wa) DO UPDATE SET last_in = 0", (wa,)
+                )
+        except sqlite3.Error as e:
+            log.warning(f"[window] mark_closed failed for {wa}: {e}")
+
+    def state(self, wa: str) -> str:
+        """'open', 'closed' or 'unknown' for a free-text message right now."""
+        cutoff = time.time() - WINDOW_S + SAFETY_S
+        try:
+            with self._lock:
+                if self._store_changed():
+                    # Another worker touched or closed a window: cached entries may be stale
+                    if self._open:
+                        self.stats["cache_resets"] += 1
+                    self._open.clear()
+                cached = self._open.get(wa)
+                if cached is not None and cached >= cutoff:
+                    self.stats["open"] += 1
+                    return "open"
+                row = self._db().execute("SELECT last_in FROM inbound WHERE wa = ?", (wa,)).fetchone()
+        except sqlite3.Error as e:
+            log.warning(f"[window] lookup failed for {wa}: {e}")
+            self.stats["unknown"] += 1
+            return "unknown"
+        if row and row[0] >= cutoff:
+            self._open[wa] = row[0]
+            self.stats["open"] += 1
+            return "open"
+        self._open.pop(wa, None)
+        # No recent inbound is only conclusive once we've been tracking for a full window
+        if row or (self._tracking_since is not None and self._tracking_since <= cutoff):
+            self.stats["closed"] += 1
+            return "closed"
+        self.stats["unknown"] += 1
+        return "unknown"
+
+    def summary(self) -> dict:
+        return {"cached_open": len(self._open), "tracking_since": self._tracking_since, **self.stats}
+
+
+tracker = SessionWindowTracker()
@@ -0,0 +1,215 @@
+"""
+slot_index.py
+────────────────────────────────────────────
+In-memory slot occupancy index keyed by (session_date, HH:MM).
+
+ • Built from the session snapshot (rebuilt once per snapshot refresh)
+ • Bookings/cancels made by this worker update it in O(1) and are
+   forwarded to the next-hour reminder timeline; release() takes back
+   bookings whose sheet write failed
+ • check() answers "is this slot full / is the client already in it?"
+   before any Apps Script call is made
+
+Capacity follows the session type already in the slot: a single
+session closes the slot, a duo holds two, a group up to GROUP_CAPACITY.
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import date
+from typing import Dict, List, Optional, Set, Tuple
+
+from .session_snapshot import snapshot, session_key, is_active
+from .reminder_timeline import timeline
+
+log = logging.getLogger(__name__)
+
+GROUP_CAPACITY = int(os.getenv("GROUP_CAPACITY", "6"))
+CAPACITY = {"single": 1, "duo": 2, "trio": 3, "group": GROUP_CAPACITY}
+
+
+def capacity_for(slot_type: str) -> int:
+    """Reformer places for a session type (unknown types count as group)."""
+    return CAPACITY.get((slot_type or "").strip().lower(), GROUP_CAPACITY)
+
+
+class _Slot:
+    __slots__ = ("clients", "types")
+
+    def __init__(self):
+        self.clients: Set[str] = set()
+        self.types: Counter = Counter()
+
+    def capacity(self, extra_type: str = "") -> int:
+        types = [t for t, n in self.types.items() if n > 0]
+        if extra_type:
+            types.append(extra_type)
+        return min((capacity_for(t) for t in types), default=GROUP_CAPACITY)
+
+
+class SlotIndex:
+    """Occupancy per (date, time) for one worker."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._slots: Dict[Tuple[str, str], _Slot] = {}
+        self._generation = -1
+        self.stats = {"rebuilds": 0, "checks": 0, "rejected": 0}
+
+    # ── Maintenance ──────────────────────────────────────────
+    def _add(self, row: dict):
+        d, t, who = session_key(row)
+        slot = self._slots.setdefault((d, t), _Slot())
+        if who not in slot.clients:
+            slot.clients.add(who)
+            slot.types[(row.get("session_type") or "").strip().lower()] += 1
+
+    def _remove(self, row: dict):
+        d, t, who = session_key(row)
+        slot = self._slots.get((d, t))
+        if not slot or who not in slot.clients:
+            return
+        slot.clients.discard(who)
+        slot.types[(row.get("session_type") or "").strip().lower()] -= 1
+        if not slot.clients:
+            del self._slots[(d, t)]
+
+    def _sync(self):
+        """Rebuild from the snapshot if it has refreshed since the last build."""
+        snapshot.ensure_loaded()
+        generation = snapshot.stats["refreshes"]
+        if generation == self._generation:
+            return
+        rows = snapshot.sessions()
+        self._slots = {}
+        for r in rows:
+            if is_active(r):
+                self._add(r)
+        self._generation = generation
+        self.stats["rebuilds"] += 1
+        log.info(f"[slots] index rebuilt: {len(self._slots)} occupied slots from {len(rows)} sessions")
+
+    # ── Checks ───────────────────────────────────────────────
+    def _check_locked(self, row: dict, batch: Optional[Dict[Tuple[str, str], _Slot]] = None) -> dict:
+        d, t, who = session_key(row)
+        slot_type = (row.get("session_type") or "").strip().lower()
+        slot = self._slots.get((d, t))
+        extra = (batch or {}).get((d, t))
+        clients = (slot.clients if slot else set()) | (extra.clients if extra else set())
+        types = (slot.types if slot else Counter()) + (extra.types if extra else Counter())
+        merged = _Slot()
+        merged.types = types
+        cap = merged.capacity(slot_type)
+        booked = len(clients)
+
+        res = {"ok": True, "reason": "", "booked": booked, "capacity": cap}
+        if who in clients:
+            res.update(ok=False, reason="double_booked")
+        elif booked >= cap:
+            res.update(ok=False, reason="full")
+        return res
+
+    def check(self, session_date: str, start_time: str, slot_type: str,
+              client_name: str = "", wa_number: str = "") -> dict:
+        """
+        {"ok", "reason", "booked", "capacity"} for adding one client to a slot.
+        reason is "double_booked" or "full" when ok is False.
+        """
+        row = {"session_date": str(session_date), "start_time": start_time, "session_type": slot_type,
+               "client_name": client_name, "wa_number": wa_number}
+        with self._lock:
+            self._sync()
+            res = self._check_locked(row)
+            self.stats["checks"] += 1
+            self.stats["rejected"] += not res["ok"]
+        return res
+
+    def split(self, rows: List[dict]) -> Tuple[List[dict], List[dict]]:
+        """
+        One pass over candidate rows → (ok_rows, rejected). Earlier rows in
+        the batch count towards later ones; rejected rows are copies with a
+        "conflict" reason added.
+        """
+        ok_rows, rejected = [], []
+        batch: Dict[Tuple[str, str], _Slot] = {}
+        with self._lock:
+            self._sync()
+            for r in rows:
+                res = self._check_locked(r, batch)
+                self.stats["checks"] += 1
+                if not res["ok"]:
+                    self.stats["rejected"] += 1
+                    rejected.append({**r, "conflict": res["reason"]})
+                    continue
+                d, t, who = session_key(r)
+                extra = batch.setdefault((d, t), _Slot())
+                extra.clients.add(who)
+                extra.types[(r.get("session_type") or "").strip().lower()] += 1
+                ok_rows.append(r)
+        return ok_rows, rejected
+
+    # ── Local writes ─────────────────────────────────────────
+    def book(self, rows: List[dict]):
+        """Record bookings in the snapshot and the index."""
+        with self._lock:
+            self._sync()
+            snapshot.add_local(rows)
+            for r in rows:
+                self._add(r)
+        timeline.add(rows)
+
+    def release(self, rows: List[dict]):
+        """Undo book() for rows whose sheet write failed (index, snapshot and timeline)."""
+        with self._lock:
+            for r in rows:
+                if snapshot.drop_local(r):
+                    self._remove(r)
+        for r in rows:
+            timeline.remove(r)
+
+    def cancel(self, session_date: str, start_time: str, wa_number: str = "", client_name: str = "") -> Optional[dict]:
+        """Mark a booking cancelled and free its place; returns the row if one matched."""
+        with self._lock:
+            self._sync()
+            row = snapshot.cancel_local(session_date, start_time, wa_number, client_name)
+            if row is not None:
+                self._remove(row)
+        if row is not None:
+            timeline.remove(row)
+        return row
+
+    def cancel_next(self, wa_number: str = "", client_name: str = "", today: Optional[date] = None) -> Optional[dict]:
+        """Free the client's next upcoming booking (mirrors the GAS cancel_next action)."""
+        today_s = (today or date.today()).isoformat()
+        probe = session_key({"wa_number": wa_number, "client_name": client_name})[2]
+        upcoming = sorted(
+            (s for s in snapshot.sessions()
+             if is_active(s) and session_key(s)[2] == probe and str(s.get("session_date") or "") >= today_s),
+            key=lambda s: session_key(s)[:2],
+        )
+        if not upcoming:
+            return None
+        nxt = upcoming[0]
+        return self.cancel(nxt.get("session_date"), nxt.get("start_time"), wa_number, client_name)
+
+    # ── Reads ────────────────────────────────────────────────
+    def occupancy(self, session_date: str, start_time: str) -> dict:
+        with self._lock:
+            self._sync()
+            slot = self._slots.get((str(session_date), str(start_time or "")[:5]))
+            if not slot:
+                return {"booked": 0, "capacity": GROUP_CAPACITY}
+            return {"booked": len(slot.clients), "capacity": slot.capacity()}
+
+    def summary(self) -> dict:
+        return {"occupied_slots": len(self._slots), **self.stats}
+
+
+# ─────────────────────────────────────────────────────────────
+# Shared per-worker instance
+# ─────────────────────────────────────────────────────────────
+slots = SlotIndex()
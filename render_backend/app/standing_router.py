@@ -18,6 +18,8 @@ import requests
 import os
 import logging
 import re
+from .config import gas_url
+from .tracing import span
 
 log = logging.getLogger(__name__)
 bp = Blueprint("standing_router", __name__)
@@ -25,7 +27,7 @@ bp = Blueprint("standing_router", __name__)
 # ───────────────────────────────────────────────
 # Environment variables
 # ───────────────────────────────────────────────
-GAS_STANDING_URL = os.getenv(
+GAS_STANDING_URL = gas_url(
     "GAS_STANDING_URL",
     "https://script.google.com/macros/s/AKfycbzhZgscmpyCTN3xOJJvP3Ey-nVxmQvQo8ZHZEAptARX1ickJbieHfrFyhy_B9pMF_m73A/exec"
 )
@@ -85,7 +87,8 @@ def standing_command():
             payload["special_code"] = special_code
 
         log.info(f"[standing→GAS] POST {GAS_STANDING_URL} payload={payload}")
-        res = requests.post(GAS_STANDING_URL, json=payload, timeout=20)
+        with span("gas", payload.get("action") or "standing"):
+            res = requests.post(GAS_STANDING_URL, json=payload, timeout=20)
 
         # Parse response safely
         try:
@@ -0,0 +1,162 @@
+"""
+startup.py
+────────────────────────────────────────────
+Cold-start accounting for /diag/startup (router_diag).
+
+ • create_app wraps each blueprint registration in step(name): wall
+   time plus the modules that step pulled in, grouped by top-level
+   package (so a heavy dependency shows up against the router that
+   imported it)
+ • STARTUP_IMPORT_TRACE=1 additionally times every module imported
+   while the app is built, with the self / cumulative split of
+   `python -X importtime`; off by default (it wraps __import__)
+ • Also recorded: process start → app ready, and how long the first
+   request took once the app was up (the user-visible cold start after
+   a Render spin-down)
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import builtins
+import importlib.util
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+IMPORT_TRACE = os.getenv("STARTUP_IMPORT_TRACE", "0") == "1"
+
+
+def _process_started() -> Optional[float]:
+    """Process start (epoch seconds) from /proc on Linux; None elsewhere."""
+    try:
+        with open("/proc/self/stat") as f:
+            ticks = float(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            btime = next(float(line.split()[1]) for line in f if line.startswith("btime"))
+        return btime + ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+
+
+PROCESS_STARTED = _process_started()
+IMPORTED_AT = time.time()  # first import of the app package
+
+_steps: List[dict] = []
+_imports: Dict[str, list] = {}  # module → [cumulative_ms, self_ms]
+_state = {"ready_at": None, "first_request": None}
+_lock = threading.Lock()
+
+
+@contextmanager
+def step(name: str):
+    before = set(sys.modules)
+    t0 = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        new = set(sys.modules) - before
+        pkgs = Counter(m.split(".")[0] for m in new)
+        _steps.append({
+            "step": name,
+            "ms": round((time.perf_counter() - t0) * 1000, 1),
+            "modules": len(new),
+            "packages": [p for p, _ in pkgs.most_common(8)],
+            **({"error": error} if error else {}),
+        })
+
+
+# ─────────────────────────────────────────────
+# Optional per-module import timing (STARTUP_IMPORT_TRACE=1)
+# ─────────────────────────────────────────────
+_real_import = builtins.__import__
+_stack: List[list] = []  # [module, started, child_ms]
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    try:
+        full = importlib.util.resolve_name("." * level + name, (globals or {}).get("__package__")) if level else name
+    except (ImportError, ValueError):
+        full = name
+    if full in sys.modules or threading.current_thread() is not threading.main_thread():
+        return _real_import(name, globals, locals, fromlist, level)
+    frame = [full, time.perf_counter(), 0.0]
+    _stack.append(frame)
+    try:
+        return _real_import(name, globals, locals, fromlist, level)
+    finally:
+        _stack.pop()
+        total = (time.perf_counter() - frame[1]) * 1000
+        _imports[full] = [round(total, 2), round(total - frame[2], 2)]
+        if _stack:
+            _stack[-1][2] += total
+
+
+def begin():
+    """Called first thing by the app package; installs the import timer if enabled."""
+    if IMPORT_TRACE and builtins.__import__ is _real_import:
+        builtins.__import__ = _timed_import
+
+
+def mark_ready():
+    if builtins.__import__ is _timed_import:
+        builtins.__import__ = _real_import
+    if _state["ready_at"] is None:
+        _state["ready_at"] = time.time()
+
+
+def mark_request(ms: float, path: str):
+    if _state["first_request"] is None:
+        with _lock:
+            if _state["first_request"] is None:
+                _state["first_request"] = {
+                    "path": path,
+                    "ms": round(ms, 1),
+                    "after_ready_s": round(time.time() - (_state["ready_at"] or IMPORTED_AT), 2),
+                }
+
+
+def report(top: int = 25) -> dict:
+    ready = _state["ready_at"]
+    heavy = ("reportlab", "openpyxl", "openai", "httpx", "PIL")
+    out = {
+        "pid": os.getpid(),
+        "process_to_import_s": round(IMPORTED_AT - PROCESS_STARTED, 3) if PROCESS_STARTED else None,
+        "import_to_ready_s": round(ready - IMPORTED_AT, 3) if ready else None,
+        "process_to_ready_s": round(ready - PROCESS_STARTED, 3) if ready and PROCESS_STARTED else None,
+        "first_request": _state["first_request"],
+        "modules_loaded": len(sys.modules),
+        "heavy_loaded": [m for m in heavy if m in sys.modules],
+        "steps": list(_steps),
+        "import_trace": IMPORT_TRACE,
+    }
+    if _imports:
+        ranked = sorted(_imports.items(), key=lambda kv: kv[1][0], reverse=True)[:top]
+        out["imports"] = [{"module": m, "cumulative_ms": c, "self_ms": s} for m, (c, s) in ranked]
+    return out
+
+
+def init_app(app):
+    """First-request timing hook; call last in create_app (marks the app ready)."""
+    from flask import g, request
+
+    @app.before_request
+    def _startup_first_begin():
+        if _state["first_request"] is None:
+            g._startup_t0 = time.perf_counter()
+
+    @app.after_request
+    def _startup_first_end(response):
+        t0 = g.pop("_startup_t0", None)
+        if t0 is not None:
+            mark_request((time.perf_counter() - t0) * 1000, request.path)
+        return response
+
+    mark_ready()
@@ -12,12 +12,13 @@ to fetch current session capacities and attendance counts.
 
 import os, logging, requests
 from flask import Blueprint, request, jsonify
+from .config import gas_url
 
 bp = Blueprint("groups_bp", __name__, url_prefix="/tasks")
 log = logging.getLogger(__name__)
 
 # ── Environment ─────────────────────────────────────────────
-GAS_GROUPS_URL = os.getenv("GAS_GROUPS_URL", "")
+GAS_GROUPS_URL = gas_url("GAS_GROUPS_URL")
 ADMIN_WA = os.getenv("ADMIN_NUMBER", "")
 TZ = os.getenv("TZ_NAME", "Africa/Johannesburg")
 
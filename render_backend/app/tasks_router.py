@@ -13,16 +13,24 @@ New in Phase 30:
  • GAS log append helper (_append_log_event)
 
 Notes:
- • All scheduling remains in Google Apps Script; Flask only executes on POST.
+ • Scheduling lives in Google Apps Script unless INPROCESS_SCHEDULER=1,
+   in which case app.scheduler runs the same jobs in-process
+   (GET /tasks/scheduler shows leader + per-job metrics).
+ • The GET status routes (/scheduler, /message-stats, /outbound-journal)
+   need DIAG_TOKEN, like /diag.
 ──────────────────────────────────────────────────────────────────
 """
 
 import os
 import logging
 import requests
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
 from .utils import send_safe_message, safe_execute, send_whatsapp_template
+from .delivery_ledger import ledger, send_once
+from . import async_clients
+from .profiling import profiled
+from .config import gas_url, diag_token_ok
 
 # ─────────────────────────────────────────────
 # Setup
@@ -33,7 +41,7 @@ tasks_bp = Blueprint("tasks_bp", __name__)
 # Environment
 NADINE_WA = os.getenv("NADINE_WA", "")
 TEMPLATE_LANG = os.getenv("TEMPLATE_LANG", "en_US")
-GAS_WEBHOOK_URL = os.getenv("GAS_WEBHOOK_URL", "")
+GAS_WEBHOOK_URL = gas_url("GAS_WEBHOOK_URL")
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "35"))
 
 # Templates
@@ -71,6 +79,72 @@ def _append_log_event(message: str, context: str):
     except Exception as e:
         log.debug(f"[log-append] skipped ({e})")
 
+# ─────────────────────────────────────────────
+# Client reminder senders (shared by GAS routes and app.scheduler)
+# Every send is claimed in the delivery ledger first, so GAS retries and
+# overlapping triggers do not resend the same reminder; the claimed
+# sends then go out concurrently on the async client layer.
+# ─────────────────────────────────────────────
+def _session_ident(s: dict, default_date: str = "") -> str:
+    """Session identity for the delivery ledger (date|time)."""
+    return f"{s.get('session_date') or default_date}|{s.get('session_time') or ''}"
+
+def _send_reminders(label: str, template: str, items: list, failed: list = None) -> int:
+    """items: (wa, ident, variables). Returns how many were sent; indexes of
+    items that failed to send are appended to `failed` when given."""
+    claimed = []
+    for i, (wa, ident, variables) in enumerate(items):
+        if ledger.claim(wa, template, ident):
+            claimed.append((i, wa, ident, variables))
+        else:
+            log.info(f"[ledger] duplicate suppressed → {wa} {template} {ident}")
+    results = async_clients.send_templates([(wa, template, TEMPLATE_LANG, v) for _, wa, _, v in claimed])
+    sent = 0
+    for (i, wa, ident, _), res in zip(claimed, results):
+        if res and res.get("ok"):
+            sent += 1
+        else:
+            ledger.release(wa, template, ident)
+            if failed is not None:
+                failed.append(i)
+            log.warning(f"[{label}] send failed → {wa}: {(res or {}).get('error')}")
+    return sent
+
+def send_night_before_reminders(sessions: list) -> int:
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+    items = []
+    for s in sessions:
+        wa = (s.get("wa_number") or "").strip()
+        if wa:
+            items.append((wa, _session_ident(s, tomorrow), [s.get("session_time") or "08:00"]))
+    return _send_reminders("night_before", TPL_CLIENT_TOMORROW, items)
+
+def send_week_ahead_reminders(sessions: list) -> int:
+    now = datetime.now()
+    week_of = (now + timedelta(days=7 - now.weekday())).strftime("%Y-%m-%d")  # the coming Monday
+    items = []
+    for s in sessions:
+        wa = (s.get("wa_number") or "").strip()
+        if not wa:
+            continue
+        summary = f"{s.get('session_date') or ''} – {s.get('session_time') or ''} ({s.get('session_type') or 'single'})"
+        items.append((wa, _session_ident(s, week_of), [s.get("client_name") or "there", summary]))
+    return _send_reminders("week_ahead", TPL_CLIENT_WEEKLY, items)
+
+def send_next_hour_reminders(sessions: list, failed: list = None) -> int:
+    """Sessions that could not be delivered are appended to `failed` when given."""
+    today = datetime.now().strftime("%Y-%m-%d")
+    items, rows, failed_idx = [], [], []
+    for s in sessions:
+        wa = (s.get("wa_number") or "").strip()
+        if wa:
+            items.append((wa, _session_ident(s, today), [s.get("session_time") or "soon"]))
+            rows.append(s)
+    sent = _send_reminders("next_hour", TPL_CLIENT_NEXT_HOUR, items, failed_idx)
+    if failed is not None:
+        failed.extend(rows[i] for i in failed_idx)
+    return sent
+
 # ─────────────────────────────────────────────
 # ROUTE: Admin morning/evening/week-ahead summaries (legacy consolidated)
 # ─────────────────────────────────────────────
@@ -148,6 +222,7 @@ def reminder_evening():
 # ROUTE: Unified client reminder handler
 # ─────────────────────────────────────────────
 @tasks_bp.route("/client-reminders", methods=["POST"])
+@profiled
 def handle_client_reminders():
     """
     Handles all client engagement templates triggered by GAS:
@@ -167,59 +242,19 @@ def handle_client_reminders():
 
     # Night-before (20h00)
     if job_type == "client-night-before":
-        for s in sessions:
-            wa = (s.get("wa_number") or "").strip()
-            if not wa:
-                continue
-            ok = safe_execute(
-                "night_before",
-                send_whatsapp_template,
-                wa,
-                TPL_CLIENT_TOMORROW,
-                TEMPLATE_LANG,
-                [s.get("session_time") or "08:00"],
-            )
-            if ok:
-                sent_clients += 1
+        sent_clients = send_night_before_reminders(sessions)
         _send_admin_message(f"🌙 Sent night-before reminders ({sent_clients}).")
         _append_log_event(f"sent={sent_clients}", "client-reminders/night-before")
 
     # Week-ahead (Sunday 20h00)
     elif job_type == "client-week-ahead":
-        for s in sessions:
-            wa = (s.get("wa_number") or "").strip()
-            if not wa:
-                continue
-            summary = f"{s.get('session_date') or ''} – {s.get('session_time') or ''} ({s.get('session_type') or 'single'})"
-            ok = safe_execute(
-                "week_ahead",
-                send_whatsapp_template,
-                wa,
-                TPL_CLIENT_WEEKLY,
-                TEMPLATE_LANG,
-                [s.get("client_name") or "there", summary],
-            )
-            if ok:
-                sent_clients += 1
+        sent_clients = send_week_ahead_reminders(sessions)
         _send_admin_message(f"📅 Sent week-ahead reminders ({sent_clients}).")
         _append_log_event(f"sent={sent_clients}", "client-reminders/week-ahead")
 
     # Next-hour reminders (hourly)
     elif job_type == "client-next-hour":
-        for s in sessions:
-            wa = (s.get("wa_number") or "").strip()
-            if not wa:
-                continue
-            ok = safe_execute(
-                "next_hour",
-                send_whatsapp_template,
-                wa,
-                TPL_CLIENT_NEXT_HOUR,
-                TEMPLATE_LANG,
-                [s.get("session_time") or "soon"],
-            )
-            if ok:
-                sent_clients += 1
+        sent_clients = send_next_hour_reminders(sessions)
         _send_admin_message(f"⏰ Sent next-hour reminders ({sent_clients}).")
         _append_log_event(f"sent={sent_clients}", "client-reminders/next-hour")
 
@@ -248,6 +283,77 @@ def test_client_reminders():
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     return jsonify({"ok": True, "timestamp": now})
 
+# ─────────────────────────────────────────────
+# Status routes: DIAG_TOKEN-protected, as /diag
+# ─────────────────────────────────────────────
+def _authorised() -> bool:
+    """X-Diag-Token header (or ?token=) must match DIAG_TOKEN; closed when unset."""
+    return diag_token_ok(request.headers.get("X-Diag-Token") or request.args.get("token") or "")
+
+# ─────────────────────────────────────────────
+# ROUTE: In-process scheduler status
+# ─────────────────────────────────────────────
+@tasks_bp.route("/scheduler", methods=["GET"])
+def scheduler_status():
+    """Leader / per-job runtime metrics of app.scheduler (this worker's view)."""
+    if not _authorised():
+        return jsonify({"ok": False, "error": "forbidden"}), 403
+    from .scheduler import scheduler
+    from .delivery_ledger import ledger
+    return jsonify({"ok": True, **scheduler.summary(), "delivery_ledger": ledger.summary()})
+
+# ─────────────────────────────────────────────
+# ROUTE: Per-template delivery stats (from webhook statuses)
+# ─────────────────────────────────────────────
+@tasks_bp.route("/message-stats", methods=["GET"])
+def message_stats():
+    """Delivery latency / failure rate per template. ?hours=24"""
+    if not _authorised():
+        return jsonify({"ok": False, "error": "forbidden"}), 403
+    from .message_status import store
+    try:
+        hours = float(request.args.get("hours", 24))
+    except ValueError:
+        return jsonify({"ok": False, "error": "hours must be a number"}), 400
+    return jsonify({"ok": True, "hours": hours, "templates": store.template_stats(hours * 3600),
+                    "writer": store.summary()})
+
+# ─────────────────────────────────────────────
+# ROUTE: Outbound journal query
+# ─────────────────────────────────────────────
+def _epoch_arg(name: str):
+    """Query arg as epoch seconds; accepts epoch numbers or ISO datetimes."""
+    raw = (request.args.get(name) or "").strip()
+    if not raw:
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        return datetime.fromisoformat(raw).timestamp()
+
+@tasks_bp.route("/outbound-journal", methods=["GET"])
+def outbound_journal():
+    """Send attempts, newest first. ?recipient=27...&from=<iso|epoch>&to=<iso|epoch>&limit=200"""
+    if not _authorised():
+        return jsonify({"ok": False, "error": "forbidden"}), 403
+    from .message_status import store
+    from .utils import normalize_wa
+    try:
+        start, end = _epoch_arg("from"), _epoch_arg("to")
+    except ValueError as e:
+        return jsonify({"ok": False, "error": f"bad time: {e}"}), 400
+    try:
+        limit = min(int(request.args.get("limit", 200)), 5000)
+    except ValueError:
+        return jsonify({"ok": False, "error": "limit must be an integer"}), 400
+    rows = store.journal(
+        recipient=normalize_wa(request.args.get("recipient") or ""),
+        start=start,
+        end=end,
+        limit=limit,
+    )
+    return jsonify({"ok": True, "count": len(rows), "rows": rows})
+
 # ─────────────────────────────────────────────
 # ROUTE: Admin package / credits events
 # ─────────────────────────────────────────────
@@ -304,6 +410,7 @@ def birthdays():
     return jsonify({"ok": True, "message": msg})
 
 @tasks_bp.route("/birthday-greetings", methods=["POST"])
+@profiled
 def birthday_greetings():
     """Sends personalised birthday greetings to clients."""
     data = request.get_json(force=True) or {}
@@ -314,19 +421,27 @@ def birthday_greetings():
         return jsonify({"ok": True, "message": "No client birthdays today"})
 
     sent = 0
+    today = datetime.now().strftime("%Y-%m-%d")
     for b in birthdays:
         name = (b.get("name") or "there").strip()
         wa = (b.get("wa_number") or "").strip()
         if not wa:
             continue
 
-        send_safe_message(
+        res = send_once(
+            wa, "client_birthday_greeting", today,
+            send_safe_message,
             to=wa,
             is_template=True,
             template_name="client_generic_alert_us",
             variables=[f"🎉 Happy Birthday {name}! Wishing you strength and balance for the year ahead."],
             label="client_birthday_greeting",
         )
+        if res is None:
+            continue  # already greeted today
+        if not res or (isinstance(res, dict) and res.get("ok") is False):
+            log.warning(f"🎂 Birthday greeting to {name} ({wa}) failed: {res}")
+            continue
         sent += 1
         log.info(f"🎂 Sent birthday greeting to {name} ({wa})")
 
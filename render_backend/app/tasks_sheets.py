@@ -14,14 +14,14 @@ Notes:
 """
 
 import logging
-import os
 import requests
 from flask import Blueprint, request, jsonify
+from .config import gas_url
 
 bp = Blueprint("tasks_sheets", __name__)
 log = logging.getLogger(__name__)
 
-WEB_APP_URL = os.getenv("WEB_APP_URL")
+WEB_APP_URL = gas_url("WEB_APP_URL")
 
 @bp.route("/tasks/sheets", methods=["POST"])
 def handle_sheets():
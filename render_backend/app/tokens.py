@@ -3,37 +3,180 @@ tokens.py – Secure, Expiring Link Utility
 ────────────────────────────────────────────
 Generates and verifies short-lived signed tokens
 for secure invoice links.
+
+ • One module-level serializer (keys rotate via SECRET_KEY_FALLBACKS)
+ • Short-TTL LRU of recently verified tokens (skips repeat HMAC checks)
+ • Revocation: every link carries its invoice's issue sequence number;
+   re-issuing an invoice bumps the sequence and invalidates its older
+   links. Sequences live in SQLite (INVOICE_TOKENS_DB), shared by all
+   gunicorn workers and kept across restarts, and are cached per worker
+   until another worker writes (PRAGMA data_version)
 ────────────────────────────────────────────
 """
 
-import os, time
+import os, time, threading, logging, sqlite3
+from collections import OrderedDict
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 
-# ── Secret key from env ─────────────────────────────────────────────
+log = logging.getLogger(__name__)
+
+# ── Secret keys from env ────────────────────────────────────────────
+# SECRET_KEY signs new tokens; SECRET_KEY_FALLBACKS (comma-separated,
+# oldest first) are still accepted when verifying, so keys can be rotated
+# without breaking links that are already out in WhatsApp/email.
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-change-me")
+SECRET_KEY_FALLBACKS = [k.strip() for k in os.getenv("SECRET_KEY_FALLBACKS", "").split(",") if k.strip()]
 SALT = "pilateshq-invoice"
 
+DEFAULT_MAX_AGE = 172800  # 48 hours
+VERIFY_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "300"))    # seconds
+VERIFY_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "512"))  # entries
+TOKENS_DB = os.getenv("INVOICE_TOKENS_DB", "/tmp/pilateshq-tokens.sqlite3")
+COMPACT_EVERY = 600  # seconds between compaction passes
+
 # ── Serializer setup ────────────────────────────────────────────────
+# itsdangerous signs with the last key and verifies against all of them.
+_SERIALIZER = URLSafeTimedSerializer(SECRET_KEY_FALLBACKS + [SECRET_KEY], salt=SALT)
+
 def _serializer():
-    return URLSafeTimedSerializer(SECRET_KEY, salt=SALT)
+    return _SERIALIZER
+
+# ── Verified-token LRU (per worker) ─────────────────────────────────
+_lock = threading.Lock()
+_verified: "OrderedDict[str, tuple[dict, float]]" = OrderedDict()  # token → (data, cached_until)
+
+# ── Revocation state (SQLite, shared by all workers) ───────────────
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoice_seq (
+    invoice TEXT PRIMARY KEY,
+    seq     INTEGER NOT NULL,   -- links with a lower seq are revoked
+    updated REAL NOT NULL
+) WITHOUT ROWID;
+"""
+_db_lock = threading.Lock()
+_db_state = {"conn": None, "compacted_at": 0.0, "version": None}
+_seq_cache: dict[str, int] = {}  # invoice → current seq, valid while data_version is unchanged
+
+
+def _db() -> sqlite3.Connection:
+    if _db_state["conn"] is None:
+        conn = sqlite3.connect(TOKENS_DB, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _db_state["conn"] = conn
+    return _db_state["conn"]
+
+
+def _bump_seq(invoice_id: str) -> int:
+    """Atomically advance an invoice's sequence (across workers); returns the new value."""
+    now = time.time()
+    with _db_lock:
+        db = _db()
+        seq = db.execute(
+            "INSERT INTO invoice_seq VALUES (?, 1, ?) "
+            "ON CONFLICT (invoice) DO UPDATE SET seq = seq + 1, updated = excluded.updated RETURNING seq",
+            (invoice_id, now),
+        ).fetchall()[0][0]  # fetchall: the statement must finish before the write commits
+        _seq_cache[invoice_id] = seq  # our own writes do not move our data_version
+        if now - _db_state["compacted_at"] > COMPACT_EVERY:
+            _compact(db, now)
+    return seq
+
+
+def _compact(db: sqlite3.Connection, now: float):
+    # Every link of an invoice last issued more than DEFAULT_MAX_AGE ago has expired already
+    db.execute("DELETE FROM invoice_seq WHERE updated < ?", (now - DEFAULT_MAX_AGE,))
+    _db_state["compacted_at"] = now
+
+
+def _current_seq(invoice_id: str) -> int:
+    """Latest issued seq for an invoice (0 if none); one cheap PRAGMA when nothing changed."""
+    with _db_lock:
+        db = _db()
+        version = db.execute("PRAGMA data_version").fetchone()[0]
+        if version != _db_state["version"]:
+            # Another worker issued a link since we last looked
+            _seq_cache.clear()
+            _db_state["version"] = version
+        seq = _seq_cache.get(invoice_id)
+        if seq is None:
+            row = db.execute("SELECT seq FROM invoice_seq WHERE invoice = ?", (invoice_id,)).fetchone()
+            seq = row[0] if row else 0
+            if len(_seq_cache) >= VERIFY_CACHE_SIZE:
+                _seq_cache.clear()
+            _seq_cache[invoice_id] = seq
+    return seq
+
+
+def _cache_get(token: str, now: float) -> dict | None:
+    with _lock:
+        hit = _verified.get(token)
+        if not hit:
+            return None
+        data, cached_until = hit
+        if now >= cached_until:
+            del _verified[token]
+            return None
+        _verified.move_to_end(token)
+        return data
+
+
+def _cache_put(token: str, data: dict, now: float):
+    with _lock:
+        _verified[token] = (data, now + VERIFY_CACHE_TTL)
+        _verified.move_to_end(token)
+        while len(_verified) > VERIFY_CACHE_SIZE:
+            _verified.popitem(last=False)
+
+
+def _is_revoked(data: dict) -> bool:
+    try:
+        current = _current_seq(data.get("invoice"))
+    except sqlite3.Error as e:
+        # The signature and expiry still hold; a store outage should not break every open link
+        log.warning(f"[tokens] revocation check failed: {e}")
+        return False
+    # Links issued before sequences existed carry no seq and count as 0
+    return int(data.get("seq") or 0) < current
 
 # ── Generate secure token ───────────────────────────────────────────
 def generate_invoice_token(client_name: str, invoice_id: str) -> str:
-    """Return signed token encoding client + invoice id."""
-    data = {"client": client_name, "invoice": invoice_id, "ts": int(time.time())}
+    """
+    Return signed token encoding client + invoice id.
+    Issuing a new token for an invoice revokes its previously issued links.
+    """
+    try:
+        seq = _bump_seq(invoice_id)
+    except sqlite3.Error as e:
+        log.warning(f"[tokens] could not record issue of {invoice_id}: {e}")
+        seq = 0
+    data = {"client": client_name, "invoice": invoice_id, "ts": int(time.time()), "seq": seq}
     return _serializer().dumps(data)
 
 # ── Verify token ───────────────────────────────────────────────────
-def verify_invoice_token(token: str, max_age: int = 172800) -> dict:
+def verify_invoice_token(token: str, max_age: int = DEFAULT_MAX_AGE) -> dict:
     """
     Returns decoded data if valid and not expired.
     Default expiry = 48 hours (172 800 sec).
+    Recently verified tokens are served from a short-TTL LRU.
     """
-    try:
-        return _serializer().loads(token, max_age=max_age)
-    except SignatureExpired:
-        return {"ok": False, "error": "Expired link"}
-    except BadSignature:
-        return {"ok": False, "error": "Invalid link"}
-    except Exception as e:
-        return {"ok": False, "error": str(e)}
+    now = time.time()
+    data = _cache_get(token, now)
+    if data is not None:
+        if now - int(data.get("ts") or 0) > max_age:
+            return {"ok": False, "error": "Expired link"}
+    else:
+        try:
+            data = _serializer().loads(token, max_age=max_age)
+        except SignatureExpired:
+            return {"ok": False, "error": "Expired link"}
+        except BadSignature:
+            return {"ok": False, "error": "Invalid link"}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+        _cache_put(token, data, now)
+
+    if _is_revoked(data):
+        return {"ok": False, "error": "Revoked link"}
+    return data
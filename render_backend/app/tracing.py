@@ -0,0 +1,184 @@
+"""
+tracing.py
+────────────────────────────────────────────
+Lightweight per-request span tracing, so "the bot was slow" can be
+pinned on GAS, the Graph send or a self-POST rather than guessed.
+
+ • Every Flask request gets an ID (X-Request-ID in, or a new one),
+   held in a contextvar and echoed back on the response
+ • span(kind, name) times one outbound call – kinds are "graph",
+   "gas" and "self" (our own endpoints over HTTP); the timing also
+   feeds metrics.outbound_seconds, inside a request or not
+ • At the end of a slow request (every request with TRACE_LOG=all) one
+   structured line is logged:
+   [trace] {"rid": ..., "path": ..., "total_ms": ...,
+            "breakdown": {"gas": ..., "graph": ..., "app": ...},
+            "spans": [[kind, name, ms, ok], ...]}
+ • Requests slower than TRACE_SLOW_MS go into a ring buffer served at
+   /diag/slow-requests (router_diag)
+ • Self-POSTs send outbound_headers() so the downstream request logs
+   under the same ID; the async_clients loop inherits the contextvars
+   of whoever submitted the coroutine
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "750"))
+RING_SIZE = int(os.getenv("TRACE_RING_SIZE", "200"))
+TRACE_LOG = os.getenv("TRACE_LOG", "slow").lower()  # all | slow | off
+HEADER = "X-Request-ID"
+
+
+class _Trace:
+    __slots__ = ("rid", "method", "path", "started", "wall", "spans")
+
+    def __init__(self, rid: str, method: str, path: str):
+        self.rid = rid
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.wall = time.time()
+        self.spans: List[tuple] = []  # (kind, name, ms, ok) – appended from any thread
+
+
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+_current: ContextVar[Optional[_Trace]] = ContextVar("trace", default=None)
+
+_slow = deque(maxlen=RING_SIZE)
+_slow_lock = threading.Lock()
+stats = {"requests": 0, "slow": 0}
+
+
+def current_id() -> str:
+    return request_id.get()
+
+
+def outbound_headers(headers: Optional[dict] = None) -> dict:
+    """Headers for a self-POST, carrying the current request ID."""
+    out = dict(headers or {})
+    rid = request_id.get()
+    if rid != "-":
+        out[HEADER] = rid
+    return out
+
+
+@contextmanager
+def span(kind: str, name: str):
+    """Time one outbound call: always into metrics, into the trace when inside a request."""
+    tr = _current.get()
+    t0 = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        metrics.outbound_seconds.observe(elapsed, kind=kind, name=name)
+        if tr is not None:
+            tr.spans.append((kind, name, round(elapsed * 1000, 1), ok))
+
+
+# ─────────────────────────────────────────────
+# Request lifecycle
+# ─────────────────────────────────────────────
+def begin(method: str, path: str, rid: Optional[str] = None):
+    """Start a trace; returns tokens for end()."""
+    rid = (rid or "").strip()[:64] or uuid.uuid4().hex[:16]
+    tr = _Trace(rid, method, path)
+    return _current.set(tr), request_id.set(rid)
+
+
+def end(tokens, status: int = 0) -> Optional[dict]:
+    """Finish the current trace, log its breakdown and reset the contextvars."""
+    tr = _current.get()
+    t_token, r_token = tokens
+    _current.reset(t_token)
+    request_id.reset(r_token)
+    if tr is None:
+        return None
+
+    total = round((time.perf_counter() - tr.started) * 1000, 1)
+    spans = list(tr.spans)
+    breakdown = {}
+    for kind, _, ms, _ in spans:
+        breakdown[kind] = round(breakdown.get(kind, 0.0) + ms, 1)
+    # Concurrent spans (async fan-outs) can add up to more than the wall time
+    breakdown["app"] = round(max(total - sum(breakdown.values()), 0.0), 1)
+    record = {
+        "rid": tr.rid, "method": tr.method, "path": tr.path, "status": status,
+        "at": round(tr.wall, 3), "total_ms": total, "breakdown": breakdown,
+        "spans": [list(s) for s in spans],
+    }
+
+    slow = total >= SLOW_MS
+    stats["requests"] += 1
+    if slow:
+        stats["slow"] += 1
+        with _slow_lock:
+            _slow.append(record)
+    if TRACE_LOG == "all" or (TRACE_LOG == "slow" and slow):
+        log.info("[trace] %s", _Json(record))
+    return record
+
+
+class _Json:
+    """Serialised only when the log thread formats the record."""
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        return json.dumps(self.obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def slowest(limit: int = 20) -> list:
+    """Slowest requests still in the ring buffer, slowest first."""
+    with _slow_lock:
+        items = list(_slow)
+    return sorted(items, key=lambda r: r["total_ms"], reverse=True)[:limit]
+
+
+def summary() -> dict:
+    return {"slow_ms": SLOW_MS, "ring_size": RING_SIZE, "buffered": len(_slow), **stats}
+
+
+def init_app(app):
+    """Install the request hooks on a Flask app (both factories call this)."""
+    from flask import g, request
+
+    @app.before_request
+    def _trace_begin():
+        g._trace_tokens = begin(request.method, request.path, request.headers.get(HEADER))
+
+    @app.after_request
+    def _trace_header(response):
+        response.headers[HEADER] = request_id.get()
+        g._trace_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _trace_end(exc):
+        tokens = g.pop("_trace_tokens", None)
+        if tokens is not None:
+            try:
+                end(tokens, g.pop("_trace_status", 500 if exc else 0))
+            except ValueError:  # contextvar token from another context – nothing to report
+                pass
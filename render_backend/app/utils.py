@@ -8,27 +8,82 @@ Enhanced with trigger_client_menu() for the Client Self-Service Menu.
 import os
 import re
 import logging
+import threading
 import requests
 import json
 import time
 from datetime import datetime
+from .config import graph_base
+from .message_status import store as message_status
+from .session_window import tracker as session_window
+from .tracing import span
+from . import metrics
+from .logging_setup import SAMPLED
+from .wa_templates import build_payloads
 
 log = logging.getLogger(__name__)
 
 # ─────────────────────────────────────────────────────────────
 # Environment
 # ─────────────────────────────────────────────────────────────
-META_BASE_URL = "https://graph.facebook.com/v19.0"
+META_BASE_URL = graph_base("v19.0")
 META_PHONE_ID = os.getenv("META_PHONE_ID", "")
 META_ACCESS_TOKEN = os.getenv("META_ACCESS_TOKEN", "")
 DEFAULT_LANG = os.getenv("DEFAULT_LANG", "en_US")
+_MESSAGES_URL = f"{META_BASE_URL}/{META_PHONE_ID}/messages"
+_HEADERS = {
+    "Authorization": f"Bearer {META_ACCESS_TOKEN}",
+    "Content-Type": "application/json",
+}
+
+# ─────────────────────────────────────────────────────────────
+# Pooled HTTP session (Graph + GAS keep-alive)
+# ─────────────────────────────────────────────────────────────
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+_http = {"session": None, "pid": None}
+_http_lock = threading.Lock()
+
+def http() -> requests.Session:
+    """Keep-alive session shared by the helpers below; one per process (sockets never cross a fork)."""
+    if _http["pid"] != os.getpid():
+        with _http_lock:
+            if _http["pid"] != os.getpid():
+                s = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _http["session"], _http["pid"] = s, os.getpid()
+    return _http["session"]
+
+def warm_connections(urls, timeout: float = 5.0) -> dict:
+    """Open a pooled connection to each distinct origin (HEAD /, nothing runs server-side); origin → ms or error."""
+    out = {}
+    for url in urls:
+        origin = "/".join(str(url or "").split("/")[:3])
+        if not origin.startswith("http") or origin in out:
+            continue
+        started = time.perf_counter()
+        try:
+            http().head(origin + "/", timeout=timeout, allow_redirects=False)
+            out[origin] = round((time.perf_counter() - started) * 1000, 1)
+        except requests.RequestException as e:
+            out[origin] = type(e).__name__
+    return out
 
 # ─────────────────────────────────────────────────────────────
 # Sanitiser
 # ─────────────────────────────────────────────────────────────
+_CTRL_WS = re.compile(r"[\n\r\t]+")
+_MULTI_WS = re.compile(r"\s{2,}")
+_NEEDS_CLEAN = re.compile(r"[\n\r\t]|\s{2}")
+
+
 def clean_text(t: str) -> str:
     """Remove newlines, tabs, and long spaces for WhatsApp parameters."""
-    return re.sub(r"\s{2,}", " ", re.sub(r"[\n\r\t]+", " ", str(t or "").strip()))
+    s = str(t or "")
+    if not _NEEDS_CLEAN.search(s) and s == s.strip():
+        return s  # already clean (e.g. cleaned once by send_safe_message)
+    return _MULTI_WS.sub(" ", _CTRL_WS.sub(" ", s.strip()))
 
 # ─────────────────────────────────────────────────────────────
 # WhatsApp number normaliser
@@ -83,48 +138,82 @@ def safe_execute(label, func, *args, **kwargs):
         log.error(f"❌ {label} failed → {e}")
         return None
 
+def _wamid(result: dict) -> str:
+    """Message id from a Graph API send response ('' if absent)."""
+    try:
+        return result["messages"][0]["id"]
+    except (KeyError, IndexError, TypeError):
+        return ""
+
+def _journal(recipient: str, template: str, started: float, status_code, result: dict,
+             payload_bytes: int, error: str | None = None):
+    """Append a send attempt to the outbound journal (written asynchronously)."""
+    try:
+        graph_err = result.get("error") if isinstance(result, dict) else None
+        err = error or (str(graph_err.get("code")) if isinstance(graph_err, dict) and graph_err.get("code") else None)
+        elapsed = time.perf_counter() - started
+        metrics.graph_send_seconds.observe(elapsed, template=template)
+        code = err or (str(status_code) if status_code and status_code >= 400 else "ok")
+        metrics.graph_sends.inc(template=template, code=code)
+        message_status.record_send(
+            recipient=recipient,
+            template=template,
+            wamid=_wamid(result),
+            status_code=status_code,
+            error_code=err,
+            latency_ms=round(elapsed * 1000, 1),
+            payload_bytes=payload_bytes,
+        )
+    except Exception as e:
+        log.debug(f"[journal] skipped: {e}")
+
 # ─────────────────────────────────────────────────────────────
 # Send WhatsApp Template Message (Sanitised)
 # ─────────────────────────────────────────────────────────────
 def send_whatsapp_template(to: str, name: str, lang: str = DEFAULT_LANG, variables=None):
-    """Send a pre-approved WhatsApp template message (sanitised)."""
+    """
+    Send a pre-approved WhatsApp template message (sanitised).
+    Parameters are checked against the local template schema first;
+    over-long alerts may go out as several numbered messages.
+    """
     if not META_PHONE_ID or not META_ACCESS_TOKEN:
         log.warning("⚠️ Meta credentials missing, cannot send message.")
         return {"ok": False, "error": "missing credentials"}
 
-    url = f"{META_BASE_URL}/{META_PHONE_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {META_ACCESS_TOKEN}",
-        "Content-Type": "application/json",
-    }
-
     safe_vars = [clean_text(v) for v in (variables or [])]
-    data = {
-        "messaging_product": "whatsapp",
-        "to": normalize_wa(to),
-        "type": "template",
-        "template": {
-            "name": name,
-            "language": {"code": lang},
-            "components": [
-                {
-                    "type": "body",
-                    "parameters": [{"type": "text", "text": str(v)} for v in safe_vars],
-                }
-            ],
-        },
-    }
+    wa = normalize_wa(to)
+    started = time.perf_counter()
+    bodies, err = build_payloads(wa, name, lang, safe_vars)
+    if err:
+        # Known-bad request (template schema): reject locally, no Graph round-trip
+        log.error(f"❌ WhatsApp template rejected locally → {to} ({name}): {err}")
+        _journal(wa, name, started, None, {}, 0, error="invalid_params")
+        return {"ok": False, "error": err, "rejected": True}
+
+    # Variables carry client names / amounts: DEBUG only, formatted lazily on the log thread
+    log.debug("📤 Sending WhatsApp template → %s (%s) vars=%s in %d part(s)", to, name, safe_vars, len(bodies))
+    out = None
+    for body in bodies:
+        out = _post_template(wa, to, name, body, started)
+        if not out["ok"]:
+            break
+        started = time.perf_counter()
+    return out
 
-    log.info(f"📤 Sending WhatsApp template → {to} ({name}) vars={safe_vars}")
+
+def _post_template(wa: str, to: str, name: str, body: bytes, started: float) -> dict:
     try:
-        resp = requests.post(url, json=data, headers=headers, timeout=10)
+        with span("graph", name):
+            resp = http().post(_MESSAGES_URL, data=body, headers=_HEADERS, timeout=10)
         result = resp.json() if resp.text else {}
+        _journal(wa, name, started, resp.status_code, result, len(body))
         if resp.status_code >= 400:
             log.error(f"❌ WhatsApp API error {resp.status_code}: {resp.text}")
             return {"ok": False, "status_code": resp.status_code, "error": resp.text}
-        log.info(f"✅ WhatsApp message sent to {to} ({name})")
+        log.info("✅ WhatsApp message sent to %s (%s)", to, name, extra=SAMPLED)
         return {"ok": True, "status_code": resp.status_code, "response": result}
     except Exception as e:
+        _journal(wa, name, started, None, {}, len(body), error=type(e).__name__)
         log.error(f"❌ WhatsApp template send failed: {e}")
         return {"ok": False, "error": str(e)}
 
@@ -138,12 +227,6 @@ def send_whatsapp_text(to: str, text: str):
         return {"ok": False, "error": "missing credentials"}
 
     text = clean_text(text)
-    url = f"{META_BASE_URL}/{META_PHONE_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {META_ACCESS_TOKEN}",
-        "Content-Type": "application/json",
-    }
-
     data = {
         "messaging_product": "whatsapp",
         "recipient_type": "individual",
@@ -152,16 +235,21 @@ def send_whatsapp_text(to: str, text: str):
         "text": {"preview_url": False, "body": text},
     }
 
-    log.info(f"💬 Sending WhatsApp text → {to}: {text}")
+    log.debug("💬 Sending WhatsApp text → %s: %s", to, text)
+    started = time.perf_counter()
+    body = json.dumps(data).encode()
     try:
-        resp = requests.post(url, json=data, headers=headers, timeout=10)
+        with span("graph", "(text)"):
+            resp = http().post(_MESSAGES_URL, data=body, headers=_HEADERS, timeout=10)
         result = resp.json() if resp.text else {}
+        _journal(data["to"], "(text)", started, resp.status_code, result, len(body))
         if resp.status_code >= 400:
             log.error(f"❌ WhatsApp text error {resp.status_code}: {resp.text}")
             return {"ok": False, "status_code": resp.status_code, "error": resp.text}
-        log.info(f"✅ WhatsApp text sent to {to}")
+        log.info("✅ WhatsApp text sent to %s", to, extra=SAMPLED)
         return {"ok": True, "status_code": resp.status_code, "response": result}
     except Exception as e:
+        _journal(data["to"], "(text)", started, None, {}, len(body), error=type(e).__name__)
         log.error(f"❌ WhatsApp text send failed: {e}")
         return {"ok": False, "error": str(e)}
 
@@ -188,7 +276,8 @@ def post_with_retry(url: str, payload: dict, retries: int = 3, delay: float = 2.
     """POST to a webhook with automatic retries and backoff."""
     for attempt in range(1, retries + 1):
         try:
-            resp = requests.post(url, json=payload, timeout=10)
+            with span("gas", payload.get("action") or "post"):
+                resp = http().post(url, json=payload, timeout=10)
             if resp.ok:
                 log.info(f"✅ [RETRY OK] {url} ({attempt}/{retries}) → {resp.status_code}")
                 return resp
@@ -199,6 +288,25 @@ def post_with_retry(url: str, payload: dict, retries: int = 3, delay: float = 2.
     log.error(f"❌ [RETRY FAIL] All attempts failed for {url}")
     return None
 
+# ─────────────────────────────────────────────────────────────
+# Legacy-safe webhook helper (GAS / Sheets JSON POST)
+# ─────────────────────────────────────────────────────────────
+def post_to_webhook(url: str, payload: dict) -> dict:
+    """
+    Legacy compatibility helper to post JSON payloads to Google Apps Script or webhook endpoints.
+    Returns parsed JSON or an {ok: False} fallback on error.
+    """
+    try:
+        with span("gas", payload.get("action") or "post"):
+            r = http().post(url, json=payload, timeout=10)
+        if r.ok:
+            return r.json()
+        log.warning(f"⚠️ post_to_webhook: {url} returned {r.status_code}")
+        return {"ok": False, "status": r.status_code, "text": r.text}
+    except Exception as e:
+        log.error(f"❌ post_to_webhook failed: {e}")
+        return {"ok": False, "error": str(e)}
+
 # ─────────────────────────────────────────────────────────────
 # Hybrid Safe Sender
 # ─────────────────────────────────────────────────────────────
@@ -213,7 +321,9 @@ def send_safe_message(
 ):
     """
     Smart WhatsApp message router.
-    Handles Meta 24-hour re-engagement rules automatically.
+    Handles Meta 24-hour re-engagement rules automatically: the session
+    window tracker picks template vs free text up front; only when the
+    window state is unknown is text tried first with a template fallback.
     """
     try:
         message = clean_text(message)
@@ -223,16 +333,23 @@ def send_safe_message(
             log.info(f"[SAFE MSG] Template {template_name} → {to}")
             return send_whatsapp_template(to, template_name, DEFAULT_LANG, variables)
 
+        wa = normalize_wa(to)
+        tmpl = template_name or "admin_generic_alert_us"
+        vars_ = variables or [message]
+        if session_window.state(wa) == "closed":
+            log.info(f"[SAFE MSG] 24h window closed for {to}. Sending template {tmpl}.")
+            return send_whatsapp_template(to, tmpl, DEFAULT_LANG, vars_)
+
         resp = send_whatsapp_text(to, message)
         try:
             resp_json = resp if isinstance(resp, dict) else (resp.json() if hasattr(resp, "json") else {})
         except Exception:
             resp_json = {}
 
-        if "131047" in json.dumps(resp_json) or "Re-engagement" in json.dumps(resp_json):
+        err = str(resp_json.get("error", "")) if resp_json.get("ok") is False else ""
+        if "131047" in err or "Re-engagement" in err:
             log.warning(f"[SAFE MSG] 24h window closed for {to}. Using template fallback.")
-            tmpl = template_name or "admin_generic_alert_us"
-            vars_ = variables or [message]
+            session_window.mark_closed(wa)
             return send_whatsapp_template(to, tmpl, DEFAULT_LANG, vars_)
 
         return resp_json
@@ -0,0 +1,180 @@
+"""
+wa_templates.py
+────────────────────────────────────────────
+Registry of approved WhatsApp templates with precompiled payloads.
+
+Each (template, language) is compiled once into a JSON skeleton; a
+send only serialises the recipient and the body parameters and joins
+them into the skeleton, instead of rebuilding the nested
+template/components/parameters dict and json-encoding all of it.
+
+Templates listed in TEMPLATES also carry a local schema (parameter
+count, max length per parameter, optional allowed-character pattern)
+that prepare() enforces before any network call:
+ • wrong count, empty or pattern-violating parameters → rejected
+ • control characters / 5+ spaces (refused by Meta) → collapsed
+ • over-long parameters → truncated, or for single free-text alert
+   templates split into several numbered messages
+Unlisted templates still compile (schema unchecked), so new Meta
+templates keep working.
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+_encode = json.JSONEncoder().encode  # same output as requests' json= (ensure_ascii)
+
+# Meta rejects newlines, tabs and more than 4 consecutive spaces in parameters
+_FORBIDDEN = re.compile(r"[\x00-\x1f\x7f]+| {5,}")
+ELLIPSIS = "…"
+DEFAULT_MAX_LEN = 1000  # body text limit is 1024 incl. the template's fixed text
+
+
+@dataclass(frozen=True)
+class TemplateSpec:
+    name: str
+    params: int                               # number of {{n}} body parameters
+    max_len: Tuple[int, ...] = ()             # per parameter; DEFAULT_MAX_LEN when missing
+    patterns: Tuple[Optional[str], ...] = ()  # per parameter allowed-character regex (fullmatch)
+    split: bool = False                       # single free-text param: split instead of truncate
+
+    def limit(self, i: int) -> int:
+        return self.max_len[i] if i < len(self.max_len) else DEFAULT_MAX_LEN
+
+    def pattern(self, i: int) -> Optional[str]:
+        return self.patterns[i] if i < len(self.patterns) else None
+
+
+_COUNT = r"\d{1,4}"
+_TIME = r"[0-9:hH .apmAPM]{1,8}|soon"
+
+TEMPLATES: Dict[str, TemplateSpec] = {s.name: s for s in [
+    TemplateSpec("admin_generic_alert_us", 1, (900,), split=True),
+    TemplateSpec("admin_morning_us", 2, (4, 900), (_COUNT, None)),
+    TemplateSpec("admin_20h00_us", 2, (4, 900), (_COUNT, None)),
+    TemplateSpec("admin_update_us", 1, (900,), split=True),
+    TemplateSpec("client_generic_alert_us", 1, (900,), split=True),
+    TemplateSpec("client_session_next_hour_us", 1, (8,), (_TIME,)),
+    TemplateSpec("client_session_tomorrow_us", 1, (8,), (_TIME,)),
+    TemplateSpec("client_weekly_schedule_us", 2, (60, 900)),
+    TemplateSpec("guest_welcome_us", 1, (60,)),
+    TemplateSpec("PilatesHQ_Menu_Main", 1, (60,)),
+]}
+
+
+def _truncate(v: str, limit: int) -> str:
+    return v if len(v) <= limit else v[:limit - 1].rstrip() + ELLIPSIS
+
+
+def _split(v: str, limit: int) -> List[str]:
+    """Word-boundary chunks, each ≤ limit including a ' (i/n)' marker."""
+    body = limit - 8
+    chunks, rest = [], v
+    while len(rest) > body:
+        cut = rest.rfind(" ", 0, body)
+        cut = cut if cut > body // 2 else body
+        chunks.append(rest[:cut].rstrip())
+        rest = rest[cut:].lstrip()
+    chunks.append(rest)
+    n = len(chunks)
+    return [f"{c} ({i}/{n})" for i, c in enumerate(chunks, 1)]
+
+
+class CompiledTemplate:
+    """JSON skeleton for one (template, language)."""
+
+    __slots__ = ("spec", "name", "lang", "_head", "_mid", "_tail")
+
+    _PARAM_OPEN = '{"type":"text","text":'
+
+    def __init__(self, name: str, lang: str, spec: Optional[TemplateSpec] = None):
+        self.spec = spec
+        self.name = name
+        self.lang = lang
+        self._head = '{"messaging_product":"whatsapp","to":'
+        self._mid = (
+            ',"type":"template","template":{"name":' + _encode(name)
+            + ',"language":{"code":' + _encode(lang) + '},"components":[{"type":"body","parameters":['
+        )
+        self._tail = "]}]}}"
+
+    def check(self, variables: Sequence[str]) -> Optional[str]:
+        """Error text if the variables cannot be sent with this template."""
+        spec = self.spec
+        if not spec:
+            return None
+        if len(variables) != spec.params:
+            return f"{self.name} expects {spec.params} parameter(s), got {len(variables)}"
+        for i, v in enumerate(variables):
+            if not str(v).strip():
+                return f"{self.name} parameter {i + 1} is empty"
+            pat = spec.pattern(i)
+            if pat and not re.fullmatch(pat, str(v)):
+                return f"{self.name} parameter {i + 1} {str(v)[:20]!r} does not match {pat}"
+        return None
+
+    def prepare(self, variables: Sequence[str]) -> Tuple[List[List[str]], Optional[str]]:
+        """
+        Validated parameter sets to send (one per message), or an error.
+        Long values are truncated, or split for single free-text templates.
+        """
+        values = [_FORBIDDEN.sub(" ", str(v)).strip() for v in variables]
+        err = self.check(values)
+        if err:
+            return [], err
+        spec = self.spec
+        if not spec:
+            return [values], None
+        if spec.split and spec.params == 1 and len(values[0]) > spec.limit(0):
+            return [[part] for part in _split(values[0], spec.limit(0))], None
+        return [[_truncate(v, spec.limit(i)) for i, v in enumerate(values)]], None
+
+    def render(self, to: str, variables: Sequence[str]) -> bytes:
+        """Request body (UTF-8 JSON) for an already-normalised number and cleaned variables."""
+        params = ",".join(f"{self._PARAM_OPEN}{_encode(str(v))}}}" for v in variables)
+        return f"{self._head}{_encode(to)}{self._mid}{params}{self._tail}".encode()
+
+
+_compiled: Dict[Tuple[str, str], CompiledTemplate] = {}
+
+
+def get_template(name: str, lang: str) -> CompiledTemplate:
+    """Compiled skeleton for (name, lang); built on first use and cached."""
+    key = (name, lang)
+    tpl = _compiled.get(key)
+    if tpl is None:
+        tpl = _compiled[key] = CompiledTemplate(name, lang, TEMPLATES.get(name))
+    return tpl
+
+
+def compile_all(langs: Sequence[str]) -> int:
+    """Compile every registered template for each language up front; returns the cache size."""
+    for name in TEMPLATES:
+        for lang in dict.fromkeys(langs):
+            get_template(name, lang)
+    return len(_compiled)
+
+
+def build_payload(to: str, name: str, lang: str, variables: List[str]) -> Tuple[Optional[bytes], Optional[str]]:
+    """(body, None) or (None, error) for exactly these variables (no truncation)."""
+    tpl = get_template(name, lang)
+    err = tpl.check(variables)
+    if err:
+        return None, err
+    return tpl.render(to, variables), None
+
+
+def build_payloads(to: str, name: str, lang: str, variables: List[str]) -> Tuple[List[bytes], Optional[str]]:
+    """
+    Request bodies after schema validation / truncation / splitting.
+    ([], error) for requests Meta would reject – no network cost.
+    """
+    tpl = get_template(name, lang)
+    sets, err = tpl.prepare(variables)
+    if err:
+        return [], err
+    return [tpl.render(to, vs) for vs in sets], None
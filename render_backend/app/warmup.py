@@ -0,0 +1,90 @@
+"""
+warmup.py
+────────────────────────────────────────────
+Pre-fork warm-up for gunicorn (see gunicorn.conf.py, preload_app).
+
+ • prefork() – once, in the master, after the app is imported:
+   loads the client directory and builds its fuzzy name index, and
+   compiles every registered WhatsApp template skeleton; then
+   gc.freeze() moves all of it out of the collector's reach so the
+   workers share those pages copy-on-write instead of each one loading
+   (and later GC-touching) its own copy
+ • postfork() – in each worker: re-enables GC, starts the in-process
+   scheduler (a thread started in the master would not survive the
+   fork) and opens keep-alive connections to GAS and Graph in the
+   background (sockets cannot be shared across a fork either;
+   utils.http() is per process); starts the /ready prober
+ • Without gunicorn (flask run, bench in-process) none of this runs and
+   everything still loads lazily on first use
+────────────────────────────────────────────
+"""
+
+from __future__ import annotations
+import gc
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+WARM_CONNECTIONS = os.getenv("WARM_CONNECTIONS", "1") == "1"
+PRELOADED = os.getenv("GUNICORN_PRELOAD") == "1"  # set by gunicorn.conf.py: threads wait for postfork()
+
+_state = {"prefork": None, "connections": {}}
+
+
+def _timed(steps: dict, name: str, fn):
+    started = time.perf_counter()
+    try:
+        steps[name] = {"result": fn()}
+    except Exception as e:  # warm-up is best effort: workers load lazily anyway
+        steps[name] = {"error": str(e)}
+        log.warning(f"[warmup] {name} failed: {e}")
+    steps[name]["ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def prefork() -> dict:
+    """Warm shared read-only state in the gunicorn master, then freeze it for copy-on-write."""
+    from .client_directory import directory
+    from .config import TEMPLATE_LANG, ADMIN_TEMPLATE_LANG
+    from .utils import DEFAULT_LANG
+    from .wa_templates import compile_all
+
+    steps: dict = {}
+    _timed(steps, "client_directory", directory.warm)
+    _timed(steps, "templates", lambda: compile_all([TEMPLATE_LANG, ADMIN_TEMPLATE_LANG, DEFAULT_LANG]))
+    gc.collect()
+    gc.freeze()
+    steps["frozen_objects"] = gc.get_freeze_count()
+    _state["prefork"] = {"pid": os.getpid(), "at": round(time.time(), 3), **steps}
+    log.info(f"[warmup] pre-fork: {steps}")
+    return steps
+
+
+def postfork():
+    """Per worker: GC back on (frozen objects stay out of it), connections warmed off the request path."""
+    gc.enable()
+    if PRELOADED:
+        from .scheduler import start_if_enabled
+        start_if_enabled()
+    if WARM_CONNECTIONS:
+        threading.Thread(target=_warm_connections, name="warm-connections", daemon=True).start()
+    from .readiness import ensure_prober
+    ensure_prober()  # /ready has dependency state before the first health check
+
+
+def _warm_connections():
+    from .config import SHEETS_API_URL, gas_url
+    from .utils import META_BASE_URL, warm_connections
+
+    _state["connections"] = warm_connections([gas_url("GAS_WEBHOOK_URL"), SHEETS_API_URL, META_BASE_URL])
+    log.debug(f"[warmup] connections: {_state['connections']}")
+
+
+def summary() -> dict:
+    return {
+        "prefork": _state["prefork"],
+        "connections": _state["connections"],
+        "gc_frozen": gc.get_freeze_count(),
+    }
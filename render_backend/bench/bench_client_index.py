@@ -0,0 +1,106 @@
+"""
+bench_client_index.py
+────────────────────────────────────────────
+Micro-benchmark: indexed client-name matching vs the legacy
+difflib + substring scan, over 10k synthetic client names.
+
+Run from render_backend/:
+    python -m bench.bench_client_index [--clients 10000] [--queries 500]
+────────────────────────────────────────────
+"""
+
+import argparse
+import logging
+import random
+import statistics
+import time
+from difflib import get_close_matches
+
+logging.disable(logging.CRITICAL)
+
+from app.client_index import ClientNameIndex  # noqa: E402
+
+FIRST = [
+    "Mary", "Anne", "Thandi", "Lerato", "Fatima", "Naledi", "Sarah", "Priya", "Zanele", "Megan",
+    "John", "Peter", "Sipho", "Neville", "Ahmed", "Johan", "Michael", "Kabelo", "Ravi", "David",
+    "Chantelle", "Nomvula", "Elize", "Aisha", "Bongani", "Karabo", "Lindiwe", "Tshepo", "Yusuf", "Grace",
+]
+LAST = [
+    "Smith", "Naidoo", "Dlamini", "Khan", "van der Merwe", "Botha", "Nkosi", "Pillay", "Mokoena", "Jacobs",
+    "Pather", "Venter", "Mahlangu", "Govender", "Ndlovu", "Steyn", "Moodley", "Fourie", "Zulu", "Adams",
+]
+
+
+def synthetic_rows(n: int, seed: int = 7) -> list[dict]:
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        name = f"{rnd.choice(FIRST)} {rnd.choice(LAST)}"
+        if rnd.random() < 0.3:
+            name = f"{name} {rnd.choice(FIRST)[:3]}{i}"  # disambiguating suffixes, like real sheets
+        rows.append({"client_id": f"C{i:05d}", "name": name, "phone": f"2782{i:07d}",
+                     "dob_day": str(1 + i % 28), "dob_month": str(1 + i % 12)})
+    return rows
+
+
+def typo(s: str, rnd: random.Random) -> str:
+    if len(s) < 4:
+        return s
+    i = rnd.randrange(1, len(s) - 1)
+    return s[:i] + s[i + 1] + s[i] + s[i + 2:]
+
+
+def legacy_matches(name: str, rows: list[dict]) -> list:
+    """The pre-index admin_utils._find_client_matches body."""
+    all_clients = [r.get("name", "") for r in rows if r.get("name")]
+    fuzzy = set(get_close_matches(name, all_clients, n=5, cutoff=0.6))
+    substring = [r for r in rows if name.lower() in (r.get("name", "").lower())]
+    return [r for r in rows if r.get("name") in fuzzy or r in substring]
+
+
+def timed(fn, queries, repeat=1) -> list[float]:
+    out = []
+    for q in queries:
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            fn(q)
+        out.append((time.perf_counter() - t0) / repeat * 1000)
+    return out
+
+
+def report(label: str, samples: list[float]):
+    samples = sorted(samples)
+    p = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    print(f"  {label:<24} mean={statistics.mean(samples):8.3f} ms  p50={p(.5):8.3f}  p95={p(.95):8.3f}  max={samples[-1]:8.3f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=10000)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--legacy-queries", type=int, default=20, help="legacy scan is slow; sample fewer")
+    args = ap.parse_args()
+
+    rnd = random.Random(42)
+    rows = synthetic_rows(args.clients)
+    t0 = time.perf_counter()
+    index = ClientNameIndex(rows)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    names = [r["name"] for r in rows]
+    kinds = {
+        "exact": [rnd.choice(names) for _ in range(args.queries)],
+        "first-name substring": [rnd.choice(FIRST) for _ in range(args.queries)],
+        "typo": [typo(rnd.choice(names), rnd) for _ in range(args.queries)],
+        "phonetic (Jon/Smyth)": [rnd.choice(["Jon Smyth", "Meri Naydoo", "Piter Bota", "Fatma Kahn"]) for _ in range(args.queries)],
+    }
+
+    print(f"clients={args.clients}  index build={build_ms:.1f} ms  trigrams={len(index._grams)}")
+    for kind, queries in kinds.items():
+        print(f"\n[{kind}]")
+        report("indexed search", timed(index.search, queries))
+        report("legacy difflib scan", timed(lambda q: legacy_matches(q, rows), queries[:args.legacy_queries]))
+
+
+if __name__ == "__main__":
+    main()
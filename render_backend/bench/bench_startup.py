@@ -0,0 +1,158 @@
+"""
+bench_startup.py
+────────────────────────────────────────────
+Cold-start benchmark: what a client waits for after a Render spin-down.
+
+Each run is a fresh interpreter that imports the app and serves its
+first two requests through the Flask test client:
+ • import    – importing the app module (create_app included)
+ • first GET – GET / on the fresh app
+ • first hook – POST /webhook with a delivery receipt (no outbound
+   calls, so only app-side warm-up is measured)
+ • wall      – process spawn → exit, interpreter start-up included
+Median / p90 / min over --runs.
+
+--preimport mod1,mod2 imports modules before the app, to price eager
+loading (e.g. --preimport reportlab.pdfgen.canvas,httpx shows what
+the lazy imports save). --importtime N runs once more under
+`python -X importtime` and lists the N slowest modules (cumulative).
+--json FILE saves the results.
+
+Run from render_backend/:
+    python -m bench.bench_startup [--runs 10] [--app wsgi:app] [--importtime 25]
+────────────────────────────────────────────
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.bench_webhook import app_env
+from bench.webhook_corpus import DEFAULT_OUT, load
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)  # render_backend/
+HEAVY = ("reportlab", "openpyxl", "openai", "httpx", "PIL")
+
+CHILD = r"""
+import importlib, json, os, sys, time
+t0 = time.perf_counter()
+for m in filter(None, os.environ.get("BENCH_PREIMPORT", "").split(",")):
+    importlib.import_module(m)
+t1 = time.perf_counter()
+mod, _, attr = os.environ["BENCH_APP"].partition(":")
+app = getattr(importlib.import_module(mod), attr or "app")
+t2 = time.perf_counter()
+c = app.test_client()
+s1 = c.get("/").status_code
+t3 = time.perf_counter()
+s2 = c.post("/webhook", json=json.loads(os.environ["BENCH_PAYLOAD"])).status_code
+t4 = time.perf_counter()
+heavy = os.environ["BENCH_HEAVY"].split(",")
+print("BENCH " + json.dumps({
+    "preimport_ms": (t1 - t0) * 1000, "import_ms": (t2 - t1) * 1000,
+    "get_ms": (t3 - t2) * 1000, "webhook_ms": (t4 - t3) * 1000,
+    "status": [s1, s2], "modules": len(sys.modules),
+    "heavy": [m for m in heavy if m in sys.modules],
+}))
+"""
+
+
+def _child_env(args, tmp: str, payload: dict) -> dict:
+    return {
+        **os.environ,
+        # Nothing listens on the discard port: a stray outbound call fails fast instead of leaving the box
+        **app_env("http://127.0.0.1:9", tmp, "http://127.0.0.1:9"),
+        "LOG_LEVEL": "WARNING",
+        "TRACE_LOG": "off",
+        "BENCH_APP": args.app,
+        "BENCH_PREIMPORT": args.preimport,
+        "BENCH_PAYLOAD": json.dumps(payload),
+        "BENCH_HEAVY": ",".join(HEAVY),
+    }
+
+
+def run_once(args, tmp: str, payload: dict) -> dict:
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=_child_env(args, tmp, payload),
+                          capture_output=True, text=True, timeout=120)
+    wall = (time.perf_counter() - t0) * 1000
+    line = next((l for l in proc.stdout.splitlines() if l.startswith("BENCH ")), None)
+    if proc.returncode or line is None:
+        sys.exit(f"child failed ({proc.returncode}):\n{proc.stderr[-2000:]}")
+    return {**json.loads(line[6:]), "wall_ms": wall}
+
+
+def importtime(args, tmp: str, payload: dict, top: int) -> list:
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD], cwd=ROOT,
+                          env=_child_env(args, tmp, payload), capture_output=True, text=True, timeout=120)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  self [us] | cumulative | imported package"
+        own, cum, name = (p.strip() for p in line[len("import time:"):].split("|", 2))
+        rows.append((name, int(own) / 1000, int(cum) / 1000))
+    rows.sort(key=lambda r: r[2], reverse=True)
+    return rows[:top]
+
+
+def _stats(values: list) -> dict:
+    values = sorted(values)
+    return {
+        "median": round(statistics.median(values), 1),
+        "p90": round(values[min(len(values) - 1, int(0.9 * len(values)))], 1),
+        "min": round(values[0], 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--app", default="wsgi:app", help="module:attr of the Flask app")
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--preimport", default="", help="comma-separated modules imported before the app")
+    ap.add_argument("--importtime", type=int, default=0, metavar="N", help="also list the N slowest imports")
+    ap.add_argument("--corpus", default=DEFAULT_OUT)
+    ap.add_argument("--json", dest="json_out")
+    args = ap.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    payload = next(item["payload"] for item in load(args.corpus) if item["kind"] == "status")
+    tmp = tempfile.mkdtemp(prefix="bench-startup-")
+    runs = [run_once(args, tmp, payload) for _ in range(args.runs)]
+
+    cols = ("import_ms", "get_ms", "webhook_ms", "wall_ms")
+    summary = {c: _stats([r[c] for r in runs]) for c in cols}
+    print(f"app={args.app} runs={args.runs}" + (f" preimport={args.preimport}" if args.preimport else ""))
+    print(f"{'':12}{'median':>10}{'p90':>10}{'min':>10}   (ms)")
+    for c, label in zip(cols, ("import", "first GET", "first hook", "wall")):
+        s = summary[c]
+        print(f"{label:12}{s['median']:>10.1f}{s['p90']:>10.1f}{s['min']:>10.1f}")
+    if args.preimport:
+        print(f"{'preimport':12}{_stats([r['preimport_ms'] for r in runs])['median']:>10.1f}")
+    last = runs[-1]
+    print(f"modules after first request: {last['modules']}; heavy loaded: {', '.join(last['heavy']) or 'none'}; "
+          f"status {last['status']}")
+
+    slow = []
+    if args.importtime:
+        slow = importtime(args, tmp, payload, args.importtime)
+        print(f"\nslowest imports (-X importtime, one run):\n{'module':48}{'self':>9}{'cumul.':>9}")
+        for name, own, cum in slow:
+            print(f"{name[:47]:48}{own:>9.1f}{cum:>9.1f}")
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"app": args.app, "preimport": args.preimport, "summary": summary, "runs": runs,
+                       "importtime": [{"module": n, "self_ms": o, "cumulative_ms": c} for n, o, c in slow]},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
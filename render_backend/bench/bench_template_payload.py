@@ -0,0 +1,112 @@
+"""
+bench_template_payload.py
+────────────────────────────────────────────
+Micro-benchmark: building WhatsApp template request bodies during a
+reminder fan-out.
+
+ legacy   – clean_text twice per variable (send_safe_message + send),
+            nested template/components dict, json.dumps of the whole
+            payload (what requests' json= does)
+ registry – wa_templates.build_payloads (the prepare path the senders
+            use: schema check / truncation / splitting), clean_text
+            fast path, only the recipient and parameters serialised
+
+Reports CPU time and peak transient allocation (tracemalloc) per send.
+No network calls are made.
+
+Run from render_backend/:
+    python -m bench.bench_template_payload [--sends 5000] [--rounds 5]
+────────────────────────────────────────────
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import statistics
+import time
+import tracemalloc
+
+logging.disable(logging.CRITICAL)
+
+from app.utils import clean_text, normalize_wa  # noqa: E402
+from app.wa_templates import build_payloads  # noqa: E402
+
+
+def _legacy_clean(t):
+    return re.sub(r"\s{2,}", " ", re.sub(r"[\n\r\t]+", " ", str(t or "").strip()))
+
+
+def legacy_body(to, name, lang, variables):
+    variables = [_legacy_clean(v) for v in variables]       # send_safe_message
+    safe_vars = [_legacy_clean(v) for v in variables]       # send_whatsapp_template
+    data = {
+        "messaging_product": "whatsapp",
+        "to": normalize_wa(to),
+        "type": "template",
+        "template": {
+            "name": name,
+            "language": {"code": lang},
+            "components": [{"type": "body", "parameters": [{"type": "text", "text": str(v)} for v in safe_vars]}],
+        },
+    }
+    return json.dumps(data).encode()
+
+
+def registry_body(to, name, lang, variables):
+    variables = [clean_text(v) for v in variables]          # send_safe_message
+    safe_vars = [clean_text(v) for v in variables]          # send_whatsapp_template (fast path)
+    bodies, _ = build_payloads(normalize_wa(to), name, lang, safe_vars)
+    return bodies[0]
+
+
+def make_jobs(n: int):
+    rnd = random.Random(7)
+    jobs = []
+    for i in range(n):
+        wa = f"08{rnd.randint(10000000, 99999999)}"
+        if i % 2:
+            jobs.append((wa, "client_session_next_hour_us", "en_US", [f"{rnd.randint(6, 19):02d}:00"]))
+        else:
+            jobs.append((wa, "client_weekly_schedule_us", "en_US",
+                         [rnd.choice(["Mary", "Sipho", "Zoë"]), f"2026-10-{rnd.randint(10, 28)} – 08:00 (duo)"]))
+    return jobs
+
+
+def run(builder, jobs, rounds):
+    cpu = []
+    for _ in range(rounds):
+        t0 = time.process_time()
+        for j in jobs:
+            builder(*j)
+        cpu.append((time.process_time() - t0) / len(jobs) * 1e6)
+    # Peak transient allocation per send (bytes above the pre-call baseline)
+    tracemalloc.start()
+    allocated = 0
+    for j in jobs:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        builder(*j)
+        allocated += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return statistics.median(cpu), allocated / len(jobs)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sends", type=int, default=5000)
+    ap.add_argument("--rounds", type=int, default=5)
+    args = ap.parse_args()
+
+    jobs = make_jobs(args.sends)
+    assert all(json.loads(legacy_body(*j)) == json.loads(registry_body(*j)) for j in jobs[:200])
+
+    print(f"{args.sends} template sends per round, {args.rounds} rounds")
+    for label, fn in (("legacy", legacy_body), ("registry", registry_body)):
+        us, alloc = run(fn, jobs, args.rounds)
+        print(f"{label:>9}: {us:6.2f} µs CPU/send   {alloc:7.0f} B peak alloc/send")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""
+bench_webhook.py
+────────────────────────────────────────────
+Load test of the inbound hot path (POST /webhook) with a recorded
+payload corpus (bench/corpus/webhooks.jsonl, see bench.webhook_corpus).
+
+The corpus is replayed, weighted by kind, by N closed-loop clients
+against either
+ • flask – the app in-process through the Flask test client, or
+ • http  – a running server at --url (e.g. gunicorn), or one spawned
+           here with --spawn-gunicorn "<gunicorn args>"
+Graph / GAS calls go to bench/fake_backend, started as a subprocess
+(--fake hotpath: no added latency, so CPU regressions show; --fake
+realistic: Graph 120 ms, GAS 800 ms, 1% errors, 80 msg/s). A server
+given with --url must already run with FAKE_BACKEND_URL set (pass the
+same fake as --fake-url) and WEBHOOK_BASE pointing at itself.
+
+The app's self-calls (button → /client-menu/action, invoice review →
+/invoices/review-one, standing bookings → /tasks/standing/command) go
+over HTTP to WEBHOOK_BASE = the app under test; for --target flask the
+same app instance is also served on a local port for them. Before the
+timed levels one entry per self-call route is sent and the route's
+pilateshq_http_requests_total in /metrics must go up (exit 1
+otherwise, e.g. when WEBHOOK_BASE points elsewhere); skip with
+--no-check-self-calls.
+
+Per concurrency level it reports throughput, p50/p95/p99 latency,
+errors, and worker saturation:
+ • cpu/worker – server CPU seconds / (wall × workers); ~1.0 means the
+   workers are CPU-bound (in-process: this process, incl. the clients)
+ • queue      – mean in-flight requests (throughput × mean latency,
+   Little's law) / --capacity (workers × threads); > 1 means requests
+   wait for a free worker
+Per payload kind percentiles are shown for the last level.
+
+--json FILE saves the results; --baseline FILE compares p95 and
+throughput per level with an earlier run and exits 1 when either is
+worse than --max-regression (default 20%).
+
+Run from render_backend/:
+    python -m bench.bench_webhook [--concurrency 1,4,16] [--requests 2000]
+    python -m bench.bench_webhook --target http --fake realistic \\
+        --spawn-gunicorn "-w 2 --threads 4" --capacity 8
+────────────────────────────────────────────
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import logging
+import os
+import random
+import re
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import requests
+from werkzeug.serving import make_server
+
+from bench.webhook_corpus import ADMIN_WA, DEFAULT_OUT, PHONE_NUMBER_ID, load, self_call
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)  # render_backend/
+
+FAKE_PROFILES = {
+    "hotpath": ["--graph-latency-ms", "0", "--gas-latency-ms", "0", "--jitter", "0"],
+    "realistic": ["--graph-latency-ms", "120", "--gas-latency-ms", "800", "--error-rate", "0.01", "--graph-rps", "80"],
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_http(url: str, proc: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{proc.args[0]} exited with {proc.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} not reachable after {timeout}s")
+
+
+def start_fake(profile: str):
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "bench.fake_backend", "--port", str(port), *FAKE_PROFILES[profile]],
+        cwd=ROOT, stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    _wait_http(f"{url}/__fake/stats", proc)
+    return proc, url
+
+
+def app_env(fake_url: str, tmp: str, app_url: str) -> dict:
+    """Environment for the app under test: fakes, self-call base, bench credentials, throwaway SQLite files."""
+    return {
+        "FAKE_BACKEND_URL": fake_url,
+        "WEBHOOK_BASE": app_url,
+        "META_PHONE_ID": PHONE_NUMBER_ID,
+        "META_ACCESS_TOKEN": "bench",
+        "NADINE_WA": ADMIN_WA,
+        "INPROCESS_SCHEDULER": "0",
+        "MESSAGE_STATUS_DB": os.path.join(tmp, "messages.sqlite3"),
+        "SESSION_WINDOW_DB": os.path.join(tmp, "window.sqlite3"),
+        "DELIVERY_LEDGER_DB": os.path.join(tmp, "ledger.sqlite3"),
+        "INVOICE_TOKENS_DB": os.path.join(tmp, "tokens.sqlite3"),
+        # Every worker's counters in one /metrics, for check_self_calls
+        "METRICS_DIR": os.path.join(tmp, "metrics"),
+        "METRICS_FLUSH_S": "0.5",
+        "METRICS_TOKEN": "",
+    }
+
+
+# ─────────────────────────────────────────────
+# Workload
+# ─────────────────────────────────────────────
+def _fresh_timestamps(node, now: str):
+    if isinstance(node, dict):
+        return {k: (now if k == "timestamp" else _fresh_timestamps(v, now)) for k, v in node.items()}
+    if isinstance(node, list):
+        return [_fresh_timestamps(v, now) for v in node]
+    return node
+
+
+def make_jobs(corpus: list, n: int, seed: int = 7) -> list:
+    """n (kind, body bytes) pairs drawn by weight; bodies pre-encoded so clients cost little."""
+    now = str(int(time.time()))
+    encoded = [(c["kind"], json.dumps(_fresh_timestamps(c["payload"], now)).encode()) for c in corpus]
+    return random.Random(seed).choices(encoded, weights=[c["weight"] for c in corpus], k=n)
+
+
+def _pct(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] * 1000 if values else 0.0
+
+
+def _proc_cpu(pids: list) -> float:
+    """CPU seconds (user + system) of the given Linux processes; 0 when unavailable."""
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            total += int(fields[11]) + int(fields[12])
+        except (OSError, IndexError, ValueError):
+            pass
+    return total / os.sysconf("SC_CLK_TCK")
+
+
+def _children(pid: int) -> list:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def run_level(client_factory, jobs: list, concurrency: int, cpu_probe) -> dict:
+    """Closed loop: `concurrency` clients each send the next job as soon as the last returns."""
+    lat = [0.0] * len(jobs)
+    codes = [0] * len(jobs)
+    nxt = iter(range(len(jobs)))
+    lock = threading.Lock()
+
+    def client():
+        post = client_factory()
+        while True:
+            with lock:
+                i = next(nxt, None)
+            if i is None:
+                return
+            t0 = time.perf_counter()
+            codes[i] = post(jobs[i][1])
+            lat[i] = time.perf_counter() - t0
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    cpu0, t0 = cpu_probe(), time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    cpu = cpu_probe() - cpu0
+
+    kinds = {}
+    for (kind, _), l in zip(jobs, lat):
+        kinds.setdefault(kind, []).append(l)
+    rps = len(jobs) / wall
+    return {
+        "concurrency": concurrency,
+        "requests": len(jobs),
+        "rps": round(rps, 1),
+        "p50_ms": round(_pct(lat, 0.50), 2),
+        "p95_ms": round(_pct(lat, 0.95), 2),
+        "p99_ms": round(_pct(lat, 0.99), 2),
+        "errors": sum(1 for c in codes if c >= 500 or c == 0),
+        "inflight": round(rps * statistics.fmean(lat), 2),
+        "cpu_s": round(cpu, 2),
+        "wall_s": round(wall, 2),
+        "kinds": {k: {"n": len(v), "p50_ms": round(_pct(v, 0.5), 2), "p95_ms": round(_pct(v, 0.95), 2)}
+                  for k, v in sorted(kinds.items())},
+    }
+
+
+# ─────────────────────────────────────────────
+# Self-call check
+# ─────────────────────────────────────────────
+_REQUESTS_LINE = re.compile(r'^pilateshq_http_requests_total\{endpoint="([^"]*)",status="[^"]*"\} (\S+)$', re.M)
+
+
+def route_hits(url: str) -> Counter:
+    """Requests per Flask route from the app's /metrics."""
+    text = requests.get(f"{url}/metrics", timeout=10).text
+    hits = Counter()
+    for endpoint, value in _REQUESTS_LINE.findall(text):
+        hits[endpoint] += float(value)
+    return hits
+
+
+def check_self_calls(post, url: str, corpus: list, settle_s: float = 1.5) -> dict:
+    """Send one entry per self-call route; returns route → requests it gained in /metrics."""
+    probes = {}
+    for item in corpus:
+        route = self_call(item)
+        if route:
+            probes.setdefault(route, item)
+    before = route_hits(url)
+    now = str(int(time.time()))
+    for item in probes.values():
+        post(json.dumps(_fresh_timestamps(item["payload"], now)).encode())
+    time.sleep(settle_s)  # METRICS_FLUSH_S: other workers' snapshots catch up
+    after = route_hits(url)
+    return {route: int(after[route] - before[route]) for route in sorted(probes)}
+
+
+def report_self_calls(gained: dict) -> bool:
+    missing = [route for route, n in gained.items() if n < 1]
+    print("self-calls: " + ", ".join(f"{route} +{n}" for route, n in gained.items()))
+    if missing:
+        print(f"  not reached: {', '.join(missing)} – is WEBHOOK_BASE the app under test?")
+    return not missing
+
+
+# ─────────────────────────────────────────────
+# Targets
+# ─────────────────────────────────────────────
+def flask_target(app_ref: str, self_port: int):
+    """Test-client load on the imported app; the same instance serves its self-calls on self_port."""
+    mod, _, attr = app_ref.partition(":")
+    sys.path.insert(0, ROOT)
+    with contextlib.redirect_stdout(io.StringIO()):
+        flask_app = getattr(importlib.import_module(mod), attr or "app")
+    server = make_server("127.0.0.1", self_port, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-self-calls", daemon=True).start()
+
+    def factory():
+        c = flask_app.test_client()
+        return lambda body: c.post("/webhook", data=body, content_type="application/json").status_code
+
+    return factory, time.process_time, 1
+
+
+def http_target(url: str, workers_of=None):
+    def factory():
+        s = requests.Session()
+
+        def post(body):
+            try:
+                return s.post(f"{url}/webhook", data=body, headers={"Content-Type": "application/json"},
+                              timeout=60).status_code
+            except requests.RequestException:
+                return 0
+        return post
+
+    if workers_of is None:
+        return factory, (lambda: 0.0), None
+    return factory, (lambda: _proc_cpu(_children(workers_of.pid))), len(_children(workers_of.pid)) or None
+
+
+def report(levels: list, capacity, workers):
+    print(f"{'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} "
+          f"{'cpu/worker':>11} {'queue':>6}")
+    for r in levels:
+        cpu = f"{r['cpu_s'] / (r['wall_s'] * workers):.2f}" if workers and r["cpu_s"] else "-"
+        queue = f"{r['inflight'] / capacity:.2f}" if capacity else "-"
+        print(f"{r['concurrency']:>5} {r['rps']:>8.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+              f"{r['p99_ms']:>8.2f} {r['errors']:>7} {cpu:>11} {queue:>6}")
+    print(f"\nby payload kind (concurrency {levels[-1]['concurrency']}):")
+    for kind, k in levels[-1]["kinds"].items():
+        print(f"  {kind:<12} n={k['n']:<6} p50 {k['p50_ms']:8.2f} ms   p95 {k['p95_ms']:8.2f} ms")
+
+
+def compare(levels: list, baseline_path: str, max_regression: float) -> bool:
+    with open(baseline_path) as f:
+        base = {r["concurrency"]: r for r in json.load(f)["levels"]}
+    ok = True
+    for r in levels:
+        b = base.get(r["concurrency"])
+        if not b:
+            continue
+        p95 = r["p95_ms"] / b["p95_ms"] - 1 if b["p95_ms"] else 0.0
+        rps = 1 - r["rps"] / b["rps"] if b["rps"] else 0.0
+        bad = p95 > max_regression or rps > max_regression
+        ok &= not bad
+        print(f"  c={r['concurrency']:<4} p95 {p95:+7.1%}  req/s {-rps:+7.1%}  {'REGRESSION' if bad else 'ok'}")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--target", choices=["flask", "http"], default="flask")
+    ap.add_argument("--app", default="main:app", help="module:attr of the Flask app (flask / --spawn-gunicorn)")
+    ap.add_argument("--url", help="running server for --target http (must use FAKE_BACKEND_URL and WEBHOOK_BASE)")
+    ap.add_argument("--spawn-gunicorn", metavar="ARGS", help='e.g. "-w 2 --threads 4"')
+    ap.add_argument("--capacity", type=int, help="workers × threads of the server, for the queue column")
+    ap.add_argument("--fake", choices=sorted(FAKE_PROFILES), default="hotpath")
+    ap.add_argument("--fake-url", help="use an already running fake_backend instead of starting one")
+    ap.add_argument("--corpus", default=DEFAULT_OUT)
+    ap.add_argument("--concurrency", default="1,4,16")
+    ap.add_argument("--requests", type=int, default=2000, help="per concurrency level")
+    ap.add_argument("--warmup", type=int, default=100)
+    ap.add_argument("--json", dest="json_out")
+    ap.add_argument("--baseline")
+    ap.add_argument("--max-regression", type=float, default=0.20)
+    ap.add_argument("--no-check-self-calls", dest="check_self_calls", action="store_false")
+    args = ap.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    corpus = load(args.corpus)
+    fake, fake_url = (None, args.fake_url.rstrip("/")) if args.fake_url else start_fake(args.fake)
+    tmp = tempfile.mkdtemp(prefix="bench-webhook-")
+    port = _free_port()
+    url = args.url.rstrip("/") if args.url else f"http://127.0.0.1:{port}"
+    env = app_env(fake_url, tmp, url)
+    server = None
+    try:
+        if args.target == "flask":
+            os.environ.update(env)
+            factory, cpu_probe, workers = flask_target(args.app, port)
+            capacity = args.capacity
+        elif args.spawn_gunicorn:
+            server = subprocess.Popen(
+                ["gunicorn", *shlex.split(args.spawn_gunicorn), "-b", f"127.0.0.1:{port}", args.app],
+                cwd=ROOT, env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            _wait_http(f"{url}/", server)
+            factory, cpu_probe, workers = http_target(url, server)
+            capacity = args.capacity
+        else:
+            if not args.url:
+                ap.error("--target http needs --url or --spawn-gunicorn")
+            factory, cpu_probe, workers = http_target(url)
+            capacity = args.capacity
+
+        print(f"{len(corpus)} corpus payloads, {args.requests} requests/level, target={args.target}, "
+              f"fake={fake_url if args.fake_url else args.fake}, workers={workers or '?'}, capacity={capacity or '?'}")
+        if args.check_self_calls and not report_self_calls(check_self_calls(factory(), url, corpus)):
+            sys.exit(1)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            run_level(factory, make_jobs(corpus, args.warmup, seed=1), 1, cpu_probe)
+            levels = [run_level(factory, make_jobs(corpus, args.requests), int(c), cpu_probe)
+                      for c in args.concurrency.split(",")]
+        report(levels, capacity, workers)
+        fake_calls = requests.get(f"{fake_url}/__fake/stats", timeout=5).json()["calls"]
+        print(f"\nfake backend calls: {sum(fake_calls.values())} ({len(fake_calls)} distinct action/status)")
+
+        if args.json_out:
+            with open(args.json_out, "w") as f:
+                json.dump({"target": args.target, "fake": args.fake, "levels": levels}, f, indent=2)
+        if args.baseline:
+            print(f"\nvs baseline {args.baseline} (max regression {args.max_regression:.0%}):")
+            if not compare(levels, args.baseline, args.max_regression):
+                sys.exit(1)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(10)
+        if fake:
+            fake.terminate()
+            fake.wait(10)
+
+
+if __name__ == "__main__":
+    main()
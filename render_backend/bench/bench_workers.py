@@ -0,0 +1,143 @@
+"""
+bench_workers.py
+────────────────────────────────────────────
+Worker-model comparison under injected GAS / Graph latency.
+
+For each gunicorn profile in gunicorn.conf.py (WORKER_PROFILE = sync,
+gthread, gevent) a server is started with the production config
+(`gunicorn -c gunicorn.conf.py wsgi:app`, preloaded) against
+bench/fake_backend.py, and the webhook corpus is replayed at each
+--concurrency level (closed loop, bench_webhook.run_level).
+
+Per profile / level: req/s, p50 / p95, errors, achieved concurrency
+(req/s × mean latency), and the p95 of delivery receipts ("status",
+no outbound call) – the requests that should stay fast but queue
+behind slow GAS calls when every worker is blocked. Each server first
+has to pass bench_webhook's self-call check. Self-calls (buttons,
+admin invoice / standing commands) need a second free worker, so the
+sync profile can starve itself once concurrency exceeds its workers.
+
+Profiles whose worker class is not installed (gevent) are skipped.
+
+Run from render_backend/:
+    python -m bench.bench_workers [--profiles sync,gthread,gevent] \\
+        [--gas-latency-ms 800] [--concurrency 8,32] [--requests 200]
+────────────────────────────────────────────
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+
+import requests
+
+from bench.bench_webhook import (ROOT, _free_port, _wait_http, app_env, check_self_calls, http_target, make_jobs,
+                                 report_self_calls, run_level)
+from bench.webhook_corpus import DEFAULT_OUT, load
+
+NEEDS = {"gevent": "gevent"}  # profile → module it needs
+
+
+def start_fake(gas_ms: float, graph_ms: float):
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "bench.fake_backend", "--port", str(port), "--gas-latency-ms", str(gas_ms),
+         "--graph-latency-ms", str(graph_ms), "--jitter", "0.2"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    _wait_http(f"{url}/__fake/stats", proc)
+    return proc, url
+
+
+def start_gunicorn(profile: str, args, env: dict):
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, **env, "WEBHOOK_BASE": url, "PORT": str(port), "WORKER_PROFILE": profile,
+             "WEB_CONCURRENCY": str(args.workers), "GUNICORN_THREADS": str(args.threads), "LOG_LEVEL": "WARNING",
+             "TRACE_LOG": "off"},
+    )
+    _wait_http(f"{url}/health", proc, timeout=60)
+    return proc, url
+
+
+def bench_profile(profile: str, args, env: dict, corpus: list) -> list:
+    server, url = start_gunicorn(profile, args, env)
+    try:
+        factory, cpu_probe, _ = http_target(url, server)
+        print(f"{profile}: ", end="")
+        if not report_self_calls(check_self_calls(factory(), url, corpus)):
+            raise SystemExit(1)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            run_level(factory, make_jobs(corpus, args.warmup, seed=1), 2, cpu_probe)
+            levels = [run_level(factory, make_jobs(corpus, args.requests), int(c), cpu_probe)
+                      for c in args.concurrency.split(",")]
+    finally:
+        server.terminate()
+        server.wait(20)
+    return levels
+
+
+def report(results: dict):
+    print(f"{'profile':<9} {'conc':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7} {'in flight':>10} "
+          f"{'status p95':>11}")
+    for profile, levels in results.items():
+        for r in levels:
+            status = r["kinds"].get("status", {}).get("p95_ms", 0.0)
+            print(f"{profile:<9} {r['concurrency']:>5} {r['rps']:>8.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+                  f"{r['errors']:>7} {r['inflight']:>10.1f} {status:>11.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--profiles", default="sync,gthread,gevent")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--threads", type=int, default=16, help="GUNICORN_THREADS for gthread")
+    ap.add_argument("--gas-latency-ms", type=float, default=800.0)
+    ap.add_argument("--graph-latency-ms", type=float, default=120.0)
+    ap.add_argument("--corpus", default=DEFAULT_OUT)
+    ap.add_argument("--concurrency", default="8,32")
+    ap.add_argument("--requests", type=int, default=200, help="per concurrency level")
+    ap.add_argument("--warmup", type=int, default=20)
+    ap.add_argument("--json", dest="json_out")
+    args = ap.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    if importlib.util.find_spec("gunicorn") is None:
+        sys.exit("gunicorn is not installed")
+    corpus = load(args.corpus)
+    fake, fake_url = start_fake(args.gas_latency_ms, args.graph_latency_ms)
+    env = app_env(fake_url, tempfile.mkdtemp(prefix="bench-workers-"), "")  # WEBHOOK_BASE set per server
+    results = {}
+    try:
+        print(f"{len(corpus)} corpus payloads, {args.requests} requests/level, {args.workers} workers, "
+              f"GAS {args.gas_latency_ms:.0f} ms, Graph {args.graph_latency_ms:.0f} ms\n")
+        for profile in args.profiles.split(","):
+            need = NEEDS.get(profile)
+            if need and importlib.util.find_spec(need) is None:
+                print(f"{profile}: skipped ({need} not installed)")
+                continue
+            results[profile] = bench_profile(profile, args, env, corpus)
+        report(results)
+        calls = requests.get(f"{fake_url}/__fake/stats", timeout=5).json()["calls"]
+        print(f"\nfake backend calls: {sum(calls.values())}")
+        if args.json_out:
+            with open(args.json_out, "w") as f:
+                json.dump({"workers": args.workers, "threads": args.threads, "gas_latency_ms": args.gas_latency_ms,
+                           "graph_latency_ms": args.graph_latency_ms, "profiles": results}, f, indent=2)
+    finally:
+        fake.terminate()
+        fake.wait(10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+fake_backend.py
+────────────────────────────────────────────
+Local stand-in for the Meta Graph API and the Google Apps Script web
+apps, so sends and sheet calls can be load-tested without leaving the
+machine.
+
+Start it, then run the app with FAKE_BACKEND_URL pointing at it
+(app.config routes Graph, every GAS URL and the /sheets bridge there)
+and WEBHOOK_BASE at the app itself, so its self-calls
+(/invoices/review-one, /tasks/standing/command, …) reach the real routes:
+
+    python -m bench.fake_backend --port 8765 --graph-latency-ms 120 \\
+        --gas-latency-ms 800 --error-rate 0.01 --graph-rps 80
+    FAKE_BACKEND_URL=http://127.0.0.1:8765 WEBHOOK_BASE=http://127.0.0.1:10000 \\
+        gunicorn -c gunicorn.conf.py wsgi:app
+
+Endpoints
+ • POST /<version>/<phone_id>/messages – Graph send: a wamid on
+   success; 429 / 130429 above --graph-rps; 500 / 131000 at
+   --error-rate; free text to a contact whose 24h window is closed
+   (--closed-window-rate of numbers) → 400 / 131047
+ • GET|POST /gas/<script> and /sheets – the GAS actions used across the
+   app (get_sessions, get_clients, lookup_client_name,
+   export_sessions_week, add_session, mark_reschedule, …) against an
+   in-memory synthetic studio; unknown actions answer {"ok": true}
+ • any other path – {"ok": true}
+ • GET /__fake/stats, POST /__fake/config (change knobs at runtime),
+   POST /__fake/reset
+────────────────────────────────────────────
+"""
+
+import argparse
+import itertools
+import logging
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+from datetime import date, timedelta
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+# No app imports here: FAKE_BACKEND_URL must be set before app.config is loaded
+FIRST = ["Mary", "Thandi", "Lerato", "Fatima", "Naledi", "Priya", "John", "Sipho", "Ahmed", "Johan", "Ravi", "Grace"]
+LAST = ["Smith", "Naidoo", "Dlamini", "Khan", "van der Merwe", "Botha", "Nkosi", "Pillay", "Jacobs", "Govender"]
+CAPACITY = {"single": 1, "duo": 2, "trio": 3, "group": 6}
+
+
+@dataclass
+class FakeConfig:
+    graph_latency_ms: float = 120.0
+    gas_latency_ms: float = 800.0
+    jitter: float = 0.3              # ± fraction of the latency
+    error_rate: float = 0.0          # injected 5xx, both targets
+    graph_rps: float = 0.0           # token-bucket rate limit (0 = unlimited)
+    gas_rps: float = 0.0
+    closed_window_rate: float = 0.0  # share of numbers whose 24h window is closed
+    clients: int = 200
+    days: int = 14
+    seed: int = 7
+
+
+class TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.at) * self.rate)
+            self.at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+# ─────────────────────────────────────────────
+# Synthetic studio (Clients / Packages / Sessions sheets)
+# ─────────────────────────────────────────────
+class Studio:
+    def __init__(self, clients: int = 200, days: int = 14, seed: int = 7):
+        rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.clients, self.packages, self.sessions = [], [], []
+        self.log = []
+        for i in range(clients):
+            first, last = rnd.choice(FIRST), rnd.choice(LAST)
+            self.clients.append({
+                "client_id": f"C{i:04d}",
+                "name": f"{first} {last}",
+                "phone": f"2782{1000000 + i:07d}",
+                "email": f"{first.lower()}.{i}@example.com",
+                "dob": f"{rnd.randint(1, 28):02d} {rnd.choice(['January', 'June', 'October'])}",
+            })
+            self.packages.append({
+                "client_id": f"C{i:04d}",
+                "client_name": f"{first} {last}",
+                "package_type": rnd.choice(["10-class", "20-class", "monthly"]),
+                "sessions_total": 10,
+                "sessions_used": rnd.randint(0, 10),
+                "purchase_date": (date.today() - timedelta(days=rnd.randint(0, 60))).isoformat(),
+            })
+        for d in range(days):
+            day = date.today() + timedelta(days=d)
+            if day.weekday() == 6:
+                continue
+            for hour in range(6, 19):
+                kind = rnd.choice(list(CAPACITY))
+                for c in rnd.sample(self.clients, rnd.randint(0, CAPACITY[kind])):
+                    self.sessions.append(self._session(day.isoformat(), f"{hour:02d}:00", kind, c))
+
+    @staticmethod
+    def _session(session_date: str, start_time: str, kind: str, client: dict) -> dict:
+        return {
+            "session_date": session_date, "start_time": start_time, "session_time": start_time,
+            "session_type": kind, "client_name": client.get("name", ""),
+            "wa_number": client.get("phone") or client.get("wa_number", ""), "status": "confirmed",
+        }
+
+    def by_wa(self, wa: str):
+        wa = str(wa or "").lstrip("+")
+        return next((c for c in self.clients if c["phone"] == wa), None)
+
+    def by_name(self, name: str):
+        name = str(name or "").strip().lower()
+        return next((c for c in self.clients if c["name"].lower() == name), None)
+
+    def upcoming(self, wa: str = "", start: str = "", end: str = "9999-12-31") -> list:
+        start = start or date.today().isoformat()
+        return [s for s in self.sessions
+                if s["status"] == "confirmed" and start <= s["session_date"] <= end
+                and (not wa or s["wa_number"] == str(wa).lstrip("+"))]
+
+    def _set_status(self, p: dict, status: str) -> dict:
+        wa = str(p.get("wa_number") or p.get("wa") or "").lstrip("+")
+        when = p.get("session_date") or p.get("date")
+        at = str(p.get("start_time") or p.get("session_time") or p.get("time") or "")[:5]
+        with self.lock:
+            for s in self.upcoming(wa):
+                if (not when or s["session_date"] == when) and (not at or s["start_time"] == at):
+                    s["status"] = status
+                    return {"ok": True, "session": s}
+        return {"ok": False, "error": "session not found"}
+
+    # One handler per GAS action: payload dict → response dict
+    def handle(self, action: str, p: dict) -> dict:
+        today = date.today()
+        if action in ("get_sessions", "get_sessions_today", "get_sessions_tomorrow"):
+            day = {"get_sessions_today": today, "get_sessions_tomorrow": today + timedelta(days=1)}.get(action)
+            rows = self.upcoming(p.get("wa_number", ""), day.isoformat(), day.isoformat()) if day else self.upcoming()
+            return {"ok": True, "sessions": rows}
+        if action == "get_upcoming_sessions":
+            return {"ok": True, "sessions": self.upcoming(p.get("wa") or p.get("wa_number", ""))}
+        if action in ("get_clients", "export_clients"):
+            return {"ok": True, "clients": self.clients}
+        if action == "get_packages":
+            return {"ok": True, "packages": self.packages}
+        if action == "lookup_client_name":
+            c = self.by_wa(p.get("wa_number"))
+            return {"ok": True, "client_name": c["name"]} if c else {"ok": False, "error": "not found"}
+        if action == "find_client":
+            c = self.by_name(p.get("name"))
+            return {"ok": True, "client": c} if c else {"ok": False, "error": "not found"}
+        if action in ("export_sessions_today", "export_sessions_week"):
+            end = today + timedelta(days=0 if action.endswith("today") else 6)
+            rows = self.upcoming(p.get("wa_number", ""), today.isoformat(), end.isoformat())
+            return {"ok": True, "sessions": rows, "summary": f"{len(rows)} sessions"}
+        if action == "add_session":
+            c = self.by_name(p.get("client_name")) or {"name": p.get("client_name", ""), "wa_number": p.get("wa_number", "")}
+            row = self._session(p.get("session_date") or p.get("date", ""), str(p.get("start_time") or p.get("time", ""))[:5],
+                                p.get("session_type") or "single", c)
+            with self.lock:
+                self.sessions.append(row)
+            return {"ok": True, "session": row}
+        if action == "add_sessions_bulk":
+            rows = p.get("sessions") or []
+            with self.lock:
+                self.sessions.extend(self._session(r.get("session_date", ""), str(r.get("start_time", ""))[:5],
+                                                   r.get("session_type") or "single", r) for r in rows)
+            return {"ok": True, "added": len(rows), "rejected": []}
+        if action in ("cancel_by_date_time", "cancel_next"):
+            return self._set_status(p, "cancelled")
+        if action == "mark_reschedule":
+            return self._set_status(p, "rescheduled")
+        if action == "mark_today_status":
+            return self._set_status(p, p.get("status") or "attended")
+        if action == "add_client":
+            with self.lock:
+                self.clients.append({"client_id": f"C{len(self.clients):04d}", "name": p.get("name", ""),
+                                     "phone": str(p.get("wa_number") or p.get("phone") or "").lstrip("+")})
+            return {"ok": True}
+        if action == "get_group_availability":
+            slots = Counter((s["session_date"], s["start_time"]) for s in self.upcoming() if s["session_type"] == "group")
+            return {"ok": True, "groups": [{"date": d, "time": t, "free": CAPACITY["group"] - n}
+                                           for (d, t), n in sorted(slots.items()) if n < CAPACITY["group"]]}
+        if action == "get_sheet":
+            return {"ok": True, "rows": [{"name": c["name"], "wa_number": c["phone"]} for c in self.clients[:50]]}
+        if action in ("append_log_event", "log_action"):
+            with self.lock:
+                self.log.append(p)
+        # send_invoice_email, apply_discount, standing_command, upsert_from_sessions, …
+        return {"ok": True, "action": action}
+
+
+# ─────────────────────────────────────────────
+# App
+# ─────────────────────────────────────────────
+def make_app(cfg: FakeConfig = None) -> Flask:
+    cfg = cfg or FakeConfig()
+    app = Flask("fake_backend")
+    state = {}
+    stats: Counter = Counter()
+    wamids = itertools.count(1)
+
+    def reset():
+        state["studio"] = Studio(cfg.clients, cfg.days, cfg.seed)
+        state["buckets"] = {"graph": TokenBucket(cfg.graph_rps), "gas": TokenBucket(cfg.gas_rps)}
+        state["rnd"] = random.Random(cfg.seed)
+        stats.clear()
+
+    reset()
+
+    def _sleep(ms: float):
+        if ms > 0:
+            time.sleep(ms * (1 + state["rnd"].uniform(-cfg.jitter, cfg.jitter)) / 1000)
+
+    def _inject(target: str, label: str):
+        """Rate-limit / latency / error injection; a response to return, or None."""
+        if not state["buckets"][target].take():
+            stats[f"{target}:{label}:429"] += 1
+            time.sleep(0.005)
+            if target == "graph":
+                return _graph_error(429, 130429, "Rate limit hit")
+            return jsonify({"ok": False, "error": "Service invoked too many times"}), 429
+        _sleep(cfg.graph_latency_ms if target == "graph" else cfg.gas_latency_ms)
+        if cfg.error_rate and state["rnd"].random() < cfg.error_rate:
+            stats[f"{target}:{label}:500"] += 1
+            if target == "graph":
+                return _graph_error(500, 131000, "Something went wrong")
+            return "<html><body>Script error (fake)</body></html>", 500
+        return None
+
+    def _graph_error(status: int, code: int, message: str):
+        return jsonify({"error": {"message": f"({code}) {message}", "type": "OAuthException", "code": code,
+                                  "fbtrace_id": "FAKE"}}), status
+
+    def _window_closed(to: str) -> bool:
+        return (zlib.crc32(to.encode()) % 1000) < cfg.closed_window_rate * 1000
+
+    @app.post("/<version>/<phone_id>/messages")
+    def graph_messages(version, phone_id):
+        body = request.get_json(force=True, silent=True) or {}
+        kind = body.get("type") or "?"
+        label = (body.get("template") or {}).get("name") or kind
+        injected = _inject("graph", label)
+        if injected:
+            return injected
+        to = str(body.get("to") or "")
+        if body.get("messaging_product") != "whatsapp" or not to:
+            stats[f"graph:{label}:400"] += 1
+            return _graph_error(400, 100, "Invalid parameter")
+        if kind == "text" and _window_closed(to):
+            stats[f"graph:{label}:131047"] += 1
+            return _graph_error(400, 131047, "Re-engagement message")
+        stats[f"graph:{label}:200"] += 1
+        return jsonify({"messaging_product": "whatsapp", "contacts": [{"input": to, "wa_id": to}],
+                        "messages": [{"id": f"wamid.FAKE{next(wamids):08d}"}]})
+
+    @app.route("/gas/<script>", methods=["GET", "POST"])
+    @app.route("/sheets", methods=["GET", "POST"], defaults={"script": "sheets"})
+    def gas(script):
+        payload = request.get_json(force=True, silent=True) or {}
+        payload = {**request.args.to_dict(), **payload}
+        action = payload.get("action") or "?"
+        injected = _inject("gas", action)
+        if injected:
+            return injected
+        stats[f"gas:{action}:200"] += 1
+        return jsonify(state["studio"].handle(action, payload))
+
+    @app.get("/__fake/stats")
+    def fake_stats():
+        return jsonify({"config": asdict(cfg), "calls": dict(sorted(stats.items()))})
+
+    @app.post("/__fake/config")
+    def fake_config():
+        known = {f.name for f in fields(FakeConfig)}
+        for k, v in (request.get_json(force=True, silent=True) or {}).items():
+            if k in known:
+                setattr(cfg, k, type(getattr(cfg, k))(v))
+        state["buckets"] = {"graph": TokenBucket(cfg.graph_rps), "gas": TokenBucket(cfg.gas_rps)}
+        return jsonify({"ok": True, "config": asdict(cfg)})
+
+    @app.post("/__fake/reset")
+    def fake_reset():
+        reset()
+        return jsonify({"ok": True})
+
+    @app.route("/", defaults={"rest": ""}, methods=["GET", "POST"])
+    @app.route("/<path:rest>", methods=["GET", "POST"])
+    def other(rest):
+        stats[f"other:/{rest}:200"] += 1
+        return jsonify({"ok": True, "fake": True})
+
+    return app
+
+
+def start_in_thread(cfg: FakeConfig = None, host: str = "127.0.0.1", port: int = 0):
+    """Serve the fake from a daemon thread (port 0 = any free port); returns (server, base_url)."""
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server(host, port, make_app(cfg), threaded=True)
+    threading.Thread(target=server.serve_forever, name="fake-backend", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    for f in fields(FakeConfig):
+        ap.add_argument(f"--{f.name.replace('_', '-')}", type=type(f.default), default=f.default)
+    args = ap.parse_args()
+    cfg = FakeConfig(**{f.name: getattr(args, f.name) for f in fields(FakeConfig)})
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    print(f"fake backend on http://{args.host}:{args.port}  {asdict(cfg)}")
+    print(f"  export FAKE_BACKEND_URL=http://{args.host}:{args.port}")
+    make_server(args.host, args.port, make_app(cfg), threaded=True).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
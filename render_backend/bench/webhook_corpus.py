@@ -0,0 +1,186 @@
+"""
+webhook_corpus.py
+────────────────────────────────────────────
+Corpus of Meta webhook payloads for bench_webhook, in the exact shape
+the Cloud API posts (entry → changes → value → messages / statuses).
+
+Each JSONL line: {"kind": ..., "weight": ..., "payload": {...}}
+ client_text   – known clients: menu words, schedule / invoice NLP,
+                 cancellations, free text that ends in a lookup
+ button        – template quick-reply buttons and interactive replies
+ admin         – commands from the admin number (ADMIN_WA below)
+ guest         – unknown numbers (lookup miss → guest template)
+ status        – sent / delivered / read / failed receipt batches
+ batch         – several messages or statuses in one POST
+Weights approximate production traffic (receipts dominate).
+
+Client numbers match bench/fake_backend's synthetic studio, so lookups
+hit the fake GAS instead of falling through. self_call() names the
+app route (called through WEBHOOK_BASE) an entry should reach.
+
+Regenerate from render_backend/:
+    python -m bench.webhook_corpus [--out bench/corpus/webhooks.jsonl]
+────────────────────────────────────────────
+"""
+
+import argparse
+import json
+import os
+import random
+
+ADMIN_WA = "27840000000"
+PHONE_NUMBER_ID = "802833389569115"
+DEFAULT_OUT = os.path.join(os.path.dirname(__file__), "corpus", "webhooks.jsonl")
+
+CLIENT_TEXTS = [
+    "hi", "Hi", "menu", "hello", "help", "my schedule", "What are my bookings this week?",
+    "can I see my invoice", "balance", "I need to cancel tomorrow", "Please reschedule my session",
+    "I can't make it today sorry", "Thanks Nadine!", "Running 5 min late 🙈", "ok", "👍",
+    "Is there space in the Saturday group class?", "see you at 8",
+]
+ADMIN_TEXTS = [
+    "book Mary Smith every Tuesday 08:00 duo", "book Sipho Dlamini 2026-11-03 09:00 single",
+    "suspend Fatima Khan", "resume Fatima Khan", "invoice Mary Smith", "today", "tomorrow",
+    "who is booked this week", "cancel next Ravi Pillay",
+]
+BUTTONS = [("MY_SCHEDULE", "My schedule"), ("VIEW_INVOICE", "View latest invoice"),
+           ("BOOK_SESSION", "Book a session"), ("CONTACT_NADINE", "Contact Nadine")]
+
+
+def _client_wa(i: int) -> str:
+    return f"2782{1000000 + i:07d}"
+
+
+def _envelope(value: dict) -> dict:
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "109876543210987",
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "metadata": {"display_phone_number": "27843131635", "phone_number_id": PHONE_NUMBER_ID},
+                    **value,
+                },
+            }],
+        }],
+    }
+
+
+class _Gen:
+    def __init__(self, seed: int):
+        self.rnd = random.Random(seed)
+        self.n = 0
+
+    def wamid(self) -> str:
+        self.n += 1
+        return f"wamid.HBgLMjc4MjEwMDAwMDEVAgASGBQz{self.n:010d}"
+
+    def ts(self) -> str:
+        return str(1792300000 + self.n * 7)
+
+    def message(self, wa: str, body: dict, mtype: str) -> dict:
+        return {"from": wa, "id": self.wamid(), "timestamp": self.ts(), "type": mtype, **body}
+
+    def inbound(self, wa: str, name: str, messages: list) -> dict:
+        return _envelope({"contacts": [{"profile": {"name": name}, "wa_id": wa}], "messages": messages})
+
+    def text(self, wa: str, text: str) -> dict:
+        return self.message(wa, {"text": {"body": text}}, "text")
+
+    def button(self, wa: str) -> dict:
+        bid, title = self.rnd.choice(BUTTONS)
+        if self.rnd.random() < 0.5:
+            return self.message(wa, {"context": {"from": "27843131635", "id": self.wamid()},
+                                     "button": {"payload": bid, "text": title}}, "button")
+        return self.message(wa, {"interactive": {"type": "button_reply",
+                                                 "button_reply": {"id": bid, "title": title}}}, "interactive")
+
+    def status(self, wa: str) -> dict:
+        st = self.rnd.choices(["sent", "delivered", "read", "failed"], [30, 35, 30, 5])[0]
+        out = {"id": self.wamid(), "status": st, "timestamp": self.ts(), "recipient_id": wa}
+        if st in ("sent", "delivered"):
+            out["conversation"] = {"id": f"conv{self.n}", "origin": {"type": "utility"}}
+            out["pricing"] = {"billable": True, "pricing_model": "CBP", "category": "utility"}
+        if st == "failed":
+            code = self.rnd.choice([131047, 131026, 131049])
+            out["errors"] = [{"code": code, "title": "Message failed", "error_data": {"details": "fake"}}]
+        return out
+
+
+def build(seed: int = 7, clients: int = 200) -> list:
+    g = _Gen(seed)
+    rnd = g.rnd
+    out = []
+
+    def known():
+        i = rnd.randrange(clients)
+        return _client_wa(i), rnd.choice(["Mary", "Thandi", "Sipho", "Priya", "John"])
+
+    for text in CLIENT_TEXTS:
+        for _ in range(3):
+            wa, name = known()
+            out.append({"kind": "client_text", "weight": 4, "payload": g.inbound(wa, name, [g.text(wa, text)])})
+    for _ in range(20):
+        wa, name = known()
+        out.append({"kind": "button", "weight": 4, "payload": g.inbound(wa, name, [g.button(wa)])})
+    for text in ADMIN_TEXTS:
+        out.append({"kind": "admin", "weight": 2, "payload": g.inbound(ADMIN_WA, "Nadine", [g.text(ADMIN_WA, text)])})
+    for i in range(15):
+        wa = f"2772{rnd.randint(1000000, 9999999)}"
+        text = rnd.choice(["Hi, do you have beginner classes?", "How much is a duo session?", "hello", "Pilates?"])
+        out.append({"kind": "guest", "weight": 2, "payload": g.inbound(wa, f"Guest {i}", [g.text(wa, text)])})
+    for _ in range(60):
+        out.append({"kind": "status", "weight": 12, "payload": _envelope({"statuses": [g.status(known()[0])]})})
+    for _ in range(10):
+        wa, name = known()
+        msgs = [g.text(wa, rnd.choice(CLIENT_TEXTS)) for _ in range(rnd.randint(2, 4))]
+        out.append({"kind": "batch", "weight": 1, "payload": g.inbound(wa, name, msgs)})
+        out.append({"kind": "batch", "weight": 2,
+                    "payload": _envelope({"statuses": [g.status(known()[0]) for _ in range(rnd.randint(5, 25))]})})
+    return out
+
+
+def self_call(item: dict) -> str | None:
+    """The app's own route that handling this entry calls through WEBHOOK_BASE, if any."""
+    if item["kind"] not in ("button", "admin"):
+        return None
+    msgs = item["payload"]["entry"][0]["changes"][0]["value"].get("messages") or []
+    if len(msgs) != 1:
+        return None
+    m = msgs[0]
+    if item["kind"] == "button":
+        bid = (m.get("button") or {}).get("payload") or ((m.get("interactive") or {}).get("button_reply") or {}).get("id")
+        return "/client-menu/action" if bid in ("MY_SCHEDULE", "VIEW_INVOICE") else None
+    text = m["text"]["body"].lower()
+    if text.startswith(("book ", "suspend ", "resume ")):
+        return "/tasks/standing/command"
+    if text.startswith("invoice "):
+        return "/invoices/review-one"
+    return None
+
+
+def load(path: str = DEFAULT_OUT) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", default=DEFAULT_OUT)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    corpus = build(args.seed)
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        for item in corpus:
+            f.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n")
+    kinds = {}
+    for item in corpus:
+        kinds[item["kind"]] = kinds.get(item["kind"], 0) + 1
+    print(f"wrote {len(corpus)} payloads to {args.out}: {kinds}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# render_backend/gunicorn.conf.py
+"""
+gunicorn.conf.py – production settings (Procfile: gunicorn -c gunicorn.conf.py wsgi:app)
+────────────────────────────────────────────
+ • preload_app: the app is imported once in the master; workers fork
+   from it instead of each re-importing every router
+ • when_ready → warmup.prefork(): client directory + name index and
+   compiled WhatsApp templates are loaded before the first fork, then
+   gc.freeze()d so workers share them copy-on-write
+ • pre_fork drains the log queue; post_fork → warmup.postfork(): GC
+   back on, scheduler thread and keep-alive GAS / Graph connections
+   per worker
+ • child_exit → metrics.retire_worker(): an exited worker's METRICS_DIR
+   snapshot is folded into exited.json and removed
+GC stays disabled in the master from here until the freeze, so the
+import / warm-up garbage does not leave holes in pages that the
+workers then copy.
+
+Worker profiles (WORKER_PROFILE) – requests mostly wait on Graph and
+GAS (up to ~35 s), so capacity is about concurrent waits, not CPU:
+ • sync    – one request per worker; a few slow GAS calls block all
+   capacity (the old default, kept for comparison)
+ • gthread – GUNICORN_THREADS (default 16) threads per worker; the
+   utils.http() pool is sized to match
+ • gevent  – GUNICORN_WORKER_CONNECTIONS (default 200) greenlets per
+   worker. Everything is monkey-patched right here, before the
+   preloaded app imports requests / ssl / threading, so module-level
+   locks, the pooled session and the background threads are all
+   gevent-aware; async_clients runs its coroutines one per greenlet
+   instead of on an asyncio loop. Blocking C calls (SQLite stores)
+   still hold the hub briefly. Needs `gevent` installed.
+Compare them with `python -m bench.bench_workers`.
+────────────────────────────────────────────
+"""
+
+import gc
+import os
+import time
+
+WORKER_PROFILE = os.getenv("WORKER_PROFILE", "sync").lower()
+
+if WORKER_PROFILE == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+
+PROFILES = {
+    "sync": {"worker_class": "sync", "threads": 1},
+    "gthread": {"worker_class": "gthread", "threads": int(os.getenv("GUNICORN_THREADS", "16"))},
+    "gevent": {"worker_class": "gevent", "worker_connections": int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "200"))},
+}
+if WORKER_PROFILE not in PROFILES:
+    raise RuntimeError(f"WORKER_PROFILE must be one of {', '.join(PROFILES)}, not {WORKER_PROFILE!r}")
+
+worker_class = PROFILES[WORKER_PROFILE]["worker_class"]
+threads = PROFILES[WORKER_PROFILE].get("threads", 1)
+worker_connections = PROFILES[WORKER_PROFILE].get("worker_connections", 1000)
+
+# One pooled keep-alive connection per concurrent request (per host), so none is dropped after use
+_concurrency = {"sync": 1, "gthread": threads, "gevent": min(worker_connections, 100)}[WORKER_PROFILE]
+os.environ.setdefault("HTTP_POOL_SIZE", str(max(4, _concurrency)))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))  # GAS calls can take up to ~35 s
+graceful_timeout = 30
+keepalive = 5
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+if preload_app:
+    os.environ["GUNICORN_PRELOAD"] = "1"  # app.warmup.PRELOADED: threads start in post_fork
+    gc.disable()
+
+# app.metrics: METRICS_DIR snapshots older than this master are ignored
+os.environ["METRICS_SINCE"] = str(time.time())
+
+
+def when_ready(server):
+    # Master, app loaded, no worker forked yet
+    if server.cfg.preload_app:
+        from app import warmup
+        warmup.prefork()
+
+
+def pre_fork(server, worker):
+    from app.logging_setup import drain
+    drain()
+
+
+def post_fork(server, worker):
+    from app import warmup
+    warmup.postfork()
+
+
+def child_exit(server, worker):
+    # Master: keep the exited worker's counters, drop its METRICS_DIR file
+    from app.metrics import retire_worker
+    retire_worker(worker.pid)
@@ -2,25 +2,29 @@
 """
 wsgi.py – PilatesHQ Render Backend Entry Point
 ────────────────────────────────────────────
-This file is used by Gunicorn to launch the Flask app on Render.
+The canonical entry point: `gunicorn -c gunicorn.conf.py wsgi:app`
+(see Procfile), run from render_backend/.
 
 Expected project structure:
 render_backend/
  ├── wsgi.py
+ ├── gunicorn.conf.py  ← preload + pre-fork warm-up (app/warmup.py)
  └── app/
-     ├── __init__.py  ← contains create_app()
+     ├── __init__.py  ← contains create_app() / get_app()
      ├── router_webhook.py
      ├── invoices_router.py
      ├── client_menu_router.py
      └── ...
+
+root main.py and app/main.py re-export the same instance.
 ────────────────────────────────────────────
 """
 
 import os
-from render_backend.app import create_app
+from app import get_app
 
-# Flask application factory
-app = create_app()
+# One process-wide app (gunicorn builds it in the master when preloading)
+app = get_app()
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 10000))